@@ -0,0 +1,108 @@
+import math
+
+# Constant-memory summaries for streams of combat results. Each summary takes values one at a time
+# and merges with another summary of the same kind, so workers can summarise their own shards and
+# the parent can fold the partial summaries together.
+
+class running_moments:
+    # count, mean, variance, min and max by Welford's update; merge uses the pairwise form of Chan
+    # et al., which gives the same moments as adding every value to one summary
+    __slots__ = ("n", "mean", "m2", "low", "high")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = None
+        self.high = None
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta/self.n
+        self.m2 += delta*(value - self.mean)
+        if self.low == None or value < self.low:
+            self.low = value
+        if self.high == None or value > self.high:
+            self.high = value
+
+    def merge(self, other: 'running_moments'):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2, self.low, self.high = other.n, other.mean, other.m2, other.low, other.high
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta*other.n/n
+        self.m2 += other.m2 + delta*delta*self.n*other.n/n
+        self.n = n
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        return self
+
+    def variance(self):
+        # sample variance
+        return self.m2/(self.n - 1) if self.n > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def stderr(self):
+        return math.sqrt(self.variance()/self.n) if self.n > 1 else 0.0
+
+    def __repr__(self):
+        return "<running_moments n=%d mean=%.4f std=%.4f>" %(self.n, self.mean, self.std())
+
+class histogram:
+    # bins equal-width bins over [low, high), plus one bin below low and one at or above high
+    __slots__ = ("low", "high", "bins", "width", "counts")
+
+    def __init__(self, low, high, bins):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        self.width = (high - low)/bins
+        self.counts = [0]*(bins + 2)
+
+    def bin_of(self, value):
+        if value < self.low:
+            return 0
+        if value >= self.high:
+            return self.bins + 1
+        return int((value - self.low)//self.width) + 1
+
+    def add(self, value):
+        self.counts[self.bin_of(value)] += 1
+
+    def merge(self, other: 'histogram'):
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("only histograms with the same bins can be merged")
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        return self
+
+    def total(self):
+        return sum(self.counts)
+
+    def edges(self, index):
+        # the [lower, upper) range of a bin, open-ended for the two outer bins
+        if index == 0:
+            return -math.inf, self.low
+        if index == self.bins + 1:
+            return self.high, math.inf
+        lower = self.low + (index - 1)*self.width
+        return lower, lower + self.width
+
+    def quantile(self, q):
+        # the lower edge of the bin holding the q-th quantile, clamped to [low, high]
+        total = self.total()
+        if total == 0:
+            return None
+        target = q*total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(max(self.edges(index)[0], self.low), self.high)
+        return self.high
@@ -0,0 +1,362 @@
+import collections
+import gc
+import getopt
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import dice
+import entities
+import events
+import fuzzy
+import lookahead
+import scene
+import simulate
+from entities import advantage_type
+
+# Benchmarks for the combat hot paths. Every operation is timed on its own after a warmup, with
+# the garbage collector paused, and reported as ops/sec with p50 and p99 latency. Results are
+# written as JSON and compared against a stored baseline; a tracked metric that regresses past
+# the threshold fails the run.
+
+default_output = "bench_results.json"
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+default_threshold = 0.3
+
+# (player knowledge, enemy knowledge) for a fighter facing a CR 1/4 monster
+knowledge_contexts = {
+    scene.knowledge.LOW: ("unknown", "unknown"),
+    scene.knowledge.PLAYER_ONLY: (10, "unknown"),
+    scene.knowledge.ENEMY_ONLY: ("unknown", "1/4"),
+    scene.knowledge.HIGH: (10, "1/4")
+}
+
+combat_matchup = ("fighter", "wolf", "goblin")
+
+# metric name -> +1 if higher is better, -1 if lower is better
+tracked_metrics = {
+    "ops_per_sec": 1,
+    "memory_per_combat_bytes": -1
+}
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered)*p/100))]
+
+def measure(operation, samples, warmup=None, setup=None):
+    # setup, if given, runs untimed before each sample and its result is passed to the operation
+    warmup = warmup if warmup != None else max(1, samples//10)
+    for _ in range(warmup):
+        if setup != None:
+            operation(setup())
+        else:
+            operation()
+
+    timings = []
+    clock = time.perf_counter_ns
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        if setup == None:
+            for _ in range(samples):
+                start = clock()
+                operation()
+                timings.append(clock() - start)
+        else:
+            for _ in range(samples):
+                argument = setup()
+                start = clock()
+                operation(argument)
+                timings.append(clock() - start)
+    finally:
+        if collecting:
+            gc.enable()
+
+    timings.sort()
+    return {
+        "samples": samples,
+        "ops_per_sec": samples*1e9/sum(timings),
+        "p50_us": percentile(timings, 50)/1000,
+        "p99_us": percentile(timings, 99)/1000
+    }
+
+def random_frames(n, rng):
+    return [{
+        "player_health": rng.randint(0, 28),
+        "sidekick_health": rng.randint(0, 32),
+        "damage_dealt": rng.randint(0, 64)
+    } for _ in range(n)]
+
+def bench_suggest_action(samples, rng):
+    results = {}
+    frames = random_frames(1024, rng)
+    saved = (fuzzy.player_knowledge, fuzzy.enemy_knowledge, fuzzy.t_norm, fuzzy.s_norm, fuzzy.compiled_tables)
+    try:
+        fuzzy.compiled_tables = False
+        for norm_name, (t_norm, s_norm) in fuzzy.norm_pairs.items():
+            fuzzy.t_norm, fuzzy.s_norm = t_norm, s_norm
+            for level, (player_knowledge, enemy_knowledge) in knowledge_contexts.items():
+                fuzzy.player_knowledge, fuzzy.enemy_knowledge = player_knowledge, enemy_knowledge
+                cycle = itertools.cycle(frames)
+                results["suggest_action[%s,%s]" %(norm_name, level.name)] = measure(
+                    lambda: fuzzy.suggest_action(next(cycle)), samples)
+    finally:
+        fuzzy.player_knowledge, fuzzy.enemy_knowledge, fuzzy.t_norm, fuzzy.s_norm, fuzzy.compiled_tables = saved
+    return results
+
+def bench_decision_cache(samples, rng):
+    # suggest_action behind a decision cache that already holds every frame, and one too small to
+    # hold any of them for long
+    results = {}
+    frames = random_frames(1024, rng)
+    saved = (fuzzy.player_knowledge, fuzzy.enemy_knowledge, fuzzy.t_norm, fuzzy.s_norm, fuzzy.compiled_tables)
+    previous = fuzzy.decisions
+    try:
+        fuzzy.player_knowledge, fuzzy.enemy_knowledge = knowledge_contexts[scene.knowledge.LOW]
+        fuzzy.t_norm, fuzzy.s_norm = fuzzy.norm_pairs["lukasiewicz"]
+        fuzzy.compiled_tables = False
+        for name, size in (("hit", len(frames)), ("miss", 64)):
+            fuzzy.set_decision_cache(fuzzy.decision_cache(size))
+            cycle = itertools.cycle(frames)
+            results["decision_cache[%s]" %name] = measure(lambda: fuzzy.suggest_action(next(cycle)), samples)
+    finally:
+        fuzzy.player_knowledge, fuzzy.enemy_knowledge, fuzzy.t_norm, fuzzy.s_norm, fuzzy.compiled_tables = saved
+        fuzzy.set_decision_cache(previous)
+    return results
+
+def bench_membership_value(samples, rng):
+    results = {}
+    shapes = {
+        "trapezoid": fuzzy.membership_fxns["player_health"]["unknown"]["medium"],
+        "triangle": fuzzy.membership_fxns["player_health"][8]["medium"]
+    }
+    values = [rng.uniform(0, 28) for _ in range(1024)]
+    for shape, coefficients in shapes.items():
+        cycle = itertools.cycle(values)
+        results["calculate_membership_value[%s]" %shape] = measure(
+            lambda: fuzzy.calculate_membership_value(coefficients, next(cycle)), samples)
+    return results
+
+def bench_attack(samples, rng):
+    results = {}
+    fighter = entities.Player("fighter")
+    rogue = entities.Player("rogue")
+    goblin = entities.Monster("goblin", entities.get_catalog().monster("goblin"))
+
+    def restore(target):
+        target.current_hp = target.max_hp
+        target.dead = False
+        target.unconcious = False
+
+    # advantage flags are spent by each attack, so they are set again before every sample
+    variants = {
+        "plain": (fighter, lambda: None),
+        "advantage": (fighter, lambda: setattr(fighter, "advantage_offense", advantage_type.OFFENSE)),
+        "disadvantage": (fighter, lambda: setattr(goblin, "advantage_defense", advantage_type.DEFENSE)),
+        "multiattack": (rogue, lambda: None)
+    }
+    for variant, (attacker, prepare) in variants.items():
+        def setup():
+            restore(goblin)
+            prepare()
+            return goblin
+        results["attack[%s]" %variant] = measure(attacker.attack, samples, setup=setup)
+    return results
+
+def bench_construction(samples, rng):
+    sidekick = entities.get_catalog().monster("wolf")
+    monster = entities.get_catalog().monster("goblin")
+    return {
+        "construct[player]": measure(lambda: entities.Player("fighter"), samples),
+        "construct[monster]": measure(lambda: entities.Monster("goblin", monster), samples),
+        "construct[sidekick]": measure(lambda: entities.Sidekick("wolf", sidekick), samples)
+    }
+
+def combat_memory(build, combats):
+    # mean peak traced memory for building (or resetting) and running one combat
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(combats):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            build().run()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks)/len(peaks)
+
+def bench_scene_run(samples, rng):
+    name = ",".join(combat_matchup)
+    build = lambda: simulate.build_scene(*combat_matchup)
+    pool = simulate.scene_pool()
+    acquire = lambda: pool.acquire(*combat_matchup)
+    combats = max(1, samples//10)
+
+    fresh = measure(lambda combat: combat.run(), samples, setup=build)
+    fresh["memory_per_combat_bytes"] = combat_memory(build, combats)
+    pooled = measure(lambda combat: combat.run(), samples, setup=acquire)
+    pooled["memory_per_combat_bytes"] = combat_memory(acquire, combats)
+    # building and running together, which is what pooling saves on
+    built = measure(lambda: build().run(), samples)
+    reused = measure(lambda: acquire().run(), samples)
+    # the same combats consumed turn by turn, with and without event capture
+    streamed = measure(lambda combat: collections.deque(combat.stream(), 0), samples, setup=acquire)
+    streamed_bare = measure(lambda combat: collections.deque(combat.stream(capture_events=False), 0), samples,
+                            setup=acquire)
+    return {
+        "scene_run[%s]" %name: fresh,
+        "scene_run_pooled[%s]" %name: pooled,
+        "scene_build_run[%s]" %name: built,
+        "scene_build_run_pooled[%s]" %name: reused,
+        "scene_stream_pooled[%s]" %name: streamed,
+        "scene_stream_pooled_bare[%s]" %name: streamed_bare
+    }
+
+def bench_fork(samples, rng):
+    # a combat a couple of turns in, which is where lookahead forks from
+    combat = simulate.build_scene(*combat_matchup)
+    combat.step()
+    combat.step()
+    snapshot = combat.snapshot(include_rng=False)
+    twin = combat.fork()
+    return {
+        "scene_snapshot": measure(lambda: combat.snapshot(include_rng=False), samples),
+        "scene_restore": measure(lambda: twin.restore(snapshot), samples),
+        "scene_fork": measure(combat.fork, samples)
+    }
+
+def bench_lookahead(samples, rng):
+    # one planning decision from the sidekick's first turn
+    combat = simulate.build_scene(*combat_matchup)
+    while combat.actors[combat.counter] is not combat.sidekick:
+        combat.step()
+    planner = lookahead.LookaheadPlanner(seed=0)
+    return {
+        "lookahead_choose[%d rollouts]" %planner.rollouts: measure(lambda: planner.choose(combat.sidekick, combat), samples)
+    }
+
+suites = {
+    "suggest_action": (bench_suggest_action, 20000),
+    "decision_cache": (bench_decision_cache, 20000),
+    "membership": (bench_membership_value, 100000),
+    "attack": (bench_attack, 50000),
+    "construction": (bench_construction, 5000),
+    "scene_run": (bench_scene_run, 2000),
+    "fork": (bench_fork, 20000),
+    "lookahead": (bench_lookahead, 200)
+}
+
+def run(selected=None, scale=1.0, seed=0):
+    rng = random.Random(seed)
+    random.seed(seed)
+    dice.seed(seed)
+    previous_sink = events.set_sink(events.null)
+    benchmarks = {}
+    try:
+        for suite, (bench, samples) in suites.items():
+            if selected == None or suite in selected:
+                benchmarks.update(bench(max(1, int(samples*scale)), rng))
+    finally:
+        events.set_sink(previous_sink)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "scale": scale,
+            "seed": seed
+        },
+        "benchmarks": benchmarks
+    }
+
+def compare(results, baseline, threshold=default_threshold):
+    # returns (name, metric, baseline value, current value, relative change) for each regression
+    regressions = []
+    for name, metrics in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous == None:
+            continue
+        for metric, direction in tracked_metrics.items():
+            if metric not in metrics or metric not in previous or previous[metric] == 0:
+                continue
+            change = (metrics[metric] - previous[metric])/previous[metric]
+            if direction*change < -threshold:
+                regressions.append((name, metric, previous[metric], metrics[metric], change))
+    return regressions
+
+def display(results, baseline=None):
+    print("%-40s %14s %10s %10s %10s" %("Benchmark", "ops/sec", "p50 us", "p99 us", "vs base"))
+    for name, metrics in results["benchmarks"].items():
+        versus = ""
+        if baseline != None and name in baseline["benchmarks"]:
+            versus = "%+.1f%%" %(100*(metrics["ops_per_sec"]/baseline["benchmarks"][name]["ops_per_sec"] - 1))
+        print("%-40s %14.0f %10.2f %10.2f %10s" %(name, metrics["ops_per_sec"], metrics["p50_us"], metrics["p99_us"], versus))
+        if "memory_per_combat_bytes" in metrics:
+            print("%-40s %14.0f bytes per combat" %("", metrics["memory_per_combat_bytes"]))
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+def save(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+def main(cmdline_args):
+    usage = '''Usage: bench.py [-o <results json>][-b <baseline json>][-t <threshold>][--suite <name>]...
+    [--scale <sample multiplier>][--save-baseline]
+    suites: %s''' %", ".join(suites)
+    try:
+        options, args = getopt.getopt(cmdline_args, "o:b:t:h", ["suite=", "scale=", "save-baseline", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    output, baseline_path, threshold = default_output, default_baseline, default_threshold
+    selected, scale, save_baseline = None, 1.0, False
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt == "-o":
+            output = arg
+        elif opt == "-b":
+            baseline_path = arg
+        elif opt == "-t":
+            threshold = float(arg)
+        elif opt == "--suite":
+            if arg not in suites:
+                print(usage)
+                sys.exit(2)
+            selected = (selected or []) + [arg]
+        elif opt == "--scale":
+            scale = float(arg)
+        elif opt == "--save-baseline":
+            save_baseline = True
+
+    results = run(selected, scale)
+    save(results, output)
+    baseline = load(baseline_path) if os.path.exists(baseline_path) else None
+    display(results, baseline)
+    print("results written to %s" %output)
+
+    if save_baseline:
+        save(results, baseline_path)
+        print("baseline written to %s" %baseline_path)
+    elif baseline == None:
+        print("no baseline at %s; run with --save-baseline to store one" %baseline_path)
+    else:
+        regressions = compare(results, baseline, threshold)
+        for name, metric, previous, current, change in regressions:
+            print("REGRESSION %s %s: %.4g -> %.4g (%+.1f%%)" %(name, metric, previous, current, 100*change))
+        if regressions:
+            sys.exit(1)
+        print("no regressions past %.0f%%" %(100*threshold))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
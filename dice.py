@@ -0,0 +1,172 @@
+import functools
+import random
+import re
+
+# Compact dice engine for the combat hot paths. Entities parse their dice expressions
+# once into roll_specs, and rolling a spec is just a few draws from a seedable generator.
+# The supported expressions are the dndice subset this project uses:
+#   NdS      - roll N S-sided dice           NdcS - critical roll, twice as many dice
+#   NdShK    - keep the highest K (advantage) NdSlK - keep the lowest K (disadvantage)
+#   NdSRV    - reroll any V until it isn't V  +M/-M - flat modifier
+
+generator = random.Random()
+
+def seed(value=None):
+    generator.seed(value)
+
+class stream_set:
+    # The generator each kind of draw an entity makes comes from. shared_streams sends every kind
+    # to the module generators, which is the default. A paired experiment gives each combatant its
+    # own set instead, so that combatant's rolls of one kind stay the same whatever the others do.
+    __slots__ = ("initiative", "hit_points", "attack", "damage", "death_save", "choice")
+
+    def __init__(self, initiative, hit_points, attack, damage, death_save, choice):
+        self.initiative = initiative
+        self.hit_points = hit_points
+        self.attack = attack
+        self.damage = damage
+        self.death_save = death_save
+        # the monster's dodge and target choices
+        self.choice = choice
+
+    def rewind(self, blocks, value):
+        # points every kind at its block of draws (see replay_stream); value keys the overflow generators
+        for offset, purpose in enumerate(self.__slots__):
+            getattr(self, purpose).rewind(blocks[offset], value*len(self.__slots__) + offset)
+
+class replay_stream:
+    # Serves random() from a block of pre-drawn floats, then from a generator of its own seeded from
+    # a key once the block runs out. Rewinding to the same block and key replays the same draws,
+    # which is much cheaper than reseeding a generator.
+    __slots__ = ("block", "index", "key", "overflow")
+
+    def __init__(self):
+        self.rewind((), 0)
+
+    def rewind(self, block, key):
+        self.block = block
+        self.index = 0
+        self.key = key
+        self.overflow = None
+
+    def random(self):
+        index = self.index
+        if index < len(self.block):
+            self.index = index + 1
+            return self.block[index]
+        if self.overflow == None:
+            self.overflow = random.Random(self.key)
+        return self.overflow.random()
+
+def replay_streams():
+    return stream_set(*(replay_stream() for _ in stream_set.__slots__))
+
+def draw_blocks(rng, count, size):
+    draw = rng.random
+    return tuple([draw() for _ in range(size)] for _ in range(count))
+
+shared_streams = stream_set(generator, generator, generator, generator, generator, random)
+
+class roll_spec:
+    def __init__(self, number, sides, modifier=0, keep_highest=None, keep_lowest=None, reroll=None):
+        self.number = number
+        self.sides = sides
+        self.modifier = modifier
+        self.keep_highest = keep_highest
+        self.keep_lowest = keep_lowest
+        self.reroll = reroll
+        # most specs are plain NdS+M, which skip the face bookkeeping entirely
+        self.simple = keep_highest == None and keep_lowest == None and reroll == None
+
+    def roll(self, rng=None):
+        draw = (rng or generator).random
+        sides = self.sides
+        if self.simple:
+            total = self.modifier
+            for _ in range(self.number):
+                total += int(draw()*sides) + 1
+            return total
+
+        faces = []
+        for _ in range(self.number):
+            face = int(draw()*sides) + 1
+            while face == self.reroll:
+                face = int(draw()*sides) + 1
+            faces.append(face)
+        if self.keep_highest != None:
+            faces = sorted(faces)[-self.keep_highest:]
+        elif self.keep_lowest != None:
+            faces = sorted(faces)[:self.keep_lowest]
+        return sum(faces) + self.modifier
+
+    def roll_block(self, n, rng=None):
+        # pre-draw n results at once
+        roll = self.roll
+        rng = rng or generator
+        return [roll(rng) for _ in range(n)]
+
+    def critical(self):
+        # a critical hit doubles the dice, not the modifier
+        return roll_spec(2*self.number, self.sides, self.modifier, self.keep_highest, self.keep_lowest, self.reroll)
+
+    def with_modifier(self, modifier):
+        return roll_spec(self.number, self.sides, modifier, self.keep_highest, self.keep_lowest, self.reroll)
+
+    def __eq__(self, other):
+        return isinstance(other, roll_spec) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash((self.number, self.sides, self.modifier, self.keep_highest, self.keep_lowest, self.reroll))
+
+    def __repr__(self):
+        expression = "%dd%d" %(self.number, self.sides)
+        if self.keep_highest != None:
+            expression += "h%d" %self.keep_highest
+        elif self.keep_lowest != None:
+            expression += "l%d" %self.keep_lowest
+        if self.reroll != None:
+            expression += "R%d" %self.reroll
+        if self.modifier:
+            expression += "%+d" %self.modifier
+        return expression
+
+class roll_stream:
+    # serves single rolls of one spec out of pre-drawn blocks
+    def __init__(self, spec: roll_spec, block_size=4096, rng=None):
+        self.spec = spec
+        self.block_size = block_size
+        self.rng = rng
+        self.block = []
+        self.index = 0
+
+    def next(self):
+        if self.index == len(self.block):
+            self.block = self.spec.roll_block(self.block_size, self.rng)
+            self.index = 0
+        value = self.block[self.index]
+        self.index += 1
+        return value
+
+expression_pattern = re.compile(r"^\s*(\d*)d(c?)(\d+)(?:([hl])(\d+))?(?:R(\d+))?\s*([+-]\s*\d+)?\s*$")
+
+@functools.lru_cache(maxsize=None)
+def parse(expression, modifier=0):
+    match = expression_pattern.match(expression)
+    if match == None:
+        raise ValueError("unsupported dice expression: %s" %expression)
+    number, crit, sides, keep, kept, reroll, flat = match.groups()
+    number = int(number) if number else 1
+    if crit:
+        number *= 2
+    modifier += int(flat.replace(" ", "")) if flat else 0
+    return roll_spec(number, int(sides), modifier,
+                     int(kept) if keep == "h" else None,
+                     int(kept) if keep == "l" else None,
+                     int(reroll) if reroll else None)
+
+def roll(expression, modifier=0, rng=None):
+    return parse(expression, modifier).roll(rng)
+
+d20 = parse("1d20")
+d20_advantage = parse("2d20h1")
+d20_disadvantage = parse("2d20l1")
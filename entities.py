@@ -1,6 +1,13 @@
-import dndice
-import math, random
+import bisect
+import dice
+import events
+import functools
+import itertools
+import json
+import os, random
 from enum import Enum, IntEnum
+from types import MappingProxyType
+from events import combat_event
 
 class advantage_type(Enum):
     OFFENSE = 0
@@ -17,7 +24,15 @@ class death_save(IntEnum):
     FAILURE = 0
     SUCCESS = 1
 
+# Enum member lookups are slow next to module globals, so the combat rules below use these
+OFFENSE, DEFENSE, DIS_OFFENSE, DIS_DEFENSE = (advantage_type.OFFENSE, advantage_type.DEFENSE,
+                                              advantage_type.DIS_OFFENSE, advantage_type.DIS_DEFENSE)
+FAILURE, SUCCESS = death_save.FAILURE, death_save.SUCCESS
+
 class entity_stats:
+    # stats are shared by every entity built from the same stat block, so treat them as read-only
+    __slots__ = ("raw_stats", "stat_modifiers")
+
     def __init__(self, strength, dexterity, constitution, intelligence, wisdom, charisma):
         self.raw_stats = {
             "strength": strength,
@@ -33,7 +48,32 @@ class entity_stats:
             self.stat_modifiers[stat[:3].upper()] = (value-10)//2
         
 
+# Parsed dice are immutable, so entities with the same dice share one roll_spec
+@functools.lru_cache(maxsize=None)
+def initiative_spec(dexterity_modifier):
+    return dice.d20.with_modifier(dexterity_modifier)
+
+@functools.lru_cache(maxsize=None)
+def damage_specs(amount, die, modifier):
+    damage = dice.roll_spec(amount, die, modifier)
+    return damage, damage.critical()
+
+@functools.lru_cache(maxsize=None)
+def multiattack_specs(expression, modifier):
+    damage = dice.parse(expression, modifier)
+    return damage, damage.critical()
+
+@functools.lru_cache(maxsize=None)
+def slots_of(cls):
+    return tuple(slot for klass in cls.__mro__ for slot in getattr(klass, "__slots__", ()))
+
 class Entity:
+    __slots__ = ("name", "stats", "max_hp", "current_hp", "ac", "hit_modifier", "damage_die", "damage_dice_amount",
+                 "damage_modifier", "proficiency_bonus", "death_saving_counters", "advantage_defense",
+                 "advantage_offense", "unconcious", "stable", "dead", "harrying", "harried_by", "hindering",
+                 "hindered_by", "last_struck_by", "multiattack_modifiers", "initiative_dice", "damage_dice",
+                 "crit_damage_dice", "multiattack_dice", "crit_multiattack_dice", "streams")
+
     def __init__(self, name, stats: entity_stats, hp, ac, hit_modifier, damage_die, damage_dice_amount=1, damage_modifier=0):
         self.name = name
         self.stats = stats
@@ -59,63 +99,117 @@ class Entity:
 
         self.hindering = None
         self.hindered_by = None
+        self.last_struck_by = None
 
         self.multiattack_modifiers = None
+        self.parse_dice()
+        # where this entity's rolls come from; see dice.stream_set
+        self.streams = dice.shared_streams
+
+    def reset(self):
+        # restores the combat state in place, so a finished entity can fight again
+        self.current_hp = self.max_hp
+        self.death_saving_counters = [0,0]
+        self.advantage_defense = False
+        self.advantage_offense = False
+        self.unconcious = False
+        self.stable = False
+        self.dead = False
+        self.harrying = None
+        self.harried_by = None
+        self.hindering = None
+        self.hindered_by = None
+        self.last_struck_by = None
+
+    def clone(self):
+        # a shallow copy that shares stats and dice; links to other entities still point at the
+        # originals until the copy is restored from a state
+        twin = object.__new__(type(self))
+        for slot in slots_of(type(self)):
+            setattr(twin, slot, getattr(self, slot))
+        twin.death_saving_counters = self.death_saving_counters[:]
+        return twin
+
+    def state(self, index):
+        # combat state as a flat tuple; index maps the entities of a scene to their positions
+        return (self.current_hp, self.max_hp, self.death_saving_counters[FAILURE],
+                self.death_saving_counters[SUCCESS], self.advantage_defense, self.advantage_offense,
+                self.unconcious, self.stable, self.dead, index.get(self.harrying), index.get(self.harried_by),
+                index.get(self.hindering), index.get(self.hindered_by), index.get(self.last_struck_by))
+
+    def restore(self, state, entities):
+        # entities resolves the positions stored in state back to entities
+        (self.current_hp, self.max_hp, failures, successes, self.advantage_defense, self.advantage_offense,
+         self.unconcious, self.stable, self.dead, harrying, harried_by, hindering, hindered_by, last_struck_by) = state
+        self.death_saving_counters = [failures, successes]
+        self.harrying = entities[harrying] if harrying != None else None
+        self.harried_by = entities[harried_by] if harried_by != None else None
+        self.hindering = entities[hindering] if hindering != None else None
+        self.hindered_by = entities[hindered_by] if hindered_by != None else None
+        self.last_struck_by = entities[last_struck_by] if last_struck_by != None else None
+
+    def parse_dice(self):
+        # dice are parsed once here; call again after changing modifiers or multiattack
+        self.initiative_dice = initiative_spec(self.stats.stat_modifiers["DEX"])
+        self.damage_dice, self.crit_damage_dice = damage_specs(self.damage_dice_amount, self.damage_die, self.damage_modifier)
+        if self.multiattack_modifiers != None:
+            self.multiattack_dice, self.crit_multiattack_dice = multiattack_specs(self.multiattack_modifiers[0],
+                                                                                  self.multiattack_modifiers[1])
+        else:
+            self.multiattack_dice = None
+            self.crit_multiattack_dice = None
 
     def roll_initiative(self):
-        return dndice.basic("1d20", 0, self.stats.stat_modifiers["DEX"])
+        return self.initiative_dice.roll(self.streams.initiative)
 
     def multiattack(self, target: 'Entity'):
-        attack_roll = dndice.basic("1d20", 0, self.hit_modifier)
+        attack_roll = dice.d20.roll(self.streams.attack) + self.hit_modifier
 
         if attack_roll-self.hit_modifier == 20:
             # rolling a nat 20 is an automatic hit, and the damage dice are doubled
-            damage = max(dndice.basic(self.multiattack_modifiers[0],dndice.Mode.CRIT,self.multiattack_modifiers[1]),0)
-            result = "%s's multiattack critically hits %s for %d damage!" %(self, target, damage)
+            damage = max(self.crit_multiattack_dice.roll(self.streams.damage),0)
+            events.emit(combat_event.MULTIATTACK_CRIT, self, target, damage)
             target.last_struck_by = self
         elif attack_roll >= target.ac:
             # attacks land if they are greather than or equal to the target's armour class
-            damage = max(dndice.basic(self.multiattack_modifiers[0],0,self.multiattack_modifiers[1]),0)
-            result = "%s's multiattack strikes %s for %d damage" %(self, target, damage)
+            damage = max(self.multiattack_dice.roll(self.streams.damage),0)
+            events.emit(combat_event.MULTIATTACK_HIT, self, target, damage)
             target.last_struck_by = self
         else:
             damage = 0
-            result = "%s's multiattack misses" %(self)
-        print(result)
+            events.emit(combat_event.MULTIATTACK_MISS, self)
         return damage
 
     def attack(self, target: 'Entity'):
-        attack_roll_str = "1d20"
+        attack_dice = dice.d20
         
-        if self.advantage_offense == advantage_type.OFFENSE and target.advantage_defense != advantage_type.DEFENSE\
-            or self.advantage_offense != advantage_type.DIS_OFFENSE and target.advantage_defense == advantage_type.DIS_DEFENSE:
+        if self.advantage_offense == OFFENSE and target.advantage_defense != DEFENSE\
+            or self.advantage_offense != DIS_OFFENSE and target.advantage_defense == DIS_DEFENSE:
             # roll two d20, keep highest 1
-            attack_roll_str = "2d20h1"
+            attack_dice = dice.d20_advantage
             
-        elif target.advantage_defense == advantage_type.DEFENSE:
-            attack_roll_str = "2d20l1"
+        elif target.advantage_defense == DEFENSE:
+            attack_dice = dice.d20_disadvantage
 
         # advantages/disadvantages are used after an attempted attack
         self.advantage_offense = None
         target.advantage_defense = None
 
-        attack_roll = dndice.basic(attack_roll_str, 0, self.hit_modifier)
+        attack_roll = attack_dice.roll(self.streams.attack) + self.hit_modifier
 
         if attack_roll-self.hit_modifier == 20:
             # rolling a nat 20 is an automatic hit, and the damage dice are doubled
-            damage = max(dndice.basic(str(self.damage_dice_amount)+"dc"+str(self.damage_die),0,self.damage_modifier),0)
-            result = "A critical hit! %s takes %d damage from %s's attack" %(target, damage, self)
+            damage = max(self.crit_damage_dice.roll(self.streams.damage),0)
+            events.emit(combat_event.ATTACK_CRIT, self, target, damage)
             target.last_struck_by = self
         elif attack_roll >= target.ac:
             # attacks land if they are greather than or equal to the target's armour class
-            damage = max(dndice.basic(str(self.damage_dice_amount)+"d"+str(self.damage_die), 0, self.damage_modifier),0)
-            result = "%s takes %d damage from %s's attack" %(target, damage, self)
+            damage = max(self.damage_dice.roll(self.streams.damage),0)
+            events.emit(combat_event.ATTACK_HIT, self, target, damage)
             target.last_struck_by = self
         else:
             damage = 0
-            result = "%s's attack misses" %(self)
-
-        print(result)
+            events.emit(combat_event.ATTACK_MISS, self, target)
 
         if self.multiattack_modifiers != None and not target.dead:
             damage += self.multiattack(target)
@@ -131,67 +225,67 @@ class Entity:
             self.current_hp = 0
             self.dead = True
             self.unconcious = False
-            print("A massive strike has taken %s's life." %self)
+            events.emit(combat_event.MASSIVE_DAMAGE, self)
         elif self.current_hp <= 0:
             # even if damage is 0, attacks automatically hit unconcious targets
-            self.death_saving_counters[death_save.FAILURE]+=1
+            self.death_saving_counters[FAILURE]+=1
             self.stable = False
             self.resolve_death_counters()
         elif self.current_hp <= damage: # if the entity falls below 0 HP, they fall unconcious
             self.current_hp = 0
             self.unconcious = True
             self.stable = False
-            print("With a thump, %s falls to the ground, unconcious." %self)
+            events.emit(combat_event.KNOCKED_OUT, self)
         else:
             self.current_hp -= damage
 
     def get_advantage(self, type: advantage_type):
-        if type is advantage_type.OFFENSE or advantage_type.DIS_OFFENSE:
+        if type is OFFENSE or DIS_OFFENSE:
             self.advantage_offense = type
-        elif type is advantage_type.DEFENSE or advantage_type.DIS_DEFENSE:
+        elif type is DEFENSE or DIS_DEFENSE:
             self. advantage_defense = type
 
     def harry(self, target: 'Entity'):
-        print("%s harries %s, making attacks against them more likely to land" %(self, target))
-        target.get_advantage(advantage_type.DIS_DEFENSE)
+        events.emit(combat_event.HARRY, self, target)
+        target.get_advantage(DIS_DEFENSE)
         target.harried_by = self
         self.harrying = target
     
     def hinder(self, target: 'Entity'):
-        print("%s hinders %s's efforts, making their attacks less likely to hit" %(self, target))
-        target.get_advantage(advantage_type.DIS_OFFENSE)
+        events.emit(combat_event.HINDER, self, target)
+        target.get_advantage(DIS_OFFENSE)
         target.hindered_by = self
         self.hindering = target
 
     def dodge(self):
-        print("%s takes evasive action, becoming more difficult to hit." %self)
-        self.get_advantage(advantage_type.DEFENSE)
+        events.emit(combat_event.DODGE, self)
+        self.get_advantage(DEFENSE)
 
     def resolve_death_counters(self):
-        if self.death_saving_counters[death_save.FAILURE] > 2:
+        if self.death_saving_counters[FAILURE] > 2:
             self.dead = True
             self.unconcious = False
             self.stable = False
-            print("Alas, %s has died in battle." %self)
-        elif self.death_saving_counters[death_save.SUCCESS] > 2:
+            events.emit(combat_event.DIED, self)
+        elif self.death_saving_counters[SUCCESS] > 2:
             self.unconcious = True
             self.stable = True
             self.death_saving_counters = [0,0]
 
     def death_save_roll(self):
         if not self.stable:
-            roll = dndice.basic("1d20")
+            roll = dice.d20.roll(self.streams.death_save)
             if roll == 1:
-                self.death_saving_counters[death_save.FAILURE] = 3
+                self.death_saving_counters[FAILURE] = 3
             elif roll == 20:
                 self.death_saving_counters = [0,0]
                 self.unconcious = False
                 self.current_hp = 1
-                print("With a gasp, %s rises to fight again!" %self)
+                events.emit(combat_event.REVIVED, self)
             elif roll < 10:
-                self.death_saving_counters[death_save.FAILURE]+=1
+                self.death_saving_counters[FAILURE]+=1
             else:
-                self.death_saving_counters[death_save.SUCCESS]+=1
+                self.death_saving_counters[SUCCESS]+=1
             
             if self.current_hp < 1:
                 self.resolve_death_counters()
@@ -209,23 +303,34 @@ class Entity:
         return "%-15s <HP:%2d/%2d | AC: %2d | to hit: %d | dmg: %dd%d+%d>" %(self, self.current_hp, self.max_hp, 
         self.ac, self.hit_modifier, self.damage_dice_amount, self.damage_die, self.damage_modifier)
 
+def player_attack_modifiers(stats: entity_stats, proficiency_bonus=2):
+    # (to hit, damage modifier): proficiency bonus + either STR or DEX modifier (assuming all weapons are versatile)
+    modifier = max(stats.stat_modifiers["STR"], stats.stat_modifiers["DEX"])
+    return proficiency_bonus + modifier, modifier
+
+def player_multiattack(player_class, player: 'stat_block'):
+    # rogues get a second attack of their weapon die with no modifier
+    if player_class == "rogue":
+        return ("1d"+str(player.dmg_die),0,0)
+    return None
+
 class Player(Entity):
+    __slots__ = ("pc_class", "hit_die")
+
     def __init__(self, player_class):
-        player = players[player_class]
-        super().__init__(player_class, player["stats"], player["hp"], player["ac"], player["hit"], player["dmg_die"])
+        player = get_catalog().player(player_class)
+        super().__init__(player_class, player.stats, player.hp, player.ac, player.hit, player.dmg_die)
         self.pc_class = player_class
-        self.hit_die = player["hp"]
+        self.hit_die = player.hp
 
         self.calculate_attack_modifiers()
         self.resolve_hp()
 
-        if player_class == "rogue":
-            self.multiattack_modifiers = ("1d"+str(player["dmg_die"]),0,0)
+        self.multiattack_modifiers = player_multiattack(player_class, player)
+        self.parse_dice()
 
     def calculate_attack_modifiers(self):
-            # proficiency bonus + either STR or DEX modifier (assuming all weapons are versatile)
-            self.hit_modifier = self.proficiency_bonus + max(self.stats.stat_modifiers["STR"], self.stats.stat_modifiers["DEX"])
-            self.damage_modifier = max(self.stats.stat_modifiers["STR"], self.stats.stat_modifiers["DEX"])
+            self.hit_modifier, self.damage_modifier = player_attack_modifiers(self.stats, self.proficiency_bonus)
     
     def resolve_hp(self):
         # at level 1, player receives (or loses) CON max_hp
@@ -233,28 +338,34 @@ class Player(Entity):
 
         # reroll ones
         # can't lose hp on level up (would only matter on modifiers less than -2)
-        self.max_hp += max(0, self.stats.stat_modifiers["CON"] + dndice.basic("1d"+str(self.hit_die)+"R1"))
+        self.max_hp += max(0, self.stats.stat_modifiers["CON"] + dice.parse("1d%dR1" %self.hit_die).roll(self.streams.hit_points))
 
         self.current_hp = 0 + self.max_hp
 
+    def reset(self):
+        # a reset PC rolls their HP again, drawing the same dice a newly built PC would
+        super().reset()
+        self.max_hp = self.hit_die
+        self.resolve_hp()
+
     def __str__(self):
         return "(PC)"+self.name.title()
 
 def resolve_CR(monster_type):
-    for cr in monsters:
-        if monster_type in monsters[cr]:
-            return cr
+    return get_catalog().cr_of(monster_type)
 
 class Monster(Entity):
-    def __init__(self, monster_type, monster, name=False):
+    __slots__ = ("cr",)
+
+    def __init__(self, monster_type, monster: 'stat_block', name=False):
         if not name:
             name = monster_type
-        super().__init__(name, monster["stats"], monster["hp"], monster["ac"], monster["hit"],
-        monster["dmg_die"], monster["dice_amount"], monster["dmg_mod"])
-        self.cr = resolve_CR(monster_type)
-        self.last_struck_by = None
-        if "multiattack" in monster:
-            self.multiattack_modifiers = monster["multiattack"]
+        super().__init__(name, monster.stats, monster.hp, monster.ac, monster.hit,
+        monster.dmg_die, monster.dice_amount, monster.dmg_mod)
+        self.cr = monster.cr
+        if monster.multiattack != None:
+            self.multiattack_modifiers = monster.multiattack
+            self.parse_dice()
 
     def take_action(self, possible_targets):
         # we'll keep the assumption of at most 1 PC and 1 sidekick as targets
@@ -263,7 +374,7 @@ class Monster(Entity):
         #   otherwise, randomly selects a target
 
         # We'll assume that monsters rarely try to dodge
-        if random.random()<0.1:
+        if self.streams.choice.random()<0.1:
             self.dodge()
             return 0, None
 
@@ -278,7 +389,7 @@ class Monster(Entity):
             elif self.last_struck_by != None:
                 target = self.last_struck_by
             else:
-                if random.random() < 0.5:
+                if self.streams.choice.random() < 0.5:
                     target = possible_targets[0]
                 else:
                     target = possible_targets[1]
@@ -290,7 +401,7 @@ class Monster(Entity):
             self.current_hp = 0
             self.dead = True
             self.stable = False
-            print("The wicked %s has been slain!" %self)
+            events.emit(combat_event.SLAIN, self)
         else:
             self.current_hp -= damage
 
@@ -298,14 +409,17 @@ class Monster(Entity):
         return "(M)"+self.name.title()
 
 class Sidekick(Entity):
-    def __init__(self, sidekick_type, sidekick, name=False):
+    __slots__ = ()
+
+    def __init__(self, sidekick_type, sidekick: 'stat_block', name=False):
         if not name:
             name = sidekick_type
-        super().__init__(name, sidekick["stats"], sidekick["hp"], sidekick["ac"], sidekick["hit"],
-        sidekick["dmg_die"], sidekick["dice_amount"], sidekick["dmg_mod"])
+        super().__init__(name, sidekick.stats, sidekick.hp, sidekick.ac, sidekick.hit,
+        sidekick.dmg_die, sidekick.dice_amount, sidekick.dmg_mod)
 
-        if "multiattack" in sidekick:
-            self.multiattack_modifiers = sidekick["multiattack"]
+        if sidekick.multiattack != None:
+            self.multiattack_modifiers = sidekick.multiattack
+            self.parse_dice()
 
     def take_action(self, damage_dealt, player_health):
         return 0
@@ -319,407 +433,135 @@ def bloodied(target: Entity):
         return True
     return False
 
-monsters = {
-    "1/8":{
-        "kobold" : {
-            "stats": entity_stats(7,15,9,8,7,8),
-            "hp": 5,
-            "ac": 12,
-            "hit": 2,
-            "dmg_die": 4,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "flying snake" : {
-            "stats": entity_stats(4,18,11,2,12,5),
-            "hp": 5,
-            "ac": 14,
-            "hit": 6,
-            "dmg_die": 4,
-            "dice_amount": 3,
-            "dmg_mod": 1
-        },
-        "giant rat" : {
-            "stats": entity_stats(7,15,11,2,10,4),
-            "hp": 7,
-            "ac": 12,
-            "hit": 4,
-            "dmg_die": 4,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "giant weasel" : {
-            "stats": entity_stats(11,16,10,4,12,5),
-            "hp": 9,
-            "ac": 13,
-            "hit": 5,
-            "dmg_die": 4,
-            "dice_amount": 1,
-            "dmg_mod": 3
-        },
-        "giant crab" : {
-            "stats": entity_stats(13,15,11,1,9,3),
-            "hp": 13,
-            "ac": 15,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "merfolk" : {
-            "stats": entity_stats(10,13,12,11,11,12),
-            "hp": 11,
-            "ac": 11,
-            "hit": 2,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 0
-        },
-        "bandit" : {
-            "stats": entity_stats(11,12,12,10,10,10),
-            "hp": 11,
-            "ac": 12,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "guard" : {
-            "stats": entity_stats(13,12,12,10,11,10),
-            "hp": 11,
-            "ac": 16,
-            "hit": 3,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "cultist" : {
-            "stats": entity_stats(11,12,10,10,11,10),
-            "hp": 9,
-            "ac": 12,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "tribal warrior" : {
-            "stats": entity_stats(13,11,12,8,11,8),
-            "hp": 11,
-            "ac": 12,
-            "hit": 3,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-    },
-    "1/4": {
-        "acolyte" : {
-            "stats": entity_stats(10,10,10,10,14,11),
-            "hp": 9,
-            "ac": 10,
-            "hit": 2,
-            "dmg_die": 4,
-            "dice_amount": 1,
-            "dmg_mod": 0
-        },
-        "axe beak" : {
-            "stats": entity_stats(14,12,12,2,10,5),
-            "hp": 19,
-            "ac": 11,
-            "hit": 4,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "goblin" : {
-            "stats": entity_stats(8,14,10,10,8,8),
-            "hp": 7,
-            "ac": 15,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "blink dog" : {
-            "stats": entity_stats(12,17,12,10,13,11),
-            "hp": 22,
-            "ac": 13,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "skeleton" : {
-            "stats": entity_stats(10,14,15,6,8,5),
-            "hp": 13,
-            "ac": 13,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "giant frog" : {
-            "stats": entity_stats(12,13,11,2,10,3),
-            "hp": 18,
-            "ac": 11,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "drow" : {
-            "stats": entity_stats(10,14,10,11,11,12),
-            "hp": 13,
-            "ac": 15,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "dretch" : {
-            "stats": entity_stats(11,11,12,5,8,3),
-            "hp": 18,
-            "ac": 11,
-            "hit": 2,
-            "dmg_die": 4,
-            "dice_amount": 2,
-            "dmg_mod": 0,
-            "multiattack": ("2d4",0)
-        },
-        "grimlock" : {
-            "stats": entity_stats(16,12,12,9,8,6),
-            "hp": 11,
-            "ac": 11,
-            "hit": 5,
-            "dmg_die": 4,
-            "dice_amount": 2,
-            "dmg_mod": 3
-        },
-        "wolf" : {
-            "stats": entity_stats(12,15,12,3,12,6),
-            "hp": 11,
-            "ac": 13,
-            "hit": 4,
-            "dmg_die": 4,
-            "dice_amount": 2,
-            "dmg_mod": 2
-        },
-        "giant lizard" : {
-            "stats": entity_stats(15,12,13,2,10,5),
-            "hp": 19,
-            "ac": 12,
-            "hit": 4,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "giant owl" : {
-            "stats": entity_stats(13,15,12,8,13,10),
-            "hp": 19,
-            "ac": 12,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 2,
-            "dmg_mod": 1
-        },
-        "giant bat" : {
-            "stats": entity_stats(15,16,11,2,12,6),
-            "hp": 22,
-            "ac": 13,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "giant badger" : {
-            "stats": entity_stats(13,10,15,2,12,5),
-            "hp": 13,
-            "ac": 10,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1,
-            "multiattack": ("2d4",1)
-        },
-        "elk" : {
-            "stats": entity_stats(16,10,12,2,10,6),
-            "hp": 13,
-            "ac": 10,
-            "hit": 4,
-            "dmg_die": 4,
-            "dice_amount": 2,
-            "dmg_mod": 3
-        },
-        "flying sword" : {
-            "stats": entity_stats(12,15,11,1,5,1),
-            "hp": 17,
-            "ac": 17,
-            "hit": 3,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        },
-        "panther" : {
-            "stats": entity_stats(13,15,10,3,14,7),
-            "hp": 13,
-            "ac": 12,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "zombie" : {
-            "stats": entity_stats(13,6,16,3,6,5),
-            "hp": 22,
-            "ac": 8,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 1
-        }
-    },
-    "1/2": {
-        "ape" : {
-            "stats": entity_stats(16,14,14,6,12,7),
-            "hp": 19,
-            "ac": 12,
-            "hit": 5,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 3,
-            "multiattack": ("1d6",3)
-        },
-        "black bear" : {
-            "stats": entity_stats(15,10,14,2,12,7),
-            "hp": 19,
-            "ac": 11,
-            "hit": 5,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2,
-            "multiattack": ("2d4",2)
-        },
-        "svirfneblin" : {
-            "stats": entity_stats(15,14,14,12,10,9),
-            "hp": 16,
-            "ac": 15,
-            "hit": 4,
-            "dmg_die": 8,
-            "dice_amount": 1,
-            "dmg_mod": 2
-        },
-        "lizardfolk" : {
-            "stats": entity_stats(15,10,13,7,12,7),
-            "hp": 22,
-            "ac": 15,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2,
-            "multiattack": ("1d6",2)
-        },
-        "orc" : {
-            "stats": entity_stats(16,12,16,7,11,10),
-            "hp": 15,
-            "ac": 13,
-            "hit": 5,
-            "dmg_die": 12,
-            "dice_amount": 1,
-            "dmg_mod": 3
-        },
-        "sahuagin" : {
-            "stats": entity_stats(13,11,12,12,13,9),
-            "hp": 22,
-            "ac": 12,
-            "hit": 3,
-            "dmg_die": 4,
-            "dice_amount": 1,
-            "dmg_mod": 1,
-            "multiattack": ("1d8",1)
-        },
-        "satyr" : {
-            "stats": entity_stats(12,16,11,12,10,14),
-            "hp": 31,
-            "ac": 14,
-            "hit": 3,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 3
-        },
-        "scout" : {
-            "stats": entity_stats(11,14,12,11,13,11),
-            "hp": 16,
-            "ac": 13,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2,
-            "multiattack": ("1d6",2)
-        },
-        "thug" : {
-            "stats": entity_stats(15,11,14,10,10,11),
-            "hp": 32,
-            "ac": 11,
-            "hit": 4,
-            "dmg_die": 6,
-            "dice_amount": 1,
-            "dmg_mod": 2,
-            "multiattack": ("1d6",2)
-        },
-        "worg" : {
-            "stats": entity_stats(16,13,13,7,11,8),
-            "hp": 26,
-            "ac": 13,
-            "hit": 5,
-            "dmg_die": 6,
-            "dice_amount": 2,
-            "dmg_mod": 3
-        },
-    },
-}
-
-players = {
-    # we'll keep the players as very simplified entities for now
-    # just with standard array stats, no race modifiers
-    "fighter": {
-        "stats": entity_stats(15,13,14,8,12,10),
-        "hp": 10,
-        # shield
-        "ac": 16+2,
-        "hit": 0,
-        # longsword (1-hand)
-        "dmg_die": 8
-    },
-    "rogue": {
-        "stats": entity_stats(8,15,13,10,14,12),
-        "hp": 8,
-        "ac": 11+2,
-        "hit": 0,
-        # shortsword
-        "dmg_die": 6,
-    },
-    "barbarian": {
-        "stats": entity_stats(14,13,15,10,12,8),
-        "hp": 12,
-        "ac": 10+1+2,
-        "hit": 0,
-        # greataxe
-        "dmg_die": 12,
-    },
-    "paladin": {
-        "stats": entity_stats(15,8,14,10,12,13),
-        "hp": 10,
-        "ac": 16,
-        "hit": 0,
-        # battleaxe (2-hand)
-        "dmg_die": 10,
-    },
-    "warlock": {
-        "stats": entity_stats(12,8,10,14,13,15),
-        "hp": 8,
-        "ac": 11,
-        "hit": 0,
-        # mace
-        "dmg_die": 6,
-    },
-}
\ No newline at end of file
+# Stat blocks live in catalog.json, one bucket per CR for monsters plus the player classes. The
+# file is read the first time the catalog is needed, and then indexed by name and by CR.
+catalog_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+class stat_block:
+    __slots__ = ("name", "cr", "stats", "hp", "ac", "hit", "dmg_die", "dice_amount", "dmg_mod", "multiattack", "notes")
+
+    def __init__(self, name, cr, stats: entity_stats, hp, ac, hit, dmg_die, dice_amount=1, dmg_mod=0, multiattack=None,
+                 notes=None):
+        self.name = name
+        self.cr = cr
+        self.stats = stats
+        self.hp = hp
+        self.ac = ac
+        self.hit = hit
+        self.dmg_die = dmg_die
+        self.dice_amount = dice_amount
+        self.dmg_mod = dmg_mod
+        # (dice expression, modifier) for a second attack, if the creature has one
+        self.multiattack = multiattack
+        self.notes = notes
+
+    def __repr__(self):
+        return "<stat_block %s CR %s>" %(self.name, self.cr)
+
+class weighted_sampler:
+    # draws stat blocks in proportion to their weights, in O(log n) per draw
+    def __init__(self, blocks, weights):
+        self.blocks = tuple(blocks)
+        self.cumulative = list(itertools.accumulate(weights))
+        if len(self.blocks) == 0 or self.cumulative[-1] <= 0:
+            raise ValueError("weighted sampling needs at least one positive weight")
+
+    def sample(self, rng=None):
+        point = (rng or random).random()*self.cumulative[-1]
+        return self.blocks[bisect.bisect_right(self.cumulative, point)]
+
+class catalog:
+    def __init__(self, monsters, players):
+        # monsters and players are lists of stat_blocks; monsters keep their file order within a CR
+        self.monsters = {block.name: block for block in monsters}
+        self.players = {block.name: block for block in players}
+        self.by_cr = {}
+        for block in monsters:
+            self.by_cr.setdefault(block.cr, []).append(block)
+        self.by_cr = {cr: tuple(blocks) for cr, blocks in self.by_cr.items()}
+        self.crs = tuple(self.by_cr)
+        self.roster = tuple(monsters)
+        self.classes = tuple(players)
+        self.views = None
+
+    def monster(self, monster_type):
+        return self.monsters[monster_type]
+
+    def player(self, player_class):
+        return self.players[player_class]
+
+    def cr_of(self, monster_type):
+        block = self.monsters.get(monster_type)
+        return block.cr if block != None else None
+
+    def sample(self, cr=None, rng=None):
+        # uniform over one CR bucket, or over the whole roster
+        return (rng or random).choice(self.by_cr[cr] if cr != None else self.roster)
+
+    def sample_by_cr(self, rng=None):
+        # a uniformly chosen CR, then a uniformly chosen monster within it
+        rng = rng or random
+        return rng.choice(self.by_cr[rng.choice(self.crs)])
+
+    def sample_player(self, rng=None):
+        return (rng or random).choice(self.classes)
+
+    def sampler(self, weights, cr=None):
+        # weights maps monster names to weights (missing names weigh 0), or is a function of the stat block
+        blocks = self.by_cr[cr] if cr != None else self.roster
+        if callable(weights):
+            return weighted_sampler(blocks, [weights(block) for block in blocks])
+        return weighted_sampler(blocks, [weights.get(block.name, 0) for block in blocks])
+
+    def legacy_views(self):
+        # read-only {cr: {name: fields}} and {class: fields}, shaped like the old module dicts; built
+        # the first time something asks for entities.monsters or entities.players
+        if self.views == None:
+            monsters = MappingProxyType({cr: MappingProxyType({block.name: block_fields(block) for block in blocks})
+                                         for cr, blocks in self.by_cr.items()})
+            players = MappingProxyType({block.name: block_fields(block) for block in self.classes})
+            self.views = (monsters, players)
+        return self.views
+
+def block_fields(block):
+    fields = {"stats": block.stats, "hp": block.hp, "ac": block.ac, "hit": block.hit, "dmg_die": block.dmg_die,
+              "dice_amount": block.dice_amount, "dmg_mod": block.dmg_mod}
+    if block.multiattack != None:
+        fields["multiattack"] = block.multiattack
+    return MappingProxyType(fields)
+
+def stat_block_from(name, cr, data):
+    multiattack = tuple(data["multiattack"]) if "multiattack" in data else None
+    return stat_block(name, cr, entity_stats(*data["stats"]), data["hp"], data["ac"], data["hit"], data["dmg_die"],
+                      data.get("dice_amount", 1), data.get("dmg_mod", 0), multiattack, data.get("notes"))
+
+def load_catalog(path=catalog_path):
+    with open(path) as file:
+        data = json.load(file)
+    monsters = [stat_block_from(name, cr, block) for cr, bucket in data["monsters"].items() for name, block in bucket.items()]
+    players = [stat_block_from(name, None, block) for name, block in data["players"].items()]
+    return catalog(monsters, players)
+
+loaded_catalog = None
+
+def get_catalog():
+    global loaded_catalog
+    if loaded_catalog == None:
+        loaded_catalog = load_catalog()
+    return loaded_catalog
+
+def set_catalog(new_catalog):
+    # swaps in another catalog (e.g. a larger roster) and returns the previous one
+    global loaded_catalog
+    previous = loaded_catalog
+    loaded_catalog = new_catalog
+    return previous
+
+def __getattr__(name):
+    # entities.monsters and entities.players are views of whichever catalog is loaded, so importing
+    # this module still doesn't read catalog.json
+    if name == "monsters":
+        return get_catalog().legacy_views()[0]
+    if name == "players":
+        return get_catalog().legacy_views()[1]
+    raise AttributeError("module %r has no attribute %r" %(__name__, name))
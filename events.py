@@ -0,0 +1,109 @@
+from enum import Enum
+
+# Structured combat events. Entities and actors emit an event kind with the acting entity,
+# its target and a value (damage dealt, or (action, rule strengths) for a decision), and the
+# current sink decides what that costs: nothing, console narration, or a compact record.
+
+class combat_event(Enum):
+    ATTACK_CRIT = 0
+    ATTACK_HIT = 1
+    ATTACK_MISS = 2
+    MULTIATTACK_CRIT = 3
+    MULTIATTACK_HIT = 4
+    MULTIATTACK_MISS = 5
+    MASSIVE_DAMAGE = 6
+    KNOCKED_OUT = 7
+    HARRY = 8
+    HINDER = 9
+    DODGE = 10
+    DIED = 11
+    REVIVED = 12
+    SLAIN = 13
+    UNCONCIOUS_TURN = 14
+    CORPSE_TURN = 15
+    WAIT = 16
+    DECISION = 17
+
+# console text for each event, with the (actor, target, value) fields it fills in, in order
+templates = {
+    combat_event.ATTACK_CRIT: ("A critical hit! %s takes %d damage from %s's attack", (1, 2, 0)),
+    combat_event.ATTACK_HIT: ("%s takes %d damage from %s's attack", (1, 2, 0)),
+    combat_event.ATTACK_MISS: ("%s's attack misses", (0,)),
+    combat_event.MULTIATTACK_CRIT: ("%s's multiattack critically hits %s for %d damage!", (0, 1, 2)),
+    combat_event.MULTIATTACK_HIT: ("%s's multiattack strikes %s for %d damage", (0, 1, 2)),
+    combat_event.MULTIATTACK_MISS: ("%s's multiattack misses", (0,)),
+    combat_event.MASSIVE_DAMAGE: ("A massive strike has taken %s's life.", (0,)),
+    combat_event.KNOCKED_OUT: ("With a thump, %s falls to the ground, unconcious.", (0,)),
+    combat_event.HARRY: ("%s harries %s, making attacks against them more likely to land", (0, 1)),
+    combat_event.HINDER: ("%s hinders %s's efforts, making their attacks less likely to hit", (0, 1)),
+    combat_event.DODGE: ("%s takes evasive action, becoming more difficult to hit.", (0,)),
+    combat_event.DIED: ("Alas, %s has died in battle.", (0,)),
+    combat_event.REVIVED: ("With a gasp, %s rises to fight again!", (0,)),
+    combat_event.SLAIN: ("The wicked %s has been slain!", (0,)),
+    combat_event.UNCONCIOUS_TURN: ("%s lies unconcious...", (0,)),
+    combat_event.CORPSE_TURN: ("%s's corpse is motionless...", (0,)),
+    combat_event.WAIT: ("%s patiently bides their time...", (0,)),
+}
+
+def render(kind, actor, target=None, value=None):
+    if kind == combat_event.DECISION:
+        suggested_action, rule_strengths = value
+        lines = ["%s considers their action carefully..." %actor]
+        for action_type, strength in rule_strengths:
+            lines.append("%s\t%.2f" %(action_type.name, strength))
+        return "\n".join(lines)
+    template, order = templates[kind]
+    fields = (actor, target, value)
+    return template %tuple(fields[i] for i in order)
+
+class null_sink:
+    def emit(self, kind, actor, target=None, value=None):
+        pass
+
+class console_sink:
+    # sidekick decisions are only narrated in verbose mode
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+
+    def emit(self, kind, actor, target=None, value=None):
+        if kind == combat_event.DECISION and not self.verbose:
+            return
+        print(render(kind, actor, target, value))
+
+class recorder_sink:
+    # keeps each event as a (kind, actor, target, value) tuple
+    def __init__(self):
+        self.events = []
+
+    def emit(self, kind, actor, target=None, value=None):
+        self.events.append((kind, actor, target, value))
+
+    def lines(self):
+        return [render(*recorded) for recorded in self.events]
+
+    def clear(self):
+        self.events.clear()
+
+class tee_sink(recorder_sink):
+    # records each event and passes it on to another sink
+    def __init__(self, forward):
+        super().__init__()
+        self.forward = forward
+
+    def emit(self, kind, actor, target=None, value=None):
+        self.events.append((kind, actor, target, value))
+        self.forward.emit(kind, actor, target, value)
+
+null = null_sink()
+console = console_sink()
+
+sink = console
+emit = sink.emit
+
+def set_sink(new_sink):
+    # returns the previous sink so callers can restore it
+    global sink, emit
+    previous = sink
+    sink = new_sink
+    emit = new_sink.emit
+    return previous
@@ -1,4 +1,5 @@
 from enum import Enum
+import collections, hashlib, os, pickle, sys
 
 class action(Enum):
     AGGRESSIVE = 0
@@ -6,18 +7,30 @@ class action(Enum):
     DEFENSIVE = 2
     SELF_PRESERVE = 3
 
-class rectangle_coefficients:
+# Runtime changes to the membership functions are counted in membership_version, which whatever is
+# derived from membership_fxns checks on lookup: the decision tables, the compiled inferences for
+# the module globals and any decision cache. Changing a coefficient of a function already set up,
+# adding, replacing or removing anything in membership_fxns or a dict inside it, and assigning a
+# new membership_fxns all count. Building, unpickling or copying functions and dicts does not.
+class membership_coefficients:
+  def __setattr__(self, name, value):
+    # only an attribute that is already there is being edited
+    if name in self.__dict__:
+      membership_changed()
+    object.__setattr__(self, name, value)
+
+class rectangle_coefficients(membership_coefficients):
   def __init__(self, a, b):
     self.a = a
     self.b = b
 
-class triangle_coefficients:
+class triangle_coefficients(membership_coefficients):
   def __init__(self, a, b, c):
     self.a = a
     self.b = b
     self.c = c
 
-class trapezoid_coefficients:
+class trapezoid_coefficients(membership_coefficients):
   def __init__(self, a, b, c, d):
     self.a = a
     self.b = b
@@ -65,6 +78,56 @@ def calculate_membership_value(coefficients, value):
   return membership_value
     # error
 
+class membership_dict(dict):
+  # membership_fxns and the dicts inside it; a dict stored in one is watched as well
+  def __init__(self, *args, **kwargs):
+    dict.__init__(self)
+    for key, value in dict(*args, **kwargs).items():
+      dict.__setitem__(self, key, watched(value))
+
+  def __reduce__(self):
+    # rebuilt through __init__, so unpickling or copying is not an edit
+    return membership_dict, (dict(self),)
+
+  def __setitem__(self, key, value):
+    membership_changed()
+    dict.__setitem__(self, key, watched(value))
+
+  def __delitem__(self, key):
+    membership_changed()
+    dict.__delitem__(self, key)
+
+  def __ior__(self, other):
+    self.update(other)
+    return self
+
+  def update(self, *args, **kwargs):
+    for key, value in dict(*args, **kwargs).items():
+      self[key] = value
+
+  def setdefault(self, key, default=None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def pop(self, key, *default):
+    if key in self:
+      membership_changed()
+    return dict.pop(self, key, *default)
+
+  def popitem(self):
+    membership_changed()
+    return dict.popitem(self)
+
+  def clear(self):
+    membership_changed()
+    dict.clear(self)
+
+def watched(value):
+  if type(value) == dict:
+    return membership_dict(value)
+  return value
+
 # PC max health range = 8 to 28
 # barbarian health range = 12 to 28
 # fighter health range = paladin health range = 10 to 24
@@ -159,6 +222,7 @@ membership_fxns = {
     },
   }
 }
+membership_fxns = membership_dict(membership_fxns)
 
 def goguen_t(x, y):
   return x * y
@@ -189,8 +253,21 @@ def drastic_s(x,y):
     return x
   else:
     return 1
+
+# the t-norm/s-norm pairs, by name
+norm_pairs = {
+  "goguen": (goguen_t, goguen_s),
+  "godel": (godel_t, godel_s),
+  "lukasiewicz": (lukasiewicz_t, lukasiewicz_s),
+  "drastic": (drastic_t, drastic_s)
+}
   
 def calculate_memberships(frame):
+  return memberships_for(frame, player_knowledge, enemy_knowledge)
+
+def memberships_for(frame, player_knowledge, enemy_knowledge, membership_set=None):
+  if membership_set == None:
+    membership_set = membership_fxns
   memberships = {
     "player_health": {
       "low" : 0,
@@ -211,10 +288,10 @@ def calculate_memberships(frame):
   for stat in memberships:
     if stat == "player_health":
       for level in memberships[stat]:
-        memberships[stat][level] = calculate_membership_value(membership_fxns[stat][player_knowledge][level],frame[stat])
+        memberships[stat][level] = calculate_membership_value(membership_set[stat][player_knowledge][level],frame[stat])
     else:
       for level in memberships[stat]:
-        memberships[stat][level] = calculate_membership_value(membership_fxns[stat][enemy_knowledge][level],frame[stat])
+        memberships[stat][level] = calculate_membership_value(membership_set[stat][enemy_knowledge][level],frame[stat])
   return memberships
 
 # Goals:  1. PC does not die
@@ -223,6 +300,9 @@ def calculate_memberships(frame):
 #         4. Sidekick does not reach 0 HP
 #         5. Sidekick's damage contribution is not significantly higher than the PC's
 def apply_rules(memberships):
+  return rules_for(memberships, t_norm, s_norm)
+
+def rules_for(memberships, t_norm, s_norm):
   damage_dealt = memberships["damage_dealt"]
   player_health = memberships["player_health"]
   sidekick_health = memberships["sidekick_health"]
@@ -243,11 +323,442 @@ def apply_rules(memberships):
 
   return max(rule_strengths, key=rule_strengths.get), rule_strengths.items()
 
+# Compiled inference. The rules only read four memberships (player and sidekick health low,
+# damage dealt low and high), so for a given set of membership functions and norm pair the whole
+# decision is generated as one straight-line function: each membership is lowered to trapezoid
+# breakpoints with the constants inlined, the known norms are inlined too, and the best action is
+# picked the way max() over the rule strengths picks it, the first of equal strengths winning.
+# Every branch and formula is the one trapezoid_membership, triangle_membership and the norm
+# functions use, so the strengths come out the same, ints and floats alike. Most frames sit on
+# the flat parts of all four memberships, where each is exactly 0 or 1; those sixteen outcomes
+# come from rules_for when the function is compiled and are returned as they are.
+
+# the memberships the rules read, as (variable, stat, level)
+rule_inputs = (
+  ("player_low", "player_health", "low"),
+  ("sidekick_low", "sidekick_health", "low"),
+  ("damage_low", "damage_dealt", "low"),
+  ("damage_high", "damage_dealt", "high")
+)
+
+# statements computing a norm of two variables into a third; other norms are called
+inline_norms = {
+  goguen_t: ("{r} = {x}*{y}",),
+  goguen_s: ("{r} = {x} + {y} - {x}*{y}",),
+  godel_t: ("{r} = {y} if {y} < {x} else {x}",),
+  godel_s: ("{r} = {y} if {y} > {x} else {x}",),
+  lukasiewicz_t: ("{r} = {x} + {y} - 1", "{r} = {r} if {r} > 0 else 0"),
+  lukasiewicz_s: ("{r} = {x} + {y}", "{r} = {r} if {r} < 1 else 1"),
+  drastic_t: ("{r} = {y} if {x} == 1 else {x} if {y} == 1 else 0",),
+  drastic_s: ("{r} = {y} if {x} == 0 else {x} if {y} == 0 else 1",)
+}
+
+compiled_inference_limit = 256
+
+def breakpoints(coefficients):
+  # a triangle (a, b, c) is the trapezoid (a, b, b, c), down to which branch each value takes
+  if type(coefficients) == triangle_coefficients:
+    return (coefficients.a, coefficients.b, coefficients.b, coefficients.c)
+  elif type(coefficients) == trapezoid_coefficients:
+    return (coefficients.a, coefficients.b, coefficients.c, coefficients.d)
+  raise TypeError("unsupported membership function: %s" %type(coefficients).__name__)
+
+def membership_code(name, value, points):
+  # trapezoid_membership with the breakpoints folded in; branches no value can reach are left out,
+  # and the sloped ones flag the frame as needing the rules worked through
+  a, b, c, d = points
+  lines = ["if %s > %r: %s = 0" %(value, d, name)]
+  if d == c:
+    lines.append("elif %s == %r: %s = 1" %(value, d, name))
+  else:
+    lines.append("elif %s > %r: %s = (%r - %s)/%r; sloped = 1" %(value, c, name, d, value, d - c))
+  lines.append("elif %s >= %r: %s = 1" %(value, b, name))
+  if b != a:
+    lines.append("elif %s > %r: %s = (%s - %r)/%r; sloped = 1" %(value, a, name, value, a, b - a))
+  lines.append("else: %s = 0" %name)
+  return lines
+
+def norm_code(norm, name, r, x, y):
+  if norm in inline_norms:
+    return [line.format(r=r, x=x, y=y) for line in inline_norms[norm]]
+  return ["%s = %s(%s, %s)" %(r, name, x, y)]
+
+def inference_source(points, t_norm, s_norm):
+  lines = ["def infer(frame):"]
+  body = [
+    'player_health = frame["player_health"]',
+    'sidekick_health = frame["sidekick_health"]',
+    'damage_dealt = frame["damage_dealt"]',
+    "sloped = 0"
+  ]
+  for (name, stat, _), stat_points in zip(rule_inputs, points):
+    body += membership_code(name, stat, stat_points)
+  body += [
+    "if not sloped: return flat_outcomes[8*player_low + 4*sidekick_low + 2*damage_low + damage_high]",
+    "not_player_low = 1 - player_low",
+    "not_sidekick_low = 1 - sidekick_low",
+    "not_damage_low = 1 - damage_low",
+    "not_damage_high = 1 - damage_high"
+  ]
+  # the same rules as rules_for, one norm at a time
+  body += norm_code(t_norm, "t_norm", "either", "not_damage_high", "not_sidekick_low")
+  body += norm_code(t_norm, "t_norm", "both", "player_low", "sidekick_low")
+  body += norm_code(s_norm, "s_norm", "aggressive", "either", "both")
+  body += norm_code(t_norm, "t_norm", "supportive", "not_player_low", "not_damage_low")
+  body += norm_code(s_norm, "s_norm", "either", "not_sidekick_low", "not_damage_low")
+  body += norm_code(t_norm, "t_norm", "defensive", "player_low", "either")
+  body += norm_code(t_norm, "t_norm", "self_preserve", "not_player_low", "sidekick_low")
+  body += [
+    "best = AGGRESSIVE",
+    "strength = aggressive",
+    "if supportive > strength: best = SUPPORTIVE; strength = supportive",
+    "if defensive > strength: best = DEFENSIVE; strength = defensive",
+    "if self_preserve > strength: best = SELF_PRESERVE",
+    "return best, ((AGGRESSIVE, aggressive), (SUPPORTIVE, supportive), (DEFENSIVE, defensive), "
+    "(SELF_PRESERVE, self_preserve))"
+  ]
+  return "\n".join(lines + ["  " + line for line in body]) + "\n"
+
+def flat_outcomes(t_norm, s_norm):
+  # (action, rule strengths) for every combination of 0/1 memberships, indexed as infer indexes them
+  outcomes = []
+  for index in range(16):
+    player_low, sidekick_low, damage_low, damage_high = (index >> 3) & 1, (index >> 2) & 1, (index >> 1) & 1, index & 1
+    suggested_action, rule_strengths = rules_for({
+      "player_health": {"low": player_low},
+      "sidekick_health": {"low": sidekick_low},
+      "damage_dealt": {"low": damage_low, "high": damage_high}
+    }, t_norm, s_norm)
+    outcomes.append((suggested_action, tuple(rule_strengths)))
+  return tuple(outcomes)
+
+def compile_inference(player_levels, sidekick_levels, damage_levels, t_norm, s_norm):
+  # frame -> (action, rule strengths) for one context, shared by every engine with the
+  # same breakpoints and norms
+  points = tuple(breakpoints(levels[level]) for levels, level in
+                 zip((player_levels, sidekick_levels, damage_levels, damage_levels), ("low", "low", "low", "high")))
+  key = (points, t_norm, s_norm)
+  infer = compiled_inferences.get(key)
+  if infer == None:
+    # a tuning run compiles a function per candidate; start over rather than keep them all
+    if len(compiled_inferences) >= compiled_inference_limit:
+      compiled_inferences.clear()
+    namespace = {member.name: member for member in action}
+    namespace.update(t_norm=t_norm, s_norm=s_norm, flat_outcomes=flat_outcomes(t_norm, s_norm))
+    exec(compile(inference_source(points, t_norm, s_norm), "<fuzzy inference>", "exec"), namespace)
+    infer = compiled_inferences[key] = namespace["infer"]
+  return infer
+
+def get_inference(player_knowledge, enemy_knowledge, t_norm, s_norm):
+  # for the module globals; recompiled once membership_fxns has changed
+  global inferences_version
+  version = current_membership_version()
+  if version != inferences_version:
+    inferences.clear()
+    inferences_version = version
+  key = (player_knowledge, enemy_knowledge, t_norm, s_norm)
+  infer = inferences.get(key)
+  if infer == None:
+    infer = inferences[key] = compile_inference(membership_fxns["player_health"][player_knowledge],
+                                                membership_fxns["sidekick_health"][enemy_knowledge],
+                                                membership_fxns["damage_dealt"][enemy_knowledge], t_norm, s_norm)
+  return infer
+
 def suggest_action(frame):
-  return apply_rules(calculate_memberships(frame))
+  if decisions != None:
+    return decisions.decide(frame, (player_knowledge, enemy_knowledge, t_norm, s_norm), evaluate)
+  return evaluate(frame)
+
+def evaluate(frame):
+  if compiled_tables:
+    return get_decision_table(player_knowledge, enemy_knowledge, t_norm, s_norm).lookup(frame)
+  return get_inference(player_knowledge, enemy_knowledge, t_norm, s_norm)(frame)
+
+# An LRU memo of decisions in front of suggest_action, off by default (see set_decision_cache).
+# Entries are keyed by the frame and what the decision was made under: the knowledge context and
+# norm pair for the module globals, so changing either of those just looks up other entries, or
+# the compiled inference for a FuzzyEngine, which stands for its context, norms and membership set.
+# Any change to membership_fxns drops every entry (see membership_changed). With a quantum, frame
+# values are rounded to multiples of it and the decision is made for the rounded frame, so nearby
+# float frames share an entry; without one, values key as they are.
+class decision_cache:
+  def __init__(self, size=65536, quantum=None):
+    if size < 1:
+      raise ValueError("a decision cache needs room for at least one entry")
+    self.size = size
+    self.quantum = quantum
+    self.entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.invalidations = 0
+    self.version = current_membership_version()
+
+  def quantize(self, frame):
+    quantum = self.quantum
+    return {stat: round(frame[stat]/quantum)*quantum for stat in ("player_health", "sidekick_health", "damage_dealt")}
+
+  def invalidate(self):
+    self.entries.clear()
+    self.invalidations += 1
+    self.version = current_membership_version()
+
+  def decide(self, frame, context, evaluate):
+    if current_membership_version() != self.version:
+      self.invalidate()
+    if self.quantum != None:
+      frame = self.quantize(frame)
+    key = (frame["player_health"], frame["sidekick_health"], frame["damage_dealt"], context)
+    entries = self.entries
+    decision = entries.get(key)
+    if decision != None:
+      entries.move_to_end(key)
+      self.hits += 1
+      return decision
+    self.misses += 1
+    decision = entries[key] = evaluate(frame)
+    if len(entries) > self.size:
+      entries.popitem(last=False)
+      self.evictions += 1
+    return decision
+
+  def clear(self):
+    # drops the entries, keeping the counters
+    self.entries.clear()
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self.entries),
+      "size": self.size,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "invalidations": self.invalidations,
+      "hit_rate": self.hits/lookups if lookups else 0.0
+    }
+
+def set_decision_cache(cache):
+  # a decision_cache, or None to turn caching off; returns the previous one so callers can restore it
+  global decisions
+  previous = decisions
+  decisions = cache
+  return previous
+
+# Every frame value is a small non-negative integer: player health up to 28, sidekick health
+# up to 32 and combined damage up to 64. For a given knowledge context and norm pair the whole
+# decision surface is computed once, cached on disk, and suggest_action becomes a list lookup.
+table_bounds = (29, 33, 65)
+table_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".fuzzy_tables")
+
+class decision_table:
+  def __init__(self, player_knowledge, enemy_knowledge, t_norm, s_norm, membership_set=None, cells=None):
+    self.player_knowledge = player_knowledge
+    self.enemy_knowledge = enemy_knowledge
+    self.t_norm = t_norm
+    self.s_norm = s_norm
+    self.membership_set = membership_set
+    if cells == None:
+      cells = self.build()
+    self.cells = cells
+
+  def evaluate(self, frame):
+    suggested_action, rule_strengths = rules_for(memberships_for(frame, self.player_knowledge, self.enemy_knowledge, self.membership_set),
+                                                 self.t_norm, self.s_norm)
+    return suggested_action, tuple(rule_strengths)
+
+  def build(self):
+    players, sidekicks, damages = table_bounds
+    cells = []
+    for player_health in range(players):
+      for sidekick_health in range(sidekicks):
+        for damage_dealt in range(damages):
+          cells.append(self.evaluate({
+            "player_health": player_health,
+            "sidekick_health": sidekick_health,
+            "damage_dealt": damage_dealt
+          }))
+    return cells
+
+  def lookup(self, frame):
+    player_health = frame["player_health"]
+    sidekick_health = frame["sidekick_health"]
+    damage_dealt = frame["damage_dealt"]
+    players, sidekicks, damages = table_bounds
+    if 0 <= player_health < players and 0 <= sidekick_health < sidekicks and 0 <= damage_dealt < damages:
+      try:
+        return self.cells[(player_health*sidekicks + sidekick_health)*damages + damage_dealt]
+      except TypeError:
+        # non-integer frame values fall through to the direct computation
+        pass
+    return self.evaluate(frame)
+
+# bump when rules_for or the layout of the tables changes, so tables cached on disk are rebuilt
+rules_version = 1
+
+def membership_hash(membership_set=None):
+  # covers the coefficient types and values, so editing membership_fxns rebuilds the tables, and
+  # the rules version and table bounds
+  if membership_set == None:
+    membership_set = membership_fxns
+  description = [("rules", rules_version, table_bounds)]
+  for stat, contexts in membership_set.items():
+    for context, levels in contexts.items():
+      for level, coefficients in levels.items():
+        description.append((stat, context, level, type(coefficients).__name__, sorted(vars(coefficients).items())))
+  return hashlib.sha1(repr(description).encode()).hexdigest()[:16]
+
+def norm_identity(norm):
+  # module.name for a norm that name finds again from any process, else None; a lambda, a nested
+  # function or one defined in a script has no such name, and its tables are never written to disk
+  module_name = getattr(norm, "__module__", None)
+  name = getattr(norm, "__qualname__", None)
+  if module_name in (None, "__main__") or name == None:
+    return None
+  if getattr(sys.modules.get(module_name), name, None) is not norm:
+    return None
+  return "%s.%s" %(module_name, name)
+
+def table_path(player_knowledge, enemy_knowledge, t_norm, s_norm, membership_set=None):
+  # None when either norm has no stable identity
+  t_name, s_name = norm_identity(t_norm), norm_identity(s_norm)
+  if t_name == None or s_name == None:
+    return None
+  name = "%s-%s-%s-%s-%s.pickle" %(membership_hash(membership_set), player_knowledge, enemy_knowledge, t_name, s_name)
+  return os.path.join(table_dir, name.replace("/", "_"))
+
+def get_decision_table(player_knowledge, enemy_knowledge, t_norm, s_norm, membership_set=None):
+  # None stands for membership_fxns, whose tables are dropped once it has changed (see
+  # membership_changed); other membership sets are told apart by their hash
+  current_membership_version()
+  key = (player_knowledge, enemy_knowledge, t_norm, s_norm)
+  if membership_set != None:
+    key += (membership_hash(membership_set),)
+  table = decision_tables.get(key)
+  if table != None:
+    return table
+
+  context = (player_knowledge, enemy_knowledge, t_norm, s_norm, membership_set)
+  path = table_path(*context)
+  if path == None:
+    table = decision_tables[key] = decision_table(*context)
+    return table
+  try:
+    with open(path, "rb") as table_file:
+      table = decision_table(*context, cells=pickle.load(table_file))
+  except (OSError, pickle.UnpicklingError, EOFError):
+    table = decision_table(*context)
+    os.makedirs(table_dir, exist_ok=True)
+    # write then rename, so concurrent workers never read a partial table
+    temporary_path = "%s.%d.tmp" %(path, os.getpid())
+    with open(temporary_path, "wb") as table_file:
+      pickle.dump(table.cells, table_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+  decision_tables[key] = table
+  return table
+
+def clear_decision_tables():
+  # drops every in-memory table; they are rebuilt, or reloaded from disk, when next asked for
+  decision_tables.clear()
+
+membership_version = 0
+# the membership_fxns current_membership_version last saw
+watched_fxns = membership_fxns
+
+def membership_changed():
+  # called by the watched functions and dicts; call it after editing membership functions some
+  # other way, e.g. through a reference to a dict held from before it was assigned
+  global membership_version
+  membership_version += 1
+  clear_decision_tables()
+
+def current_membership_version():
+  # a membership_fxns assigned since the last call counts as a change, and is watched from then on
+  global membership_fxns, watched_fxns
+  if membership_fxns is not watched_fxns:
+    membership_fxns = watched(membership_fxns)
+    watched_fxns = membership_fxns
+    membership_changed()
+  return membership_version
+
+def module_defaults():
+  return t_norm, s_norm, compiled_tables
+
+# A FuzzyEngine carries its own membership set, knowledge context and norm pair, so sidekicks
+# with different contexts can decide side by side without touching the module globals below.
+# The membership functions for its context are looked up, and compiled, once when the engine is built.
+class FuzzyEngine:
+  def __init__(self, player_knowledge="unknown", enemy_knowledge="unknown", t_norm=None, s_norm=None,
+               membership_set=None, compiled_tables=None, decision_cache=None):
+    self.player_knowledge = player_knowledge
+    self.enemy_knowledge = enemy_knowledge
+    # unset norms and table mode take the module defaults at construction time
+    default_t_norm, default_s_norm, default_compiled_tables = module_defaults()
+    self.t_norm = t_norm if t_norm != None else default_t_norm
+    self.s_norm = s_norm if s_norm != None else default_s_norm
+    self.membership_set = membership_set
+    if membership_set == None:
+      membership_set = membership_fxns
+
+    self.fxns = (
+      ("player_health", self.resolve(membership_set["player_health"][player_knowledge])),
+      ("sidekick_health", self.resolve(membership_set["sidekick_health"][enemy_knowledge])),
+      ("damage_dealt", self.resolve(membership_set["damage_dealt"][enemy_knowledge]))
+    )
+    # what suggest_action runs; calculate_memberships and apply_rules stay as the reference
+    self.infer = compile_inference(membership_set["player_health"][player_knowledge],
+                                   membership_set["sidekick_health"][enemy_knowledge],
+                                   membership_set["damage_dealt"][enemy_knowledge], self.t_norm, self.s_norm)
+
+    if compiled_tables == None:
+      compiled_tables = default_compiled_tables
+    self.table = None
+    if compiled_tables:
+      self.table = get_decision_table(player_knowledge, enemy_knowledge, self.t_norm, self.s_norm, self.membership_set)
+    # unset, the module's decision cache at construction time, if there is one
+    self.decisions = decision_cache if decision_cache != None else decisions
+
+  def resolve(self, levels):
+    resolved = []
+    for level, coefficients in levels.items():
+      if type(coefficients) == triangle_coefficients:
+        resolved.append((level, triangle_membership, coefficients))
+      elif type(coefficients) == trapezoid_coefficients:
+        resolved.append((level, trapezoid_membership, coefficients))
+      else:
+        raise TypeError("unsupported membership function for %s" %level)
+    return tuple(resolved)
+
+  def calculate_memberships(self, frame):
+    memberships = {}
+    for stat, levels in self.fxns:
+      value = frame[stat]
+      memberships[stat] = {level: membership(coefficients, value) for level, membership, coefficients in levels}
+    return memberships
+
+  def apply_rules(self, memberships):
+    return rules_for(memberships, self.t_norm, self.s_norm)
+
+  def suggest_action(self, frame):
+    if self.decisions != None:
+      return self.decisions.decide(frame, self.infer, self.evaluate)
+    return self.evaluate(frame)
+
+  def evaluate(self, frame):
+    if self.table != None:
+      return self.table.lookup(frame)
+    return self.infer(frame)
 
 player_knowledge = "unknown"
 enemy_knowledge ="unknown"
 
 t_norm = lukasiewicz_t
-s_norm = lukasiewicz_s
\ No newline at end of file
+s_norm = lukasiewicz_s
+
+compiled_tables = False
+decision_tables = {}
+inferences = {}
+inferences_version = None
+compiled_inferences = {}
+decisions = None
\ No newline at end of file
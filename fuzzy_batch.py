@@ -0,0 +1,108 @@
+import numpy as np
+import fuzzy
+
+# Array versions of fuzzy.calculate_memberships / fuzzy.apply_rules for scoring whole batches
+# of frames at once. Every branch mirrors the scalar code, so results match it exactly.
+
+levels = ("low", "medium", "high")
+stats = ("player_health", "sidekick_health", "damage_dealt")
+
+def trapezoid_membership(coefficients: fuzzy.trapezoid_coefficients, values):
+    a, b, c, d = coefficients.a, coefficients.b, coefficients.c, coefficients.d
+    # branches that are never selected may divide by zero on degenerate shapes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [values > d, (values == d) & (d == c), values > c, values >= b, values > a],
+            [0.0, 1.0, (d - values)/(d - c), 1.0, (values - a)/(b - a)],
+            0.0)
+
+def triangle_membership(coefficients: fuzzy.triangle_coefficients, values):
+    a, b, c = coefficients.a, coefficients.b, coefficients.c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [values > c, values > b, values == b, values > a],
+            [0.0, (c - values)/(c - b), 1.0, (values - a)/(b - a)],
+            0.0)
+
+def calculate_membership_value(coefficients, values):
+    if type(coefficients) == fuzzy.triangle_coefficients:
+        return triangle_membership(coefficients, values)
+    elif type(coefficients) == fuzzy.trapezoid_coefficients:
+        return trapezoid_membership(coefficients, values)
+    return np.full(np.shape(values), -1.0)
+
+def calculate_memberships(player_health, sidekick_health, damage_dealt, player_knowledge=None, enemy_knowledge=None):
+    if player_knowledge == None:
+        player_knowledge = fuzzy.player_knowledge
+    if enemy_knowledge == None:
+        enemy_knowledge = fuzzy.enemy_knowledge
+
+    frames = {
+        "player_health": np.asarray(player_health, dtype=np.float64),
+        "sidekick_health": np.asarray(sidekick_health, dtype=np.float64),
+        "damage_dealt": np.asarray(damage_dealt, dtype=np.float64)
+    }
+    memberships = {}
+    for stat in stats:
+        context = player_knowledge if stat == "player_health" else enemy_knowledge
+        memberships[stat] = {}
+        for level in levels:
+            memberships[stat][level] = calculate_membership_value(fuzzy.membership_fxns[stat][context][level], frames[stat])
+    return memberships
+
+def goguen_t(x, y):
+    return x * y
+def goguen_s(x, y):
+    return x + y - x*y
+
+def godel_t(x, y):
+    return np.minimum(x, y)
+def godel_s(x, y):
+    return np.maximum(x, y)
+
+def lukasiewicz_t(x, y):
+    return np.maximum(0, x+y-1)
+def lukasiewicz_s(x, y):
+    return np.minimum(1, x+y)
+
+def drastic_t(x, y):
+    return np.where(x == 1, y, np.where(y == 1, x, 0))
+def drastic_s(x, y):
+    return np.where(x == 0, y, np.where(y == 0, x, 1))
+
+# the scalar norms in fuzzy map to their array counterparts
+array_norms = {
+    fuzzy.goguen_t: goguen_t,
+    fuzzy.goguen_s: goguen_s,
+    fuzzy.godel_t: godel_t,
+    fuzzy.godel_s: godel_s,
+    fuzzy.lukasiewicz_t: lukasiewicz_t,
+    fuzzy.lukasiewicz_s: lukasiewicz_s,
+    fuzzy.drastic_t: drastic_t,
+    fuzzy.drastic_s: drastic_s
+}
+
+def apply_rules(memberships, t_norm=None, s_norm=None):
+    # returns an action array (values of fuzzy.action) and an (N, 4) rule strength matrix
+    # whose columns follow the order of fuzzy.action
+    t_norm = array_norms[t_norm if t_norm != None else fuzzy.t_norm]
+    s_norm = array_norms[s_norm if s_norm != None else fuzzy.s_norm]
+    damage_dealt = memberships["damage_dealt"]
+    player_health = memberships["player_health"]
+    sidekick_health = memberships["sidekick_health"]
+
+    rule_strengths = np.empty((np.size(player_health["low"]), len(fuzzy.action)))
+    # the rules are the same as fuzzy.rules_for
+    rule_strengths[:, fuzzy.action.AGGRESSIVE.value] = s_norm(t_norm((1-damage_dealt["high"]), (1-sidekick_health["low"])),
+                                                              t_norm(player_health["low"], sidekick_health["low"]))
+    rule_strengths[:, fuzzy.action.SUPPORTIVE.value] = t_norm((1-player_health["low"]), (1-damage_dealt["low"]))
+    rule_strengths[:, fuzzy.action.DEFENSIVE.value] = t_norm(player_health["low"], s_norm((1-sidekick_health["low"]), (1-damage_dealt["low"])))
+    rule_strengths[:, fuzzy.action.SELF_PRESERVE.value] = t_norm((1-player_health["low"]), sidekick_health["low"])
+
+    # argmax keeps the first of any tied maxima, like max() over the rule dict
+    return np.argmax(rule_strengths, axis=1), rule_strengths
+
+def suggest_actions(player_health, sidekick_health, damage_dealt, player_knowledge=None, enemy_knowledge=None,
+                    t_norm=None, s_norm=None):
+    memberships = calculate_memberships(player_health, sidekick_health, damage_dealt, player_knowledge, enemy_knowledge)
+    return apply_rules(memberships, t_norm, s_norm)
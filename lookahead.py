@@ -0,0 +1,105 @@
+import random
+import time
+import dice
+import events
+import fuzzy
+import scene
+
+# Monte Carlo lookahead for the sidekick, as an alternative to the fuzzy controller. At each
+# sidekick turn the planner forks the scene once; then, for every candidate action, it restores
+# the fork to the decision point, plays that action and rolls the rest of the combat out with the
+# fuzzy engine and the PC's policy. The action with the best mean goal score is chosen.
+#
+# Every action's k-th rollout uses the same seeds, so the actions are compared on common dice.
+# The global generators are put back afterwards, so planning never shifts the real combat's dice.
+# Rollouts run in-process: a rollout is a few tens of microseconds, well below what a worker
+# process would cost to hand work to.
+
+actions = (fuzzy.action.AGGRESSIVE, fuzzy.action.SUPPORTIVE, fuzzy.action.DEFENSIVE, fuzzy.action.SELF_PRESERVE)
+
+# weights for the goals listed above fuzzy.apply_rules, in priority order
+goal_weights = (16, 8, 4, 2, 1)
+# the sidekick's share of party damage above which it counts as significantly more than the PC's
+damage_share_limit = 0.6
+
+def attack_model(player: scene.PlayerCharacter, current_scene: scene.Scene):
+    # stands in for a human PC during rollouts
+    return "attack"
+
+def goal_score(combat: scene.Scene, weights=goal_weights):
+    player, sidekick, enemy = combat.roles()
+    party_damage = player.damage_dealt + sidekick.damage_dealt
+    goals = (
+        # 1. PC does not die
+        player.status != scene.status.DEAD,
+        # 2. PC does not get downed
+        not player.downed,
+        # 3. PC causes the enemy to reach 0 HP
+        enemy.status == scene.status.DEAD and enemy.entity.last_struck_by is player.entity,
+        # 4. Sidekick does not reach 0 HP
+        not sidekick.downed and not sidekick.killed,
+        # 5. Sidekick's damage contribution is not significantly higher than the PC's
+        sidekick.damage_dealt <= damage_share_limit*party_damage
+    )
+    return sum(weight for weight, met in zip(weights, goals) if met)
+
+class LookaheadPlanner:
+    # rollouts is the most rollouts per action; time_budget (seconds) can stop a decision sooner,
+    # after at least one rollout per action. horizon caps the turns played in one rollout.
+    def __init__(self, rollouts=16, time_budget=None, horizon=200, weights=goal_weights, player_model=attack_model,
+                 seed=None):
+        self.rollouts = rollouts
+        self.time_budget = time_budget
+        self.horizon = horizon
+        self.weights = weights
+        self.player_model = player_model
+        self.rng = random.Random(seed)
+        self.decisions = 0
+        self.total_rollouts = 0
+
+    def rollout(self, twin: scene.Scene, start: scene.scene_snapshot, suggested_action):
+        twin.restore(start, restore_rng=False)
+        twin.sidekick.act(suggested_action, twin)
+        twin.end_turn()
+        turns = 0
+        while not twin.is_over() and turns < self.horizon:
+            twin.step()
+            turns += 1
+        return goal_score(twin, self.weights)
+
+    def choose(self, sidekick: scene.Sidekick, combat: scene.Scene):
+        previous_sink = events.set_sink(events.null)
+        random_state = random.getstate()
+        dice_state = dice.generator.getstate()
+        totals = {suggested_action: 0 for suggested_action in actions}
+        played = 0
+        try:
+            twin = combat.fork()
+            twin.sidekick.planner = None
+            # rollouts draw from the module generators seeded below, never from the combatants' own streams
+            for actor in twin.roles():
+                actor.entity.streams = dice.shared_streams
+            if twin.player_character.policy == None:
+                twin.player_character.policy = self.player_model
+            start = twin.snapshot(include_rng=False)
+
+            deadline = time.perf_counter() + self.time_budget if self.time_budget != None else None
+            while played < self.rollouts:
+                random_seed, dice_seed = self.rng.getrandbits(64), self.rng.getrandbits(64)
+                for suggested_action in actions:
+                    random.seed(random_seed)
+                    dice.seed(dice_seed)
+                    totals[suggested_action] += self.rollout(twin, start, suggested_action)
+                played += 1
+                if deadline != None and time.perf_counter() >= deadline:
+                    break
+        finally:
+            random.setstate(random_state)
+            dice.generator.setstate(dice_state)
+            events.set_sink(previous_sink)
+
+        self.decisions += 1
+        self.total_rollouts += played*len(actions)
+        scores = tuple((suggested_action, totals[suggested_action]/played) for suggested_action in actions)
+        # ties go to the earlier action, so attacking wins a tie
+        return max(scores, key=lambda pair: pair[1])[0], scores
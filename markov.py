@@ -0,0 +1,697 @@
+import getopt
+import itertools
+import sys
+import time
+import numpy as np
+import dice
+import entities
+import fuzzy
+import montecarlo
+import scene
+import vecsim
+from entities import advantage_type
+
+# Exact combat outcomes for one configuration, by treating the combat as an absorbing
+# Markov chain. States hold everything the rules in entities/scene actually read:
+#   (initiative cycle from the PC, PC max HP, PC life, sidekick life, monster HP, whose turn it is,
+#    who last struck the monster, whether the PC is FAR)
+# where a life is (hp, death save failures, successes, stable, unconcious, dead). Initial PC
+# max HP and turn order come with their exact probabilities, and every dice roll is an exact PMF.
+# Party damage is always monster max HP - monster HP, which is all the sidekick's frame needs.
+# combat_chain enumerates and solves these states with whole frontiers of them coded as integers
+# (see life_code and combat_chain.turns); turn() plays one state's turn as tuples, and is what
+# optimal.decision_chain builds on.
+#
+# Advantage flags and harry/hinder links are left out: Entity.get_advantage stores every kind
+# in advantage_offense and harry, hinder and dodge never grant OFFENSE, so Entity.attack always
+# rolls a single d20. advantage_is_inert() checks that this still holds before solving.
+
+PLAYER, SIDEKICK, ENEMY = 0, 1, 2
+ATTACK, DISENGAGE, DODGE, HARRY, HINDER, WAIT = range(6)
+# outcome columns of the solution; TURNS + role counts the turns each role starts
+VICTORY, SIDEKICK_KILLED, PLAYER_DOWNED, SIDEKICK_DOWNED, TURNS = range(5)
+COLUMNS = TURNS + 3
+# who last struck the monster, in coded states, when nobody has
+NOBODY = -1
+
+dead_life = (0, 0, 0, False, False, True)
+
+# A coded life is DEAD_LIFE, a dying life (1 + 3*failures + successes), STABLE_LIFE, or
+# STABLE_LIFE + HP for a concious one. Dead lives all play alike, unconcious ones are always on
+# 0 HP, and the counters are only ever set while dying, so nothing a life holds is lost.
+DEAD_LIFE, STABLE_LIFE = 0, 10
+
+def life_code(life):
+    hp, fails, successes, stable, unconcious, dead = life
+    if dead:
+        return DEAD_LIFE
+    elif unconcious:
+        return STABLE_LIFE if stable else 1 + 3*fails + successes
+    return STABLE_LIFE + hp
+
+def life_of(code):
+    if code == DEAD_LIFE:
+        return dead_life
+    elif code == STABLE_LIFE:
+        return (0, 0, 0, True, True, False)
+    elif code < STABLE_LIFE:
+        return (0, (code - 1)//3, (code - 1)%3, False, True, False)
+    return (code - STABLE_LIFE, 0, 0, False, False, False)
+
+def unconcious_code(codes):
+    return (codes != DEAD_LIFE) & (codes <= STABLE_LIFE)
+
+def life_rank(codes):
+    # How far coded lives are from the end of the combat. Wounds and death saves only ever lower
+    # it, except for a natural 20 and a hit on a stable life; any concious HP counts alike.
+    dying = np.where(codes == STABLE_LIFE, 1, STABLE_LIFE + 1 - codes)
+    return np.where(codes > STABLE_LIFE, STABLE_LIFE + 1, np.where(codes == DEAD_LIFE, 0, dying))
+
+def advantage_is_inert():
+    probe = entities.Entity("probe", entities.entity_stats(10, 10, 10, 10, 10, 10), 1, 10, 0, 4)
+    for kind in (advantage_type.DEFENSE, advantage_type.DIS_OFFENSE, advantage_type.DIS_DEFENSE):
+        probe.get_advantage(kind)
+        if probe.advantage_defense != False or probe.advantage_offense == advantage_type.OFFENSE:
+            return False
+    return True
+
+# PC policies give a distribution over commands, from the PC and monster HP
+def always_attack(pc_hp, pc_max, monster_hp, monster_max):
+    return ((ATTACK, 1.0),)
+
+def random_command(pc_hp, pc_max, monster_hp, monster_max):
+    return tuple((command, 1/6) for command in range(6))
+
+def cautious(pc_hp, pc_max, monster_hp, monster_max):
+    if bloodied(pc_hp, pc_max) and not bloodied(monster_hp, monster_max):
+        return ((DODGE, 1.0),)
+    return ((ATTACK, 1.0),)
+
+policies = {
+    "attack": always_attack,
+    "random": random_command,
+    "cautious": cautious
+}
+
+def bloodied(hp, max_hp):
+    return hp > 0 and hp <= max_hp//2
+
+def status_of(life):
+    hp, fails, successes, stable, unconcious, dead = life
+    if unconcious:
+        return scene.status.UNCONCIOUS
+    elif dead:
+        return scene.status.DEAD
+    return scene.status.GOOD
+
+def resolve_death_counters(life):
+    hp, fails, successes, stable, unconcious, dead = life
+    if fails > 2:
+        return (hp, fails, successes, False, False, True)
+    elif successes > 2:
+        return (hp, 0, 0, True, True, dead)
+    return life
+
+def death_save_outcomes(life):
+    hp, fails, successes, stable, unconcious, dead = life
+    if stable:
+        return ((1.0, life),)
+    outcomes = (
+        (1/20, (hp, 3, successes, stable, unconcious, dead)),
+        (1/20, (1, 0, 0, stable, False, dead)),
+        (8/20, (hp, fails + 1, successes, stable, unconcious, dead)),
+        (10/20, (hp, fails, successes + 1, stable, unconcious, dead))
+    )
+    return tuple((p, resolve_death_counters(new) if new[0] < 1 else new) for p, new in outcomes)
+
+def take_damage(life, max_hp, damage):
+    # entities.Entity.take_damage
+    hp, fails, successes, stable, unconcious, dead = life
+    if hp - damage <= -max_hp:
+        return (0, fails, successes, stable, False, True)
+    elif hp <= 0:
+        return resolve_death_counters((hp, fails + 1, successes, False, unconcious, dead))
+    elif hp <= damage:
+        return (0, fails, successes, False, True, dead)
+    return (hp - damage, fails, successes, stable, unconcious, dead)
+
+def save_table(codes):
+    # (next life codes, probabilities) of the death save of every life code below codes, padded
+    # to four outcomes; lives that don't save have none
+    targets = np.zeros((codes, 4), dtype=np.int64)
+    probabilities = np.zeros((codes, 4))
+    for code in range(DEAD_LIFE + 1, STABLE_LIFE + 1):
+        for j, (p, new) in enumerate(death_save_outcomes(life_of(code))):
+            targets[code, j] = life_code(new)
+            probabilities[code, j] = p
+    return targets, probabilities
+
+def wound_table(codes, max_hp, damages):
+    # the life code every life code below codes has after taking each of damages
+    return np.array([[life_code(take_damage(life_of(code), max_hp, damage)) if code != DEAD_LIFE else DEAD_LIFE
+                      for damage in damages] for code in range(codes)], dtype=np.int64)
+
+def damage_pmf(spec: dice.roll_spec):
+    # exact distribution of max(spec, 0) for plain NdS+M specs
+    pmf = {0: 1.0}
+    for _ in range(spec.number):
+        rolled = {}
+        for total, p in pmf.items():
+            for face in range(1, spec.sides + 1):
+                rolled[total + face] = rolled.get(total + face, 0) + p/spec.sides
+        pmf = rolled
+    clipped = {}
+    for total, p in pmf.items():
+        damage = max(total + spec.modifier, 0)
+        clipped[damage] = clipped.get(damage, 0) + p
+    return clipped
+
+def strike_pmf(hit_modifier, ac, damage_dice: dice.roll_spec):
+    # {(damage, landed): p} for one attack roll: natural 20s crit, otherwise hit on >= AC
+    hits = sum(1 for natural in range(1, 20) if natural + hit_modifier >= ac)
+    pmf = {(0, False): (19 - hits)/20}
+    for damage, p in damage_pmf(damage_dice.critical()).items():
+        pmf[(damage, True)] = pmf.get((damage, True), 0) + p/20
+    for damage, p in damage_pmf(damage_dice).items():
+        pmf[(damage, True)] = pmf.get((damage, True), 0) + p*hits/20
+    return pmf
+
+class combatant:
+    # What the chain needs of a combatant, read from its catalog stat block. Building entities
+    # would roll the PC's HP from the shared dice generator, and shift every seeded run after it.
+    def __init__(self, block: entities.stat_block, hit_modifier, damage_dice_amount, damage_modifier, multiattack):
+        self.stats = block.stats
+        # a PC's catalog HP is their hit die, and what their max HP is rolled up from
+        self.max_hp = block.hp
+        self.hit_die = block.hp
+        self.cr = block.cr
+        self.ac = block.ac
+        self.hit_modifier = hit_modifier
+        self.damage_dice = entities.damage_specs(damage_dice_amount, block.dmg_die, damage_modifier)[0]
+        self.multiattack_dice = None
+        if multiattack != None:
+            self.multiattack_dice = entities.multiattack_specs(multiattack[0], multiattack[1])[0]
+
+def player_combatant(player_class):
+    # the derived numbers of entities.Player
+    block = entities.get_catalog().player(player_class)
+    hit_modifier, damage_modifier = entities.player_attack_modifiers(block.stats)
+    return combatant(block, hit_modifier, 1, damage_modifier, entities.player_multiattack(player_class, block))
+
+def monster_combatant(monster_type):
+    block = entities.get_catalog().monster(monster_type)
+    return combatant(block, block.hit, block.dice_amount, block.dmg_mod, block.multiattack)
+
+def attack_pmf(attacker: combatant, target: combatant):
+    # Entity.attack plus its multiattack, as {(total damage, any strike landed): p}
+    pmf = strike_pmf(attacker.hit_modifier, target.ac, attacker.damage_dice)
+    if attacker.multiattack_dice != None:
+        second = strike_pmf(attacker.hit_modifier, target.ac, attacker.multiattack_dice)
+        combined = {}
+        for (damage, landed), p in pmf.items():
+            for (extra, extra_landed), q in second.items():
+                key = (damage + extra, landed or extra_landed)
+                combined[key] = combined.get(key, 0) + p*q
+        pmf = combined
+    return tuple((damage, landed, p) for (damage, landed), p in pmf.items())
+
+def initial_distribution(player: combatant, sidekick: combatant, monster: combatant, base_hp):
+    # PC max HP from Player.resolve_hp: 1dX R1 is uniform over 2..X
+    con = player.stats.stat_modifiers["CON"]
+    max_hps = {}
+    for roll in range(2, player.hit_die + 1):
+        max_hp = base_hp + con + max(0, con + roll)
+        max_hps[max_hp] = max_hps.get(max_hp, 0) + 1/(player.hit_die - 1)
+    # initiative in actor creation order; Scene's stable sort keeps that order on ties
+    dex = [entity.stats.stat_modifiers["DEX"] for entity in (player, sidekick, monster)]
+    orders = {}
+    for rolls in itertools.product(range(1, 21), repeat=3):
+        initiative = [roll + modifier for roll, modifier in zip(rolls, dex)]
+        order = tuple(sorted(range(3), key=lambda role: -initiative[role]))
+        orders[order] = orders.get(order, 0) + 1/8000
+    return [(order, max_hp, p*q) for order, p in orders.items() for max_hp, q in max_hps.items()]
+
+class combat_chain:
+    def __init__(self, config, t_norm=None, s_norm=None):
+        if not advantage_is_inert():
+            raise NotImplementedError("advantage now changes attack rolls, which this chain does not model")
+        if config.lookahead:
+            raise ValueError("the chain only models the fuzzy sidekick, not lookahead planning")
+        self.config = config
+        if config.norms != None and t_norm == None:
+            t_norm, s_norm = fuzzy.norm_pairs[config.norms]
+        self.policy = policies[config.policy]
+        self.player = player_combatant(config.player_class)
+        self.sidekick = monster_combatant(config.sidekick_type)
+        self.monster = monster_combatant(config.monster_type)
+        self.engine = fuzzy.FuzzyEngine(*vecsim.knowledge_context(config, self.player, self.monster), t_norm, s_norm,
+                                        compiled_tables=False)
+
+        self.attacks = {
+            (PLAYER, ENEMY): attack_pmf(self.player, self.monster),
+            (SIDEKICK, ENEMY): attack_pmf(self.sidekick, self.monster),
+            (ENEMY, PLAYER): attack_pmf(self.monster, self.player),
+            (ENEMY, SIDEKICK): attack_pmf(self.monster, self.sidekick)
+        }
+        self.initial = initial_distribution(self.player, self.sidekick, self.monster, self.player.max_hp)
+        self.decisions = {}
+        self.strikes = {}
+        self.enumerate()
+
+    def sidekick_attacks(self, pc_hp, sk_hp, monster_hp):
+        key = (pc_hp, sk_hp, monster_hp)
+        if key not in self.decisions:
+            frame = {
+                "player_health": pc_hp,
+                "sidekick_health": sk_hp,
+                "damage_dealt": self.monster.max_hp - monster_hp
+            }
+            suggested_action, _ = self.engine.suggest_action(frame)
+            # harry, hinder and dodge only touch the inert advantage flags
+            self.decisions[key] = suggested_action == fuzzy.action.AGGRESSIVE
+        return self.decisions[key]
+
+    def party_strike(self, attacker, monster_hp):
+        # merged (p, monster hp after, landed) outcomes of a party attack
+        key = (attacker, monster_hp)
+        if key not in self.strikes:
+            merged = {}
+            for damage, landed, p in self.attacks[(attacker, ENEMY)]:
+                outcome = (0 if monster_hp <= damage else monster_hp - damage, landed)
+                merged[outcome] = merged.get(outcome, 0) + p
+            self.strikes[key] = tuple((p, hp, landed) for (hp, landed), p in merged.items())
+        return self.strikes[key]
+
+    def monster_strike(self, target, life, max_hp):
+        # merged (p, target life after) outcomes of the monster's attack
+        key = (target, life, max_hp)
+        if key not in self.strikes:
+            merged = {}
+            for damage, landed, p in self.attacks[(ENEMY, target)]:
+                new = take_damage(life, max_hp, damage)
+                merged[new] = merged.get(new, 0) + p
+            self.strikes[key] = tuple((p, new) for new, p in merged.items())
+        return self.strikes[key]
+
+    def turn(self, state, attacks=None):
+        # one actor's turn, as (probability, pc life, sidekick life, monster hp, last struck by, far) outcomes;
+        # attacks, if given, overrides the fuzzy sidekick's choice of whether to attack
+        cycle, pc_max, pc, sk, monster_hp, actor, struck_by, far = state
+        if actor == PLAYER or actor == SIDEKICK:
+            life = pc if actor == PLAYER else sk
+            status = status_of(life)
+            if status == scene.status.UNCONCIOUS:
+                if actor == PLAYER:
+                    return [(p, new, sk, monster_hp, struck_by, far) for p, new in death_save_outcomes(life)]
+                return [(p, pc, new, monster_hp, struck_by, far) for p, new in death_save_outcomes(life)]
+            elif status == scene.status.DEAD:
+                return [(1.0, pc, sk, monster_hp, struck_by, far)]
+
+            if actor == SIDEKICK:
+                if attacks == None:
+                    attacks = self.sidekick_attacks(pc[0], sk[0], monster_hp)
+                if attacks:
+                    return [(p, pc, sk, hp, SIDEKICK if landed else struck_by, far)
+                            for p, hp, landed in self.party_strike(SIDEKICK, monster_hp)]
+                return [(1.0, pc, sk, monster_hp, struck_by, far)]
+
+            outcomes = []
+            for command, p in self.policy(pc[0], pc_max, monster_hp, self.monster.max_hp):
+                if command == ATTACK:
+                    outcomes += [(p*q, pc, sk, hp, PLAYER if landed else struck_by, False)
+                                 for q, hp, landed in self.party_strike(PLAYER, monster_hp)]
+                elif command == DISENGAGE:
+                    outcomes.append((p, pc, sk, monster_hp, struck_by, True))
+                elif command in (HARRY, HINDER):
+                    outcomes.append((p, pc, sk, monster_hp, struck_by, False))
+                else:
+                    outcomes.append((p, pc, sk, monster_hp, struck_by, far))
+            return outcomes
+
+        # scene.Enemy.take_action; its target rules treat both candidates alike, so their
+        # initiative order doesn't matter
+        others = (PLAYER, SIDEKICK)
+        lives = {PLAYER: pc, SIDEKICK: sk}
+        alive = {role: status_of(lives[role]) != scene.status.DEAD for role in others}
+        if far and not alive[SIDEKICK]:
+            # nobody living is NEAR, so engaging brings the PC back
+            far = False
+        targets = [role for role in others if alive[role] and (role == SIDEKICK or not far)]
+
+        # We'll assume that monsters rarely try to dodge
+        outcomes = [(0.1, pc, sk, monster_hp, struck_by, far)]
+        if len(targets) == 1:
+            choices = ((targets[0], 1.0),)
+        else:
+            maxima = {PLAYER: pc_max, SIDEKICK: self.sidekick.max_hp}
+            bloodied0 = bloodied(lives[targets[0]][0], maxima[targets[0]])
+            bloodied1 = bloodied(lives[targets[1]][0], maxima[targets[1]])
+            if bloodied0 and not bloodied1:
+                choices = ((targets[0], 1.0),)
+            elif not bloodied0 and bloodied1:
+                choices = ((targets[1], 1.0),)
+            elif struck_by != None:
+                choices = ((struck_by, 1.0),)
+            else:
+                choices = ((targets[0], 0.5), (targets[1], 0.5))
+
+        for target, p in choices:
+            if target == PLAYER:
+                outcomes += [(0.9*p*q, new, sk, monster_hp, struck_by, far) for q, new in self.monster_strike(PLAYER, pc, pc_max)]
+            else:
+                outcomes += [(0.9*p*q, pc, new, monster_hp, struck_by, far)
+                             for q, new in self.monster_strike(SIDEKICK, sk, self.sidekick.max_hp)]
+        return outcomes
+
+    def tabulate(self):
+        # everything turns() reads, as arrays over the coded components of a state
+        self.maxima = sorted(set(pc_max for _, pc_max, _ in self.initial))
+        self.cycles = sorted(set(order[order.index(PLAYER):] + order[:order.index(PLAYER)] for order, _, _ in self.initial))
+        top, monster_max = self.maxima[-1], self.monster.max_hp
+        pc_codes, sk_codes = STABLE_LIFE + top + 1, STABLE_LIFE + self.sidekick.max_hp + 1
+
+        # the policy's command distribution by PC max HP, PC HP and monster HP
+        self.commands = np.zeros((len(self.maxima), top + 1, monster_max + 1, 6))
+        for m, pc_max in enumerate(self.maxima):
+            for pc_hp in range(1, pc_max + 1):
+                for monster_hp in range(1, monster_max + 1):
+                    for command, p in self.policy(pc_hp, pc_max, monster_hp, monster_max):
+                        self.commands[m, pc_hp, monster_hp, command] += p
+        # only disengaging makes the PC FAR, so a policy that never does leaves far out
+        far = 2 if self.commands[..., DISENGAGE].any() else 1
+        # components: cycle, PC max HP, PC life, sidekick life, monster HP, actor, last struck by + 1, far
+        self.dims = (len(self.cycles), len(self.maxima), pc_codes, sk_codes, monster_max + 1, 3, 3, far)
+
+        self.following = np.array([[cycle[(cycle.index(role) + 1) % 3] for role in range(3)] for cycle in self.cycles])
+        self.places = np.array([[cycle.index(role) for role in range(3)] for cycle in self.cycles])
+        self.pc_max = np.array(self.maxima)
+        self.save_targets, self.save_probabilities = save_table(max(pc_codes, sk_codes))
+
+        # party strikes as (damage, landed, p), and the monster's as wounds per life code
+        self.strike_outcomes = {}
+        for attacker in (PLAYER, SIDEKICK):
+            self.strike_outcomes[attacker] = tuple(np.array(column) for column in zip(*self.attacks[(attacker, ENEMY)]))
+        hurt = {}
+        for target in (PLAYER, SIDEKICK):
+            merged = {}
+            for damage, landed, p in self.attacks[(ENEMY, target)]:
+                merged[damage] = merged.get(damage, 0) + p
+            hurt[target] = (list(merged), np.array(list(merged.values())))
+        self.pc_hurt, self.sk_hurt = hurt[PLAYER][1], hurt[SIDEKICK][1]
+        self.pc_wounds = np.array([wound_table(pc_codes, pc_max, hurt[PLAYER][0]) for pc_max in self.maxima])
+        self.sk_wounds = wound_table(sk_codes, self.sidekick.max_hp, hurt[SIDEKICK][0])
+        # whether the sidekick attacks, by PC HP, sidekick HP and monster HP; -1 until first needed
+        self.attacking = np.full((top + 1, self.sidekick.max_hp + 1, monster_max + 1), -1, dtype=np.int8)
+
+    def sidekick_attacking(self, pc_hp, sk_hp, monster_hp):
+        unknown = self.attacking[pc_hp, sk_hp, monster_hp] < 0
+        for key in set(zip(pc_hp[unknown].tolist(), sk_hp[unknown].tolist(), monster_hp[unknown].tolist())):
+            self.attacking[key] = self.sidekick_attacks(*key)
+        return self.attacking[pc_hp, sk_hp, monster_hp] == 1
+
+    def turns(self, m, pc, sk, monster_hp, actor, struck_by, far):
+        # turn() for a whole frontier of coded states, as flat outcome arrays (state, p, pc life,
+        # sidekick life, monster hp, last struck by, far); outcomes may have p == 0
+        current = (pc, sk, monster_hp, struck_by, far)
+        pieces = []
+        def add(rows, p, changed=None):
+            # p, and the changed components, are (rows, outcomes) arrays or broadcast to them
+            changed = changed or {}
+            p = np.broadcast_to(p, (len(rows), np.shape(p)[-1] if np.ndim(p) else 1))
+            piece = [np.repeat(rows, p.shape[1]), p.ravel()]
+            for i, component in enumerate(current):
+                value = changed[i] if i in changed else component[rows, None]
+                piece.append(np.broadcast_to(value, p.shape).ravel())
+            pieces.append(piece)
+        PC, SK, HP, STRUCK, FAR = range(5)
+
+        pc_hp = np.maximum(pc - STABLE_LIFE, 0)
+        sk_hp = np.maximum(sk - STABLE_LIFE, 0)
+        # the unconcious only roll death saves, and a dead sidekick does nothing
+        rows = np.flatnonzero((actor == PLAYER) & unconcious_code(pc))
+        add(rows, self.save_probabilities[pc[rows]], {PC: self.save_targets[pc[rows]]})
+        rows = np.flatnonzero((actor == SIDEKICK) & unconcious_code(sk))
+        add(rows, self.save_probabilities[sk[rows]], {SK: self.save_targets[sk[rows]]})
+        add(np.flatnonzero((actor == SIDEKICK) & (sk == DEAD_LIFE)), 1.0)
+
+        rows = np.flatnonzero((actor == SIDEKICK) & (sk > STABLE_LIFE))
+        attacking = self.sidekick_attacking(pc_hp[rows], sk_hp[rows], monster_hp[rows])
+        damage, landed, q = self.strike_outcomes[SIDEKICK]
+        hitting = rows[attacking]
+        add(hitting, q, {HP: np.maximum(monster_hp[hitting, None] - damage, 0),
+                         STRUCK: np.where(landed, SIDEKICK, struck_by[hitting, None])})
+        add(rows[~attacking], 1.0)
+
+        rows = np.flatnonzero((actor == PLAYER) & (pc > STABLE_LIFE))
+        commands = self.commands[m[rows], pc_hp[rows], monster_hp[rows]]
+        damage, landed, q = self.strike_outcomes[PLAYER]
+        add(rows, commands[:, ATTACK, None]*q, {HP: np.maximum(monster_hp[rows, None] - damage, 0),
+                                                  STRUCK: np.where(landed, PLAYER, struck_by[rows, None]), FAR: 0})
+        add(rows, commands[:, DISENGAGE, None], {FAR: 1})
+        add(rows, commands[:, HARRY, None] + commands[:, HINDER, None], {FAR: 0})
+        add(rows, commands[:, DODGE, None] + commands[:, WAIT, None])
+
+        # the monster, as in turn()
+        rows = np.flatnonzero(actor == ENEMY)
+        sk_alive = sk[rows] != DEAD_LIFE
+        # nobody living is NEAR, so engaging brings the PC back
+        staying_far = (far[rows] == 1) & sk_alive
+        pc_bloodied = (pc_hp[rows] > 0) & (pc_hp[rows] <= self.pc_max[m[rows]]//2)
+        sk_bloodied = (sk_hp[rows] > 0) & (sk_hp[rows] <= self.sidekick.max_hp//2)
+        struck = np.where(struck_by[rows] == PLAYER, 1.0, np.where(struck_by[rows] == SIDEKICK, 0.0, 0.5))
+        at_pc = np.where(pc_bloodied & ~sk_bloodied, 1.0, np.where(~pc_bloodied & sk_bloodied, 0.0, struck))
+        at_pc = np.where(staying_far, 0.0, np.where(sk_alive, at_pc, 1.0))
+        new_far = staying_far[:, None].astype(np.int64)
+        add(rows, 0.1, {FAR: new_far})
+        add(rows, 0.9*at_pc[:, None]*self.pc_hurt, {PC: self.pc_wounds[m[rows], pc[rows]], FAR: new_far})
+        add(rows, 0.9*(1 - at_pc[:, None])*self.sk_hurt, {SK: self.sk_wounds[sk[rows]], FAR: new_far})
+
+        return tuple(np.concatenate(column) for column in zip(*pieces))
+
+    def enumerate(self):
+        # Breadth first from the starting states, a whole frontier at a time, with each state coded
+        # as one integer over self.dims. States only record the initiative cycle and whose turn it
+        # is, so the three rotations of each turn order share their states; rounds are recovered
+        # from per-role turn counts.
+        self.tabulate()
+        dims = self.dims
+        space = int(np.prod(dims))
+        index = np.full(space, -1, dtype=np.int32)
+        starts = []
+        for order, pc_max, p in self.initial:
+            first = order.index(PLAYER)
+            cycle = self.cycles.index(order[first:] + order[:first])
+            start = np.ravel_multi_index((cycle, self.maxima.index(pc_max), STABLE_LIFE + pc_max,
+                                          STABLE_LIFE + self.sidekick.max_hp, self.monster.max_hp, order[0],
+                                          NOBODY + 1, 0), dims)
+            starts.append((start, order[0], p))
+        frontier = np.unique([start for start, _, _ in starts])
+        index[frontier] = np.arange(len(frontier))
+        n = len(frontier)
+
+        codes, sources, targets, probabilities, absorbed = [frontier], [], [], [], []
+        offset = 0
+        while len(frontier):
+            cycle, m, pc, sk, monster_hp, actor, struck_by, far = np.unravel_index(frontier, dims)
+            rows, p, pc, sk, monster_hp, struck_by, far = self.turns(m, pc, sk, monster_hp, actor, struck_by - 1, far)
+            kept = p > 0
+            rows, p, pc, sk, monster_hp, struck_by, far = (column[kept] for column in
+                                                            (rows, p, pc, sk, monster_hp, struck_by, far))
+            # a dead sidekick can never be targeted or strike again
+            struck_by = np.where(sk == DEAD_LIFE, NOBODY, struck_by)
+
+            # the combat is over: record who won, and who ends it dead or unconcious
+            over = (monster_hp == 0) | (pc == DEAD_LIFE)
+            terminal = np.zeros((len(frontier), COLUMNS))
+            for column, happened in ((VICTORY, monster_hp == 0), (SIDEKICK_KILLED, sk == DEAD_LIFE),
+                                     (PLAYER_DOWNED, unconcious_code(pc)), (SIDEKICK_DOWNED, unconcious_code(sk))):
+                terminal[:, column] = np.bincount(rows[over], p[over]*happened[over], minlength=len(frontier))
+            absorbed.append(terminal)
+
+            going = ~over
+            rows = rows[going]
+            new = np.ravel_multi_index((cycle[rows], m[rows], pc[going], sk[going], monster_hp[going],
+                                        self.following[cycle[rows], actor[rows]], struck_by[going] + 1, far[going]), dims)
+            # outcomes that reach the same state are merged
+            pairs, inverse = np.unique(rows*space + new, return_inverse=True)
+            merged = np.bincount(inverse.ravel(), p[going])
+            pair_rows, pair_codes = np.divmod(pairs, space)
+            fresh = np.unique(pair_codes[index[pair_codes] < 0])
+            index[fresh] = n + np.arange(len(fresh))
+            n += len(fresh)
+            sources.append(offset + pair_rows)
+            targets.append(index[pair_codes])
+            probabilities.append(merged)
+            offset += len(frontier)
+            codes.append(fresh)
+            frontier = fresh
+
+        self.size = n
+        (self.cycle, self.m, self.pc, self.sk, self.monster_hp, self.actor, self.struck_by,
+         self.far) = np.unravel_index(np.concatenate(codes), dims)
+        self.struck_by = self.struck_by - 1
+        self.starts = [(int(index[start]), actor, p) for start, actor, p in starts]
+        self.sources = np.concatenate(sources)
+        self.targets = np.concatenate(targets).astype(np.int64)
+        self.probabilities = np.concatenate(probabilities)
+        self.absorbed = np.concatenate(absorbed)
+
+    def solve(self, tolerance=1e-13, max_sweeps=100000):
+        # Monster HP never goes up, so states are solved one monster HP level at a time, lowest
+        # first. Within a level, states are swept in layers of life_rank, lowest first, so that a
+        # sweep carries values back through every wound and death save at once; within a layer,
+        # the last actor in the cycle goes first. A round in which nothing changes comes back to
+        # the state it started from, and that loop is solved in closed form: each state's value is
+        # kept as A + B*(the value of the state the round comes back to), and the first actor's
+        # state solves for its own value.
+        n = self.size
+        rewards = self.absorbed.copy()
+        for role in range(3):
+            rewards[:, TURNS + role] += self.actor == role
+        # once the sidekick is dead, or anyone has been downed, that outcome is settled
+        settled = np.zeros((n, COLUMNS), dtype=bool)
+        settled[:, SIDEKICK_KILLED] = self.sk == DEAD_LIFE
+        settled[:, PLAYER_DOWNED] = unconcious_code(self.pc)
+        settled[:, SIDEKICK_DOWNED] = unconcious_code(self.sk)
+
+        place = self.places[self.cycle, self.actor]
+        layer = life_rank(self.pc) + life_rank(self.sk)
+        ranked = np.lexsort((-place, layer, self.monster_hp))
+        rank = np.empty(n, dtype=np.int64)
+        rank[ranked] = np.arange(n)
+        sources, targets = rank[self.sources], rank[self.targets]
+        by_source = np.argsort(sources, kind="stable")
+        sources, targets, probabilities = sources[by_source], targets[by_source], self.probabilities[by_source]
+        rewards, settled = rewards[ranked], settled[ranked]
+        monster_hp, place, layer = self.monster_hp[ranked], place[ranked], layer[ranked]
+
+        # the transitions to the next actor's state with everything else unchanged, and for each
+        # state, the first actor's state its round comes back to
+        config = np.ravel_multi_index((self.cycle, self.m, self.pc, self.sk, self.monster_hp, self.struck_by + 1,
+                                       self.far), self.dims[:5] + self.dims[6:])[ranked]
+        unchanged = config[sources] == config[targets]
+        stay = np.zeros((n, 1))
+        stay[sources[unchanged], 0] = probabilities[unchanged]
+        following = np.arange(n)
+        following[sources[unchanged]] = targets[unchanged]
+        returning = np.where(place == 2, following, np.where(place == 1, following[following], np.arange(n)))
+        sources, targets, probabilities = sources[~unchanged], targets[~unchanged], probabilities[~unchanged]
+
+        # values are kept one row per state, so each transition gathers one contiguous row
+        values = np.zeros((n, COLUMNS))
+        base = np.zeros((n, COLUMNS))
+        loop = np.zeros((n, 1))
+        columns = np.arange(COLUMNS)
+        self.sweeps = 0
+        for hp in np.unique(monster_hp):
+            low, high = np.searchsorted(monster_hp, [hp, hp + 1])
+            first, last = np.searchsorted(sources, [low, high])
+            inside = targets[first:last] >= low
+
+            # transitions to lower levels only need the values already solved there
+            outside = first + np.flatnonzero(~inside)
+            size = high - low
+            bins = ((sources[outside] - low)[:, None]*COLUMNS + columns).ravel()
+            weights = (probabilities[outside, None]*values[targets[outside]]).ravel()
+            fixed = rewards[low:high] + np.bincount(bins, weights, minlength=COLUMNS*size).reshape(size, COLUMNS)
+
+            # (layer low, high, [(group low, high, place, bins, targets, probabilities)]) in sweep order
+            layers = []
+            edges = first + np.flatnonzero(inside)
+            starts = np.flatnonzero(np.diff(layer[low:high]*3 - place[low:high])) + 1
+            bounds = low + np.concatenate(([0], starts, [size]))
+            edge_bounds = np.searchsorted(sources[edges], bounds)
+            for group_low, group_high, edge_low, edge_high in zip(bounds[:-1], bounds[1:], edge_bounds[:-1], edge_bounds[1:]):
+                group_edges = edges[edge_low:edge_high]
+                bins = ((sources[group_edges] - group_low)[:, None]*COLUMNS + columns).ravel()
+                group = (group_low, group_high, place[group_low], bins, targets[group_edges], probabilities[group_edges, None])
+                if layers and layer[layers[-1][0]] == layer[group_low]:
+                    layers[-1][2].append(group)
+                    layers[-1][1] = group_high
+                else:
+                    layers.append([group_low, group_high, [group]])
+
+            for sweep in range(max_sweeps):
+                previous = values[low:high].copy()
+                for layer_low, layer_high, groups in layers:
+                    for group_low, group_high, group_place, bins, group_targets, group_probabilities in groups:
+                        size = group_high - group_low
+                        weights = (group_probabilities*values[group_targets]).ravel()
+                        a = fixed[group_low - low:group_high - low] + np.bincount(bins, weights, minlength=COLUMNS*size).reshape(size, COLUMNS)
+                        b = stay[group_low:group_high]
+                        if group_place != 2:
+                            a += b*base[following[group_low:group_high]]
+                            b = b*loop[following[group_low:group_high]]
+                        base[group_low:group_high] = np.where(settled[group_low:group_high], 1 - b, a)
+                        loop[group_low:group_high] = b
+                        if group_place == 0:
+                            values[group_low:group_high] = base[group_low:group_high]/(1 - b)
+                        else:
+                            # provisional, until the first actor's states are solved
+                            values[group_low:group_high] = base[group_low:group_high] + b*values[returning[group_low:group_high]]
+                    later = slice(layer_low, layer_low + np.count_nonzero(place[layer_low:layer_high]))
+                    values[later] = base[later] + loop[later]*values[returning[later]]
+                change = np.abs(values[low:high] - previous).max()
+                if change < tolerance:
+                    break
+            self.sweeps += sweep + 1
+
+        self.values = np.empty_like(values)
+        self.values[ranked] = values
+        result = np.zeros(TURNS + 1)
+        for start, actor, p in self.starts:
+            outcome = self.values[start]
+            # a round starts each time the first actor in the order takes their turn
+            result += p*np.append(outcome[:TURNS], outcome[TURNS + actor])
+        return chain_result(*result)
+
+class chain_result:
+    def __init__(self, party_victory, sidekick_killed, player_downed, sidekick_downed, expected_rounds):
+        # the combat only ends when the monster or the PC dies
+        self.party_victory = party_victory
+        self.player_killed = 1 - party_victory
+        self.sidekick_killed = sidekick_killed
+        self.player_downed = player_downed
+        self.sidekick_downed = sidekick_downed
+        self.expected_rounds = expected_rounds
+
+    def display(self):
+        print("party win probability %.6f, expected rounds %.4f" %(self.party_victory, self.expected_rounds))
+        print("%-10s %10s %10s" %("Role", "Downed", "Killed"))
+        print("%-10s %10.6f %10.6f" %("player", self.player_downed, self.player_killed))
+        print("%-10s %10.6f %10.6f" %("sidekick", self.sidekick_downed, self.sidekick_killed))
+        print("%-10s %10.6f %10.6f" %("enemy", 0, self.party_victory))
+
+def solve(config, t_norm=None, s_norm=None):
+    return combat_chain(config, t_norm, s_norm).solve()
+
+def main(cmdline_args):
+    usage = '''Usage: markov.py -p <player class> -s <sidekick type> -m <monster type> [-k <knowledge 0-3>]
+    [--policy <attack|random|cautious>]'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "p:s:m:k:h", ["policy=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"k": 0, "policy": "attack"}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        settings[opt.lstrip("-")] = arg
+
+    if not all(key in settings for key in ("p", "s", "m")):
+        print(usage)
+        sys.exit(2)
+
+    config = montecarlo.combat_config(settings["p"], settings["s"], settings["m"], int(settings["k"]), settings["policy"])
+    start = time.perf_counter()
+    chain = combat_chain(config)
+    result = chain.solve()
+    elapsed = time.perf_counter() - start
+    result.display()
+    print("%d states, %d sweeps, %.3fs" %(chain.size, chain.sweeps, elapsed))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,250 @@
+import aggregate
+import contextlib
+import dice
+import getopt
+import multiprocessing
+import os
+import random
+import sys
+import fuzzy
+import lookahead
+import profiling
+import scene
+import simulate
+
+# Combats are split into fixed-size shards, each seeded from (master seed, shard index),
+# so a given master seed gives the same totals however many workers run the shards.
+# Both the dice generator and the random module (monster choices, initiative ties) are seeded.
+shard_size = 1000
+
+roles = ("player", "sidekick", "enemy")
+
+# fixed histogram bins, so summaries from any shard can be merged
+rounds_bins = (0, 32, 32)
+damage_bins = (0, 64, 32)
+
+class combat_stats:
+    # Summary of any number of combats in constant memory: exact integer counts and totals, Welford
+    # moments and fixed-bin histograms of rounds and of each role's damage, and each role's final
+    # status, as scene.Scene.display_results shows for one combat.
+    def __init__(self):
+        self.combats = 0
+        self.party_wins = 0
+        self.stalemates = 0
+        self.total_rounds = 0
+        self.total_damage = dict.fromkeys(roles, 0)
+        self.downed = dict.fromkeys(roles, 0)
+        self.killed = dict.fromkeys(roles, 0)
+        self.status = {role: dict.fromkeys(scene.status, 0) for role in roles}
+        self.rounds = aggregate.running_moments()
+        self.rounds_histogram = aggregate.histogram(*rounds_bins)
+        self.damage = {role: aggregate.running_moments() for role in roles}
+        self.damage_histogram = {role: aggregate.histogram(*damage_bins) for role in roles}
+        # a profiling.profile_data when the combats were run with profiling on
+        self.profile = None
+
+    def add(self, result: scene.combat_result):
+        self.combats += 1
+        if result.winner == scene.outcome.PARTY_VICTORY:
+            self.party_wins += 1
+        elif result.winner == scene.outcome.STALEMATE:
+            self.stalemates += 1
+        self.total_rounds += result.rounds
+        self.rounds.add(result.rounds)
+        self.rounds_histogram.add(result.rounds)
+        for role in roles:
+            damage = result.damage_dealt[role]
+            self.total_damage[role] += damage
+            self.downed[role] += result.downed[role]
+            self.killed[role] += result.killed[role]
+            self.status[role][result.status[role]] += 1
+            self.damage[role].add(damage)
+            self.damage_histogram[role].add(damage)
+
+    def add_all(self, results):
+        # consumes an iterable of scene.combat_results, such as simulate.run_combats
+        for result in results:
+            self.add(result)
+        return self
+
+    def merge(self, other: 'combat_stats'):
+        # counts, totals and histograms merge exactly in any order; the moments merge exactly up to
+        # rounding, so runs merge shards in shard order to give the same floats for a given seed
+        self.combats += other.combats
+        self.party_wins += other.party_wins
+        self.stalemates += other.stalemates
+        self.total_rounds += other.total_rounds
+        self.rounds.merge(other.rounds)
+        self.rounds_histogram.merge(other.rounds_histogram)
+        for role in roles:
+            self.total_damage[role] += other.total_damage[role]
+            self.downed[role] += other.downed[role]
+            self.killed[role] += other.killed[role]
+            for final_status, count in other.status[role].items():
+                self.status[role][final_status] += count
+            self.damage[role].merge(other.damage[role])
+            self.damage_histogram[role].merge(other.damage_histogram[role])
+        if other.profile != None:
+            self.profile = (self.profile or profiling.profile_data()).merge(other.profile)
+        return self
+
+    def win_rate(self):
+        return self.party_wins/self.combats if self.combats else 0
+
+    def stalemate_rate(self):
+        return self.stalemates/self.combats if self.combats else 0
+
+    def mean_rounds(self):
+        return self.total_rounds/self.combats if self.combats else 0
+
+    def mean_damage(self, role):
+        return self.total_damage[role]/self.combats if self.combats else 0
+
+    def player_damage_share(self):
+        # fraction of the party's damage dealt by the PC rather than the sidekick
+        party_damage = self.total_damage["player"] + self.total_damage["sidekick"]
+        return self.total_damage["player"]/party_damage if party_damage else 0
+
+    def down_rate(self, role):
+        return self.downed[role]/self.combats if self.combats else 0
+
+    def kill_rate(self, role):
+        return self.killed[role]/self.combats if self.combats else 0
+
+    def status_rate(self, role, final_status: scene.status):
+        return self.status[role][final_status]/self.combats if self.combats else 0
+
+    def display(self):
+        print("%d combats, party win rate %.4f, mean rounds %.3f (sd %.3f, median %s, p90 %s)" %(
+            self.combats, self.win_rate(), self.mean_rounds(), self.rounds.std(), self.rounds_histogram.quantile(0.5),
+            self.rounds_histogram.quantile(0.9)))
+        if self.stalemates:
+            print("stalemate rate %.4f" %self.stalemate_rate())
+        print("PC share of party damage: %.4f" %self.player_damage_share())
+        print("%-10s %12s %8s %8s %10s %10s %10s %10s %10s" %("Role", "Mean Damage", "SD", "p90", "Downed", "Killed",
+                                                              "Good", "Unconcious", "Dead"))
+        for role in roles:
+            print("%-10s %12.3f %8.3f %8s %10.4f %10.4f %10.4f %10.4f %10.4f" %(
+                role, self.mean_damage(role), self.damage[role].std(), self.damage_histogram[role].quantile(0.9),
+                self.down_rate(role), self.kill_rate(role), self.status_rate(role, scene.status.GOOD),
+                self.status_rate(role, scene.status.UNCONCIOUS), self.status_rate(role, scene.status.DEAD)))
+
+class combat_config:
+    def __init__(self, player_class, sidekick_type, monster_type, knowledge_level=scene.knowledge.LOW, policy="attack",
+                 compiled_tables=False, lookahead=0, norms=None, max_rounds=simulate.round_cap, profile=False):
+        self.player_class = player_class
+        self.sidekick_type = sidekick_type
+        self.monster_type = monster_type
+        self.knowledge_level = scene.knowledge(knowledge_level)
+        # policies are passed by name so the config pickles cleanly
+        self.policy = policy
+        self.compiled_tables = compiled_tables
+        # rollouts per action for a lookahead sidekick; 0 keeps the fuzzy controller
+        self.lookahead = lookahead
+        # a key of fuzzy.norm_pairs, also by name; None keeps the module's norms
+        self.norms = norms
+        # rounds before a combat ends as a stalemate; None plays every combat out
+        self.max_rounds = max_rounds
+        # profile each shard's combats with the profiling probes, into combat_stats.profile
+        self.profile = profile
+
+def shard_seed(master_seed, shard):
+    return "%s:%d" %(master_seed, shard)
+
+@contextlib.contextmanager
+def module_state():
+    # A shard seeds the module generators and sets the fuzzy defaults and round cap for its combats.
+    # With one worker it runs in the caller's process, so it puts all of them back afterwards.
+    saved = (random.getstate(), dice.generator.getstate(), fuzzy.module_defaults(), simulate.round_cap)
+    try:
+        yield
+    finally:
+        random_state, dice_state, (fuzzy.t_norm, fuzzy.s_norm, fuzzy.compiled_tables), simulate.round_cap = saved
+        random.setstate(random_state)
+        dice.generator.setstate(dice_state)
+
+def run_shard(task):
+    config, master_seed, shard, n = task
+    with module_state():
+        random.seed(shard_seed(master_seed, shard))
+        dice.seed(shard_seed(master_seed, shard) + ":dice")
+        fuzzy.compiled_tables = config.compiled_tables
+        if config.norms != None:
+            fuzzy.t_norm, fuzzy.s_norm = fuzzy.norm_pairs[config.norms]
+        simulate.round_cap = config.max_rounds
+        planner = None
+        if config.lookahead:
+            planner = lookahead.LookaheadPlanner(config.lookahead, seed=shard_seed(master_seed, shard) + ":plan")
+        stats = combat_stats()
+        with profiling.session() if config.profile else contextlib.nullcontext() as profile:
+            stats.add_all(simulate.run_combats(n, config.player_class, config.sidekick_type, config.monster_type,
+                                               config.knowledge_level, simulate.policies[config.policy],
+                                               planner=planner))
+    stats.profile = profile
+    return stats
+
+def shard_tasks(config: combat_config, n, master_seed):
+    shard = 0
+    while n > 0:
+        yield config, master_seed, shard, min(n, shard_size)
+        n -= shard_size
+        shard += 1
+
+def run(config: combat_config, n, master_seed=None, workers=None):
+    if master_seed == None:
+        master_seed = int.from_bytes(os.urandom(8), "little")
+    if workers == None:
+        workers = os.cpu_count()
+
+    stats = combat_stats()
+    if workers == 1:
+        for task in shard_tasks(config, n, master_seed):
+            stats.merge(run_shard(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            # in shard order, so the floating point moments do not depend on which shard finishes first
+            for shard_stats in pool.imap(run_shard, shard_tasks(config, n, master_seed)):
+                stats.merge(shard_stats)
+    return stats
+
+def main(cmdline_args):
+    usage = '''Usage: montecarlo.py -p <player class> -s <sidekick type> -m <monster type> [-k <knowledge 0-3>]
+    [-n <combats>][-j <workers>][--seed <master seed>][--policy <attack|random|cautious>][--compiled]
+    [--lookahead <rollouts per action>][--max-rounds <rounds, 0 for no cap>]
+    [--profile <output prefix, writes <prefix>.json and <prefix>.prof>]'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "p:s:m:k:n:j:h", ["seed=", "policy=", "compiled", "lookahead=",
+                                                                      "max-rounds=", "profile=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"k": 0, "n": 10000, "j": None, "seed": None, "policy": "attack", "compiled": False, "lookahead": 0,
+                "max-rounds": simulate.round_cap or 0, "profile": None}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt == "--compiled":
+            settings["compiled"] = True
+        else:
+            settings[opt.lstrip("-")] = arg
+
+    if not all(key in settings for key in ("p", "s", "m")):
+        print(usage)
+        sys.exit(2)
+
+    config = combat_config(settings["p"], settings["s"], settings["m"], int(settings["k"]), settings["policy"],
+                           settings["compiled"], int(settings["lookahead"]),
+                           max_rounds=int(settings["max-rounds"]) or None, profile=settings["profile"] != None)
+    workers = int(settings["j"]) if settings["j"] != None else None
+    stats = run(config, int(settings["n"]), settings["seed"], workers)
+    stats.display()
+    if stats.profile != None:
+        print()
+        stats.profile.display()
+        stats.profile.save_json(settings["profile"] + ".json")
+        stats.profile.save_pstats(settings["profile"] + ".prof")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
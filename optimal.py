@@ -0,0 +1,560 @@
+import getopt
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import entities
+import fuzzy
+import markov
+import montecarlo
+import scene
+import vecsim
+from markov import PLAYER, SIDEKICK
+
+# Optimal sidekick policies, solved offline. decision_chain is markov.combat_chain with the
+# sidekick's choice left open: each state where the sidekick is conscious and about to act gets
+# one set of transitions per choice, and everything else moves as it does in the chain. Under the
+# rules the chain models, harry, hinder and dodge only touch the inert advantage flags, so what the
+# sidekick really chooses between is attacking or not, and the three other actions play out alike.
+#
+# The goals are the ones fuzzy.apply_rules is written for, in its order: the PC survives, the PC
+# is never downed, the PC lands the killing blow, the sidekick survives. solve_optimal() maximises
+# them lexicographically by value iteration, each goal only over the choices that are optimal for
+# all the goals before it. Every policy ends the combat with certainty, so any mix of those choices
+# is still optimal for the earlier goals.
+#
+# That policy reads the whole state (death saves, turn order, who last struck the monster), but a
+# sidekick only sees its frame: PC HP, its own HP and the party's damage. A policy_table gives an
+# action per frame. Starting from the optimal policy, each frame takes the choice whose advantage,
+# summed over the states with that frame weighted by how often the policy visits them, is
+# lexicographically better, and frames where neither choice is better keep the fuzzy controller's
+# action. A few rounds of policy iteration then repeat that step from the table itself. Tables are
+# solved per matchup and knowledge level, the level fixing the fuzzy controller the table starts
+# from and falls back on, and every table is evaluated exactly beside that controller.
+
+# outcome columns: markov's, with whether the PC landed the kill
+VICTORY, PLAYER_KILL, PLAYER_DOWNED, SIDEKICK_KILLED, SIDEKICK_DOWNED, TURNS = range(6)
+COLUMNS = TURNS + 3
+
+# (name, column, +1 to maximise or -1 to minimise), most important first
+goals = (
+    ("player_survives", VICTORY, 1),
+    ("player_not_downed", PLAYER_DOWNED, -1),
+    ("player_kill", PLAYER_KILL, 1),
+    ("sidekick_survives", SIDEKICK_KILLED, -1)
+)
+
+# the action a table plays for a frame where it doesn't attack but the fuzzy controller would
+passing_action = fuzzy.action.SELF_PRESERVE
+
+table_size = int(np.prod(fuzzy.table_bounds))
+table_pattern = "policy-%s-%s-%s.npz"
+
+class policy_outcome:
+    def __init__(self, values):
+        # values are the expected COLUMNS from the start, with expected rounds in place of the turn counts
+        self.player_survives = values[VICTORY]
+        self.player_not_downed = 1 - values[PLAYER_DOWNED]
+        self.player_kill = values[PLAYER_KILL]
+        self.sidekick_survives = 1 - values[SIDEKICK_KILLED]
+        self.sidekick_not_downed = 1 - values[SIDEKICK_DOWNED]
+        self.expected_rounds = values[TURNS]
+
+    def goals(self):
+        return tuple(getattr(self, name) for name, _, _ in goals)
+
+    def better_than(self, other: 'policy_outcome', tolerance=1e-9):
+        for mine, theirs in zip(self.goals(), other.goals()):
+            if mine > theirs + tolerance:
+                return True
+            if mine < theirs - tolerance:
+                return False
+        return False
+
+class decision_chain(markov.combat_chain):
+    def enumerate(self):
+        # as combat_chain.enumerate, but transitions leave from choices rather than states: a state
+        # has one choice, or two (not attacking, then attacking) where the sidekick decides
+        fresh = (0, 0, False, False, False)
+        sidekick_life = (self.sidekick.max_hp,) + fresh
+        self.starts = []
+        self.index = {}
+        states = []
+        for order, pc_max, p in self.initial:
+            first = order.index(PLAYER)
+            cycle = order[first:] + order[:first]
+            start = (cycle, pc_max, (pc_max,) + fresh, sidekick_life, self.monster.max_hp, order[0], None, False)
+            self.starts.append((start, order[0], p))
+            if start not in self.index:
+                self.index[start] = len(states)
+                states.append(start)
+
+        following = {}
+        for cycle in set(state[0] for state in states):
+            following[cycle] = {cycle[i]: cycle[(i + 1) % 3] for i in range(3)}
+
+        choice_states, sources, targets, probabilities = [], [], [], []
+        absorbed = []
+        index = self.index
+        i = 0
+        while i < len(states):
+            state = states[i]
+            cycle, pc_max, _, sk, _, actor, _, _ = state
+            successor = following[cycle][actor]
+            deciding = actor == SIDEKICK and markov.status_of(sk) == scene.status.GOOD
+            for attacks in ((False, True) if deciding else (None,)):
+                choice = len(choice_states)
+                choice_states.append(i)
+                merged = {}
+                for p, pc, sk, monster_hp, struck_by, far in self.turn(state, attacks):
+                    if sk[5]:
+                        sk, struck_by = markov.dead_life, None
+                    new = (cycle, pc_max, pc, sk, monster_hp, successor, struck_by, far)
+                    merged[new] = merged.get(new, 0) + p
+
+                terminal = [0.0]*COLUMNS
+                for new, p in merged.items():
+                    _, _, pc, sk, monster_hp, _, _, _ = new
+                    if monster_hp == 0 or pc[5]:
+                        terminal[VICTORY] += p*(monster_hp == 0)
+                        terminal[PLAYER_KILL] += p*(monster_hp == 0 and actor == PLAYER)
+                        terminal[PLAYER_DOWNED] += p*pc[4]
+                        terminal[SIDEKICK_KILLED] += p*sk[5]
+                        terminal[SIDEKICK_DOWNED] += p*sk[4]
+                        continue
+                    j = index.get(new)
+                    if j == None:
+                        j = index[new] = len(states)
+                        states.append(new)
+                    sources.append(choice)
+                    targets.append(j)
+                    probabilities.append(p)
+                absorbed.append(terminal)
+            i += 1
+
+        self.states = states
+        self.choice_states = np.array(choice_states, dtype=np.int64)
+        self.sources = np.array(sources, dtype=np.int64)
+        self.targets = np.array(targets, dtype=np.int64)
+        self.probabilities = np.array(probabilities)
+        self.absorbed = np.array(absorbed).reshape(-1, COLUMNS)
+        self.prepare()
+
+    def prepare(self):
+        # Everything below works on states ranked as markov's solve ranks them: by monster HP, lowest
+        # first, then by place in the cycle, last actor first. Choices follow their states' ranks
+        # and transitions their choices', so each level of monster HP is one contiguous block.
+        states = self.states
+        n = len(states)
+        monster_hp = np.array([state[4] for state in states])
+        place = np.array([state[0].index(state[5]) for state in states])
+        ranked = np.lexsort((-place, monster_hp))
+        rank = np.empty(n, dtype=np.int64)
+        rank[ranked] = np.arange(n)
+        self.rank = rank
+
+        by_state = np.argsort(rank[self.choice_states], kind="stable")
+        choice_rank = np.empty(len(by_state), dtype=np.int64)
+        choice_rank[by_state] = np.arange(len(by_state))
+        self.state_of = rank[self.choice_states][by_state]
+        self.first = np.searchsorted(self.state_of, np.arange(n))
+        self.second = self.first + np.bincount(self.state_of, minlength=n) - 1
+
+        sources = choice_rank[self.sources]
+        by_source = np.argsort(sources, kind="stable")
+        self.edge_choice = sources[by_source]
+        self.edge_state = self.state_of[self.edge_choice]
+        self.edge_target = rank[self.targets][by_source]
+        self.edge_probability = self.probabilities[by_source]
+
+        actors = np.array([state[5] for state in states])[ranked]
+        self.rewards = self.absorbed[by_state]
+        for role in range(3):
+            self.rewards[:, TURNS + role] += actors[self.state_of] == role
+        self.settled = np.zeros((n, COLUMNS), dtype=bool)
+        self.settled[:, SIDEKICK_KILLED] = [states[i][3][5] for i in ranked]
+        self.settled[:, PLAYER_DOWNED] = [states[i][2][4] for i in ranked]
+        self.settled[:, SIDEKICK_DOWNED] = [states[i][3][4] for i in ranked]
+
+        # the sidekick's decisions and the frame each one is made in
+        self.decisions = np.flatnonzero(self.second > self.first)
+        frames = np.array([(states[i][2][0], states[i][3][0], self.monster.max_hp - states[i][4])
+                           for i in ranked[self.decisions]], dtype=np.int64).reshape(-1, 3)
+        if np.any(frames >= fuzzy.table_bounds):
+            raise ValueError("this matchup has frames beyond fuzzy.table_bounds")
+        self.frames = np.ravel_multi_index(frames.T, fuzzy.table_bounds)
+
+        # per level: (states low, high, choices low, high, transitions low, high, place groups);
+        # a place group is (states low, high, choices low, high)
+        monster_hp, place = monster_hp[ranked], place[ranked]
+        self.levels = []
+        for hp in np.unique(monster_hp):
+            low, high = np.searchsorted(monster_hp, [hp, hp + 1])
+            choice_low, choice_high = self.first[low], self.second[high - 1] + 1
+            edge_low, edge_high = np.searchsorted(self.edge_choice, [choice_low, choice_high])
+            groups = []
+            bounds = np.searchsorted(-place[low:high], [-2, -1, 0, 1]) + low
+            for group_low, group_high in zip(bounds[:-1], bounds[1:]):
+                if group_low != group_high:
+                    groups.append((group_low, group_high, self.first[group_low], self.second[group_high - 1] + 1))
+            self.levels.append((low, high, choice_low, choice_high, edge_low, edge_high, groups))
+
+    def backup(self, columns, chosen=None, allowed=None, sense=1, tolerance=1e-13, max_sweeps=100000):
+        # Values of the given columns, and of every choice, under the policy chosen (one choice per
+        # state), or else under the allowed choice that is best for the first column. Levels are
+        # solved lowest monster HP first, as in markov's solve. Values are kept one row per column,
+        # so each column's update is a single bincount over the transitions.
+        columns = list(columns)
+        n = len(self.first)
+        rewards = self.rewards[:, columns].T
+        settled = self.settled[:, columns].T
+        values = np.zeros((len(columns), n))
+        q = np.zeros((len(columns), len(self.state_of)))
+        for low, high, choice_low, choice_high, edge_low, edge_high, groups in self.levels:
+            edges = np.arange(edge_low, edge_high)
+            inside = self.edge_target[edges] >= low
+            outside = edges[~inside]
+            size = choice_high - choice_low
+            bins = self.edge_choice[outside] - choice_low
+            fixed = rewards[:, choice_low:choice_high].copy()
+            for column in range(len(columns)):
+                fixed[column] += np.bincount(bins, self.edge_probability[outside]*values[column, self.edge_target[outside]],
+                                             minlength=size)
+
+            prepared = []
+            edges = edges[inside]
+            for group_low, group_high, group_choice_low, group_choice_high in groups:
+                group_edges = edges[(self.edge_choice[edges] >= group_choice_low) & (self.edge_choice[edges] < group_choice_high)]
+                prepared.append((group_low, group_high, group_choice_low, group_choice_high,
+                                 self.edge_choice[group_edges] - group_choice_low, self.edge_target[group_edges],
+                                 self.edge_probability[group_edges],
+                                 fixed[:, group_choice_low - choice_low:group_choice_high - choice_low]))
+
+            # the columns are independent, so each one stops sweeping once it has converged
+            active = range(len(columns))
+            for sweep in range(max_sweeps):
+                unsettled = []
+                for column in active:
+                    change = 0.0
+                    for (group_low, group_high, group_choice_low, group_choice_high, bins, group_targets,
+                         group_probabilities, group_fixed) in prepared:
+                        q[column, group_choice_low:group_choice_high] = group_fixed[column] + np.bincount(
+                            bins, group_probabilities*values[column, group_targets], minlength=group_choice_high - group_choice_low)
+                        updated = self.select(q[column], group_low, group_high, chosen, allowed, sense)
+                        updated[settled[column, group_low:group_high]] = 1.0
+                        change = max(change, np.abs(updated - values[column, group_low:group_high]).max())
+                        values[column, group_low:group_high] = updated
+                    if change >= tolerance:
+                        unsettled.append(column)
+                active = unsettled
+                if not active:
+                    break
+        q[settled[:, self.state_of]] = 1.0
+        return values, q
+
+    def select(self, q, low, high, chosen, allowed, sense):
+        # q is one column's values of every choice
+        if chosen is not None:
+            return q[chosen[low:high]]
+        first, second = self.first[low:high], self.second[low:high]
+        passing = np.where(allowed[first], sense*q[first], -np.inf)
+        attacking = np.where(allowed[second], sense*q[second], -np.inf)
+        return q[np.where(attacking > passing, second, first)]
+
+    def solve_optimal(self, tolerance=1e-9):
+        # the lexicographically optimal policy over whole states, as one choice per state
+        allowed = np.ones(len(self.state_of), dtype=bool)
+        for _, column, sense in goals:
+            values, q = self.backup((column,), allowed=allowed, sense=sense)
+            allowed &= sense*q[0] >= sense*values[0, self.state_of] - tolerance
+        # anything still tied doesn't matter for any goal, and not attacking comes first
+        return np.where(allowed[self.first], self.first, self.second)
+
+    def evaluate(self, chosen):
+        # (policy_outcome, values of every choice) for a policy
+        values, q = self.backup(range(COLUMNS), chosen)
+        result = np.zeros(TURNS + 1)
+        for start, actor, p in self.starts:
+            outcome = values[:, self.rank[self.index[start]]]
+            result += p*np.append(outcome[:TURNS], outcome[TURNS + actor])
+        return policy_outcome(result), q
+
+    def visits(self, chosen, tolerance=1e-13, max_sweeps=100000):
+        # expected number of times a policy reaches each state, solved from the highest monster HP
+        # down; within a level, the states of each place take in what the place before sends them
+        n = len(self.first)
+        inflow = np.zeros(n)
+        for start, _, p in self.starts:
+            inflow[self.rank[self.index[start]]] += p
+        taken = chosen[self.edge_state] == self.edge_choice
+        visited = np.zeros(n)
+        for low, high, choice_low, choice_high, edge_low, edge_high, groups in reversed(self.levels):
+            edges = edge_low + np.flatnonzero(taken[edge_low:edge_high])
+            inside = self.edge_target[edges] >= low
+            prepared = []
+            for group_low, group_high, _, _ in reversed(groups):
+                group_edges = edges[inside & (self.edge_target[edges] >= group_low) & (self.edge_target[edges] < group_high)]
+                prepared.append((group_low, group_high, self.edge_target[group_edges] - group_low,
+                                 self.edge_state[group_edges], self.edge_probability[group_edges]))
+            for sweep in range(max_sweeps):
+                change = 0.0
+                for group_low, group_high, group_targets, group_sources, group_probabilities in prepared:
+                    updated = inflow[group_low:group_high] + np.bincount(
+                        group_targets, group_probabilities*visited[group_sources], minlength=group_high - group_low)
+                    change = max(change, np.abs(updated - visited[group_low:group_high]).max())
+                    visited[group_low:group_high] = updated
+                if change < tolerance:
+                    break
+            outside = edges[~inside]
+            inflow += np.bincount(self.edge_target[outside], self.edge_probability[outside]*visited[self.edge_state[outside]],
+                                  minlength=n)
+        return visited
+
+    def policy_of(self, attacks):
+        # the policy that plays a frame table's choices (True to attack, per flat frame index)
+        chosen = self.first.copy()
+        decisions = self.decisions
+        chosen[decisions] = np.where(attacks[self.frames], self.second[decisions], self.first[decisions])
+        return chosen
+
+    def improve(self, chosen, q, attacks, tolerance=1e-9):
+        # a frame table from the advantages of attacking under a policy, weighted by that policy's
+        # visits; frames with no lexicographic preference keep their choice in attacks
+        decisions = self.decisions
+        weights = self.visits(chosen)[decisions]
+        margin = tolerance*np.bincount(self.frames, weights, minlength=table_size)
+        improved = attacks.copy()
+        undecided = np.ones(table_size, dtype=bool)
+        for _, column, sense in goals:
+            advantage = sense*(q[column, self.second[decisions]] - q[column, self.first[decisions]])
+            score = np.bincount(self.frames, weights*advantage, minlength=table_size)
+            improved[undecided & (score > margin)] = True
+            improved[undecided & (score < -margin)] = False
+            undecided &= np.abs(score) <= margin
+        return improved
+
+class policy_table:
+    # A sidekick's action for each frame within fuzzy.table_bounds, answered by a list lookup as
+    # fuzzy.decision_table does. Frames beyond the bounds go to the engine given, if any.
+    def __init__(self, actions, engine: fuzzy.FuzzyEngine = None):
+        self.actions = np.asarray(actions, dtype=np.int8).reshape(fuzzy.table_bounds)
+        self.cells = [fuzzy.action(value) for value in self.actions.ravel().tolist()]
+        self.engine = engine
+
+    def lookup(self, frame):
+        player_health = frame["player_health"]
+        sidekick_health = frame["sidekick_health"]
+        damage_dealt = frame["damage_dealt"]
+        players, sidekicks, damages = fuzzy.table_bounds
+        if 0 <= player_health < players and 0 <= sidekick_health < sidekicks and 0 <= damage_dealt < damages:
+            return self.cells[(player_health*sidekicks + sidekick_health)*damages + damage_dealt]
+        if self.engine == None:
+            raise ValueError("frame outside the policy table: %s" %frame)
+        return self.engine.suggest_action(frame)[0]
+
+class TablePlanner:
+    # A Sidekick.planner that plays a policy_table, falling back on the sidekick's own engine
+    def __init__(self, table: policy_table):
+        self.table = table
+
+    def choose(self, sidekick: scene.Sidekick, current_scene: scene.Scene):
+        frame = {
+            "player_health": current_scene.player_character.get_hp(),
+            "sidekick_health": sidekick.get_hp(),
+            "damage_dealt": sidekick.damage_dealt + current_scene.player_character.damage_dealt
+        }
+        if self.table.engine != sidekick.engine:
+            self.table.engine = sidekick.engine
+        suggested_action = self.table.lookup(frame)
+        return suggested_action, ((suggested_action, 1.0),)
+
+class level_solution:
+    def __init__(self, knowledge_level, actions, table: policy_table, fuzzy_outcome: policy_outcome,
+                 table_outcome: policy_outcome, changed_frames, agreement, rounds):
+        self.knowledge_level = knowledge_level
+        self.actions = actions
+        self.table = table
+        self.fuzzy = fuzzy_outcome
+        self.outcome = table_outcome
+        # frames where the table attacks and the fuzzy controller doesn't, or the other way round
+        self.changed_frames = changed_frames
+        # the share of the table's decisions in play the fuzzy controller would have made the same way
+        self.agreement = agreement
+        # policy iteration rounds that improved on the table before them
+        self.rounds = rounds
+
+class matchup_solution:
+    def __init__(self, config: montecarlo.combat_config, states, decision_states, optimum: policy_outcome, levels, elapsed):
+        self.config = config
+        self.states = states
+        self.decision_states = decision_states
+        # the whole-state optimum, which no frame table can beat
+        self.optimum = optimum
+        self.levels = levels
+        self.elapsed = elapsed
+
+    def name(self):
+        return "%s + %s vs %s" %(self.config.player_class, self.config.sidekick_type, self.config.monster_type)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, table_pattern %(self.config.player_class, self.config.sidekick_type,
+                                                         self.config.monster_type))
+        arrays = {"knowledge_%d" %level.knowledge_level.value: level.actions for level in self.levels}
+        partial = path + ".tmp"
+        with open(partial, "wb") as file:
+            np.savez_compressed(file, policy=np.array(self.config.policy),
+                                norms=np.array(self.config.norms or ""), **arrays)
+        os.replace(partial, path)
+        return path
+
+    def display(self):
+        print("%s, %d states, %d sidekick decisions, %.1fs" %(self.name(), self.states, self.decision_states, self.elapsed))
+        print("%-22s %10s %10s %10s %10s %8s %8s %9s" %("Policy", "PC alive", "Not down", "PC kill", "SK alive",
+                                                       "Rounds", "Changed", "Agrees"))
+        row = "%-22s %10.6f %10.6f %10.6f %10.6f %8.3f"
+        for level in self.levels:
+            name = level.knowledge_level.name
+            print(row %((("fuzzy " + name),) + level.fuzzy.goals() + (level.fuzzy.expected_rounds,)))
+            print((row + " %8d %8.1f%%") %((("table " + name),) + level.outcome.goals() +
+                                           (level.outcome.expected_rounds, level.changed_frames, 100*level.agreement)))
+        print(row %(("whole-state optimum",) + self.optimum.goals() + (self.optimum.expected_rounds,)))
+
+def fuzzy_actions(config: montecarlo.combat_config, chain: decision_chain, knowledge_level):
+    # the fuzzy controller's action in every frame, at one knowledge level
+    t_norm, s_norm = chain.engine.t_norm, chain.engine.s_norm
+    leveled = montecarlo.combat_config(config.player_class, config.sidekick_type, config.monster_type, knowledge_level,
+                                       config.policy, norms=config.norms)
+    context = vecsim.knowledge_context(leveled, chain.player, chain.monster)
+    return vecsim.action_surface(*context, t_norm, s_norm), context
+
+def solve_level(chain: decision_chain, optimal, optimal_q, fuzzy_attacks, refinements):
+    # (table attacks, fuzzy outcome, table outcome, agreement, rounds) from a fuzzy controller's attacks
+    fuzzy_policy = chain.policy_of(fuzzy_attacks)
+    fuzzy_outcome, _ = chain.evaluate(fuzzy_policy)
+
+    attacks = chain.improve(optimal, optimal_q, fuzzy_attacks)
+    chosen = chain.policy_of(attacks)
+    outcome, q = chain.evaluate(chosen)
+    rounds = 0
+    for _ in range(refinements):
+        improved = chain.improve(chosen, q, attacks)
+        if np.array_equal(improved, attacks):
+            break
+        improved_chosen = chain.policy_of(improved)
+        improved_outcome, improved_q = chain.evaluate(improved_chosen)
+        if not improved_outcome.better_than(outcome):
+            break
+        attacks, chosen, outcome, q = improved, improved_chosen, improved_outcome, improved_q
+        rounds += 1
+    # the fuzzy controller is a frame table too, so a table never ends up worse than it
+    if fuzzy_outcome.better_than(outcome):
+        attacks, chosen, outcome = fuzzy_attacks, fuzzy_policy, fuzzy_outcome
+
+    weights = chain.visits(chosen)[chain.decisions]
+    frames = chain.frames
+    agreement = weights[attacks[frames] == fuzzy_attacks[frames]].sum()/weights.sum() if weights.sum() > 0 else 1.0
+    return attacks, fuzzy_outcome, outcome, agreement, rounds
+
+def solve(config: montecarlo.combat_config, knowledge_levels=None, refinements=3):
+    start = time.perf_counter()
+    if knowledge_levels == None:
+        knowledge_levels = list(scene.knowledge)
+    chain = decision_chain(config)
+    optimal = chain.solve_optimal()
+    optimum, optimal_q = chain.evaluate(optimal)
+
+    levels = []
+    # knowledge levels whose controllers decide alike in every frame the matchup reaches share a solution
+    solved = {}
+    for level in knowledge_levels:
+        level = scene.knowledge(level)
+        surface, context = fuzzy_actions(config, chain, level)
+        fuzzy_attacks = surface == fuzzy.action.AGGRESSIVE.value
+        key = fuzzy_attacks[chain.frames].tobytes()
+        if key not in solved:
+            solved[key] = solve_level(chain, optimal, optimal_q, fuzzy_attacks, refinements)
+        reached_attacks, fuzzy_outcome, outcome, agreement, rounds = solved[key]
+        # frames the matchup never reaches keep this level's controller
+        attacks = fuzzy_attacks.copy()
+        attacks[chain.frames] = reached_attacks[chain.frames]
+
+        actions = np.where(attacks, fuzzy.action.AGGRESSIVE.value,
+                           np.where(fuzzy_attacks, passing_action.value, surface)).astype(np.int8)
+        engine = fuzzy.FuzzyEngine(*context, chain.engine.t_norm, chain.engine.s_norm, compiled_tables=False)
+        levels.append(level_solution(level, actions, policy_table(actions, engine), fuzzy_outcome, outcome,
+                                     int(np.count_nonzero(attacks != fuzzy_attacks)), agreement, rounds))
+    return matchup_solution(config, len(chain.states), len(chain.decisions), optimum, levels,
+                            time.perf_counter() - start)
+
+def load_table(path, knowledge_level, engine: fuzzy.FuzzyEngine = None):
+    # the policy_table a saved matchup holds for one knowledge level
+    with np.load(path) as data:
+        return policy_table(data["knowledge_%d" %scene.knowledge(knowledge_level).value], engine)
+
+def solve_task(task):
+    config, knowledge_levels, refinements, directory = task
+    solution = solve(config, knowledge_levels, refinements)
+    if directory != None:
+        solution.save(directory)
+    # the tables hold engines, so only what the parent reports on crosses back
+    for level in solution.levels:
+        level.table = None
+    return solution
+
+def main(cmdline_args):
+    usage = '''Usage: optimal.py -p <classes> -s <sidekick types> -m <monster types> [-k <knowledge levels 0-3>]
+    [-o <table directory>][-j <workers>][--policy <attack|random|cautious>][--norms <goguen|godel|lukasiewicz|drastic>]
+    [--refine <policy iteration rounds>]
+Lists are comma separated; every combination is solved. Large matchups take minutes and gigabytes each.'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "p:s:m:k:o:j:h", ["policy=", "norms=", "refine=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"k": None, "o": None, "j": 1, "policy": "attack", "norms": None, "refine": 3}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        settings[opt.lstrip("-")] = arg
+
+    if not all(key in settings for key in ("p", "s", "m")):
+        print(usage)
+        sys.exit(2)
+
+    roster = entities.get_catalog()
+    try:
+        for names, known, kind in ((settings["p"], roster.players, "class"), (settings["s"], roster.monsters, "sidekick"),
+                                   (settings["m"], roster.monsters, "monster")):
+            unknown = [name for name in names.split(",") if name not in known]
+            if unknown:
+                raise ValueError("unknown %s: %s" %(kind, ", ".join(unknown)))
+        if settings["norms"] != None and settings["norms"] not in fuzzy.norm_pairs:
+            raise ValueError("unknown norm pair: %s" %settings["norms"])
+    except ValueError as error:
+        print(error)
+        sys.exit(2)
+
+    knowledge_levels = [int(level) for level in settings["k"].split(",")] if settings["k"] != None else None
+    tasks = [(montecarlo.combat_config(player_class, sidekick_type, monster_type, policy=settings["policy"],
+                                       norms=settings["norms"]), knowledge_levels, int(settings["refine"]), settings["o"])
+             for player_class in settings["p"].split(",")
+             for sidekick_type in settings["s"].split(",")
+             for monster_type in settings["m"].split(",")]
+    workers = int(settings["j"])
+    if workers == 1:
+        solutions = map(solve_task, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        solutions = pool.imap(solve_task, tasks)
+    for solution in solutions:
+        solution.display()
+        print()
+    if workers != 1:
+        pool.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
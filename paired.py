@@ -0,0 +1,221 @@
+import getopt
+import math
+import multiprocessing
+import os
+import random
+import sys
+import aggregate
+import dice
+import events
+import fuzzy
+import lookahead
+import montecarlo
+import scene
+import simulate
+
+# Paired comparisons with common random numbers. Every variant (a knowledge level, a norm pair or
+# any other combat_config) plays the same combats: each combatant draws from its own dice streams
+# (dice.stream_set), rewound for every variant to the same blocks of draws for that combat, so its
+# initiative, HP, attack, damage, death save and, for the monster, dodge and target draws are the
+# same in every variant however the sidekick's choices shift the others. The variants' per-combat
+# differences from the first variant then vary far less than two independent samples would, which
+# is the saving.
+
+# pre-drawn floats per stream and combat; a stream that needs more carries on from its own generator
+block_size = 32
+
+metrics = ("party_win", "player_downed", "player_killed", "sidekick_downed", "sidekick_killed", "rounds")
+
+def combat_metrics(result: scene.combat_result):
+    return (result.winner == scene.outcome.PARTY_VICTORY, result.downed["player"], result.killed["player"],
+            result.downed["sidekick"], result.killed["sidekick"], result.rounds)
+
+class paired_stats:
+    # per variant, moments of each metric and of its per-combat difference from the first variant
+    def __init__(self, labels):
+        self.labels = tuple(labels)
+        self.values = [[aggregate.running_moments() for _ in metrics] for _ in self.labels]
+        self.differences = [[aggregate.running_moments() for _ in metrics] for _ in self.labels]
+
+    def add(self, rows):
+        # rows holds one combat_metrics tuple per variant, all from the same combat seed
+        baseline = rows[0]
+        for values, differences, row in zip(self.values, self.differences, rows):
+            for i, value in enumerate(row):
+                values[i].add(value)
+                differences[i].add(value - baseline[i])
+
+    def merge(self, other: 'paired_stats'):
+        for mine, theirs in ((self.values, other.values), (self.differences, other.differences)):
+            for my_moments, their_moments in zip(mine, theirs):
+                for moments, more in zip(my_moments, their_moments):
+                    moments.merge(more)
+        return self
+
+    def comparison(self, variant, metric, z=1.96):
+        # (difference from the first variant, half-width of its CI, efficiency); efficiency is the
+        # variance two independent samples of the same size would give the difference, over the
+        # paired variance, i.e. how many times more combats an unpaired comparison would need. It
+        # is None when the paired differences do not vary at all.
+        i = metrics.index(metric)
+        difference = self.differences[variant][i]
+        half_width = z*difference.stderr()
+        unpaired = self.values[variant][i].variance() + self.values[0][i].variance()
+        paired = difference.variance()
+        efficiency = unpaired/paired if paired > 0 else None
+        return difference.mean, half_width, efficiency
+
+    def display(self, z=1.96):
+        combats = self.values[0][0].n
+        print("%d paired combats per variant, differences against %s, %.0f%% intervals" %(
+            combats, self.labels[0], 100*math.erf(z/math.sqrt(2))))
+        print("%-16s %-16s %10s %12s %20s %10s" %("Metric", "Variant", "Mean", "Difference", "Interval", "Efficiency"))
+        for i, metric in enumerate(metrics):
+            for variant, label in enumerate(self.labels):
+                mean = self.values[variant][i].mean
+                if variant == 0:
+                    print("%-16s %-16s %10.4f" %(metric, label, mean))
+                    continue
+                difference, half_width, efficiency = self.comparison(variant, metric, z)
+                # a variant that never plays a combat differently has no paired variance to compare
+                print("%-16s %-16s %10.4f %+12.4f %20s %10s" %(metric, label, mean, difference,
+                      "[%+.4f, %+.4f]" %(difference - half_width, difference + half_width),
+                      "%.1fx" %efficiency if efficiency != None else "identical"))
+
+def build_variant(config: montecarlo.combat_config):
+    combat = simulate.build_scene(config.player_class, config.sidekick_type, config.monster_type,
+                                  config.knowledge_level, simulate.policies[config.policy])
+    if config.norms != None:
+        combat.resolve_smartness(*fuzzy.norm_pairs[config.norms])
+    if config.lookahead:
+        combat.sidekick.planner = lookahead.LookaheadPlanner(config.lookahead)
+    combat.max_rounds = config.max_rounds
+    for actor in combat.roles():
+        actor.entity.streams = dice.replay_streams()
+    return combat
+
+class combat_draws:
+    # everything a combat seed fixes, drawn once and replayed into each variant
+    def __init__(self, combat_seed):
+        self.combat_seed = combat_seed
+        purposes = len(dice.stream_set.__slots__)
+        # each purpose has a seed of its own, so no two sequences share draws
+        blocks = dice.draw_blocks(random.Random("%s:blocks" %combat_seed), len(scene.role_names)*purposes, block_size)
+        self.blocks = [blocks[role*purposes:(role + 1)*purposes] for role in range(len(scene.role_names))]
+        # whatever still draws from the module generators (a random PC policy, lookahead rollouts)
+        # starts from the same point in every variant too
+        self.random_state = random.Random("%s:random" %combat_seed).getstate()
+        self.dice_state = random.Random("%s:dice" %combat_seed).getstate()
+
+def play(combat: scene.Scene, draws: combat_draws):
+    combat_seed = draws.combat_seed
+    for role, actor in enumerate(combat.roles()):
+        actor.entity.streams.rewind(draws.blocks[role], combat_seed*len(scene.role_names) + role)
+    random.setstate(draws.random_state)
+    dice.generator.setstate(draws.dice_state)
+    if combat.sidekick.planner != None:
+        combat.sidekick.planner.rng.seed(combat_seed)
+    combat.reset()
+    combat.run()
+    return combat.result()
+
+def run_shard(task):
+    configs, labels, master_seed, shard, n = task
+    seeds = random.Random(montecarlo.shard_seed(master_seed, shard))
+    previous_sink = events.set_sink(events.null)
+    # play rewinds the module generators, so put them back along with the table mode
+    with montecarlo.module_state():
+        try:
+            fuzzy.compiled_tables = configs[0].compiled_tables
+            combats = [build_variant(config) for config in configs]
+            stats = paired_stats(labels)
+            for _ in range(n):
+                draws = combat_draws(seeds.getrandbits(64))
+                stats.add([combat_metrics(play(combat, draws)) for combat in combats])
+        finally:
+            events.set_sink(previous_sink)
+    return stats
+
+def run(configs, labels, n, master_seed=None, workers=None):
+    if master_seed == None:
+        master_seed = int.from_bytes(os.urandom(8), "little")
+    if workers == None:
+        workers = os.cpu_count()
+    tasks = [(configs, labels, master_seed, shard, min(montecarlo.shard_size, n - start))
+             for shard, start in enumerate(range(0, n, montecarlo.shard_size))]
+
+    stats = paired_stats(labels)
+    if workers == 1:
+        for task in tasks:
+            stats.merge(run_shard(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            # in shard order, so the merged moments do not depend on which shard finishes first
+            for shard_stats in pool.imap(run_shard, tasks):
+                stats.merge(shard_stats)
+    return stats
+
+def variants(player_class, sidekick_type, monster_type, vary, values, knowledge_level=scene.knowledge.LOW,
+             policy="attack", compiled_tables=False):
+    # (configs, labels) for one matchup, varying the knowledge level (values are 0-3) or the norm
+    # pair (values are fuzzy.norm_pairs keys); the first value is the baseline
+    configs, labels = [], []
+    for value in values:
+        if vary == "knowledge":
+            level = scene.knowledge(int(value))
+            configs.append(montecarlo.combat_config(player_class, sidekick_type, monster_type, level, policy,
+                                                    compiled_tables))
+            labels.append(level.name)
+        elif vary == "norms":
+            if value not in fuzzy.norm_pairs:
+                raise ValueError("unknown norm pair: %s" %value)
+            configs.append(montecarlo.combat_config(player_class, sidekick_type, monster_type, knowledge_level,
+                                                    policy, compiled_tables, norms=value))
+            labels.append(value)
+        else:
+            raise ValueError("can only vary knowledge or norms")
+    return configs, labels
+
+def main(cmdline_args):
+    usage = '''Usage: paired.py -p <player class> -s <sidekick type> -m <monster type> [--vary <knowledge|norms>]
+    [--variants <comma separated knowledge levels or norm pairs, baseline first>][-k <knowledge 0-3 when varying norms>]
+    [-n <combats per variant>][-j <workers>][--seed <master seed>][--policy <attack|random|cautious>][--compiled]'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "p:s:m:k:n:j:h", ["vary=", "variants=", "seed=", "policy=",
+                                                                      "compiled", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"k": 0, "n": 10000, "j": None, "seed": None, "policy": "attack", "compiled": False,
+                "vary": "knowledge", "variants": None}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt == "--compiled":
+            settings["compiled"] = True
+        else:
+            settings[opt.lstrip("-")] = arg
+
+    if not all(key in settings for key in ("p", "s", "m")):
+        print(usage)
+        sys.exit(2)
+
+    if settings["variants"] != None:
+        values = settings["variants"].split(",")
+    elif settings["vary"] == "knowledge":
+        values = [level.value for level in scene.knowledge]
+    else:
+        values = list(fuzzy.norm_pairs)
+    try:
+        configs, labels = variants(settings["p"], settings["s"], settings["m"], settings["vary"], values,
+                                   int(settings["k"]), settings["policy"], settings["compiled"])
+    except ValueError as error:
+        print(error)
+        sys.exit(2)
+    workers = int(settings["j"]) if settings["j"] != None else None
+    run(configs, labels, int(settings["n"]), settings["seed"], workers).display()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,179 @@
+import contextlib
+import functools
+import json
+import marshal
+import time
+import dice
+import entities
+import fuzzy
+import lookahead
+import scene
+import simulate
+
+# Opt-in instrumentation for the combat hot paths. enable() swaps each probed method or function
+# for a wrapper that counts calls and times them; disable() puts the originals back. While off,
+# nothing is wrapped, so the hot paths cost exactly what they did.
+#
+# Each probe keeps inclusive time (the call and everything under it) and self time (minus other
+# probed calls under it), along with the probed caller it was reached from. A profile_data merges
+# with another by summing, so shards profiled in worker processes add up in the parent. It exports
+# to JSON, and to the marshalled dict that pstats, snakeviz and other cProfile tools read.
+
+# (probe name, owner, attribute)
+probes = (
+    ("scene.construct", scene.Scene, "__init__"),
+    ("scene.reset", scene.Scene, "reset"),
+    ("simulate.build_scene", simulate, "build_scene"),
+    ("scene.resolve_turn", scene.Scene, "resolve_turn"),
+    ("entity.turn_start", entities.Entity, "turn_start"),
+    ("actor.can_act", scene.Actor, "can_act"),
+    ("sidekick.take_action", scene.Sidekick, "take_action"),
+    ("sidekick.decision.fuzzy", fuzzy.FuzzyEngine, "suggest_action"),
+    ("sidekick.decision.lookahead", lookahead.LookaheadPlanner, "choose"),
+    ("entity.attack", entities.Entity, "attack"),
+    ("entity.multiattack", entities.Entity, "multiattack"),
+    ("entity.death_save_roll", entities.Entity, "death_save_roll"),
+    ("dice.roll", dice.roll_spec, "roll")
+)
+
+clock = time.perf_counter_ns
+
+class profile_data:
+    def __init__(self):
+        # name -> [calls, inclusive ns, self ns]
+        self.totals = {}
+        # (caller name, name) -> [calls, inclusive ns, self ns]; the caller is None at top level
+        self.edges = {}
+        # name -> (file, first line, function name) of the probed code, for pstats
+        self.sites = {}
+
+    def record(self, caller, name, inclusive, own):
+        totals = self.totals.get(name)
+        if totals == None:
+            totals = self.totals[name] = [0, 0, 0]
+        totals[0] += 1
+        totals[1] += inclusive
+        totals[2] += own
+        edge = self.edges.get((caller, name))
+        if edge == None:
+            edge = self.edges[(caller, name)] = [0, 0, 0]
+        edge[0] += 1
+        edge[1] += inclusive
+        edge[2] += own
+
+    def merge(self, other: 'profile_data'):
+        for mine, theirs in ((self.totals, other.totals), (self.edges, other.edges)):
+            for key, values in theirs.items():
+                counts = mine.setdefault(key, [0, 0, 0])
+                for i, value in enumerate(values):
+                    counts[i] += value
+        self.sites.update(other.sites)
+        return self
+
+    def to_json(self):
+        return {
+            "probes": {name: {"calls": calls, "total_s": inclusive/1e9, "self_s": own/1e9,
+                              "mean_us": inclusive/calls/1e3 if calls else 0}
+                       for name, (calls, inclusive, own) in sorted(self.totals.items())},
+            "callers": [{"caller": caller, "callee": name, "calls": calls, "total_s": inclusive/1e9, "self_s": own/1e9}
+                        for (caller, name), (calls, inclusive, own) in sorted(self.edges.items(), key=str)]
+        }
+
+    def save_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file, indent=2)
+
+    def pstats_dict(self):
+        # {function: (primitive calls, calls, self s, inclusive s, {caller: (same four)})}
+        stats = {}
+        for name, (calls, inclusive, own) in self.totals.items():
+            callers = {}
+            for (caller, callee), (edge_calls, edge_inclusive, edge_own) in self.edges.items():
+                if callee == name and caller != None:
+                    callers[self.site(caller)] = (edge_calls, edge_calls, edge_own/1e9, edge_inclusive/1e9)
+            stats[self.site(name)] = (calls, calls, own/1e9, inclusive/1e9, callers)
+        return stats
+
+    def site(self, name):
+        filename, line, function = self.sites.get(name, ("~", 0, name))
+        return filename, line, "%s [%s]" %(function, name)
+
+    def save_pstats(self, path):
+        # loadable with pstats.Stats(path)
+        with open(path, "wb") as file:
+            marshal.dump(self.pstats_dict(), file)
+
+    def display(self):
+        print("%-30s %10s %12s %12s %10s" %("Probe", "Calls", "Total s", "Self s", "Mean us"))
+        for name, (calls, inclusive, own) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            print("%-30s %10d %12.4f %12.4f %10.2f" %(name, calls, inclusive/1e9, own/1e9, inclusive/calls/1e3))
+
+data = profile_data()
+# one [probe name, ns spent in probed callees] frame per probed call in progress
+stack = []
+originals = {}
+sites = {}
+
+def probe(name, function):
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        frame = [name, 0]
+        stack.append(frame)
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            inclusive = clock() - start
+            stack.pop()
+            caller = None
+            if stack:
+                stack[-1][1] += inclusive
+                caller = stack[-1][0]
+            data.record(caller, name, inclusive, inclusive - frame[1])
+    return timed
+
+def site_of(function):
+    code = getattr(function, "__code__", None)
+    if code == None:
+        return "~", 0, getattr(function, "__name__", "?")
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+def enabled():
+    return bool(originals)
+
+def enable():
+    if enabled():
+        return
+    for name, owner, attribute in probes:
+        # class attributes are read from __dict__, so inherited methods are wrapped on their definer
+        original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+        originals[(owner, attribute)] = original
+        sites[name] = site_of(original)
+        setattr(owner, attribute, probe(name, original))
+    data.sites.update(sites)
+
+def disable():
+    for (owner, attribute), original in originals.items():
+        setattr(owner, attribute, original)
+    originals.clear()
+    stack.clear()
+
+def reset():
+    global data
+    data = profile_data()
+    data.sites.update(sites)
+    return data
+
+@contextlib.contextmanager
+def session():
+    # profiles the block into a fresh profile_data, leaving any outer session's data and switch alone
+    global data
+    outer, was_enabled = data, enabled()
+    collected = reset()
+    enable()
+    try:
+        yield collected
+    finally:
+        if not was_enabled:
+            disable()
+        data = outer
@@ -1,4 +1,6 @@
+import dice
 import entities
+import events
 import random, sys
 from enum import Enum
 import fuzzy
@@ -13,24 +15,60 @@ class status(Enum):
     UNCONCIOUS = 1
     GOOD = 2
 
+# looking a member up on an Enum class is several times slower than reading a module global, so
+# the per-turn code uses these
+NEAR, FAR = position.NEAR, position.FAR
+DEAD, UNCONCIOUS, GOOD = status.DEAD, status.UNCONCIOUS, status.GOOD
+
 class knowledge(Enum):
     LOW = 0
     PLAYER_ONLY = 1
     ENEMY_ONLY = 2
     HIGH = 3
 
+class outcome(Enum):
+    PARTY_VICTORY = 0
+    MONSTER_VICTORY = 1
+    # the round or turn budget ran out, or nothing could change any more, with both sides standing
+    STALEMATE = 2
+
 verbose = False
 
 class Actor:
+    __slots__ = ("initiative", "entity", "position", "status", "damage_dealt", "downed", "killed")
+
     def __init__(self, entity: entities.Entity):
         self.initiative = entity.roll_initiative()
         self.entity = entity
-        self.position = position.NEAR
-        self.status = status.GOOD
+        self.position = NEAR
+        self.status = GOOD
+        self.damage_dealt = 0
+        self.downed = False
+        self.killed = False
+
+    def reset(self):
+        # readies the actor and its entity for another combat, rolling initiative again
+        self.entity.reset()
+        self.initiative = self.entity.roll_initiative()
+        self.position = NEAR
+        self.status = GOOD
         self.damage_dealt = 0
         self.downed = False
         self.killed = False
 
+    def clone(self, entity: entities.Entity):
+        twin = object.__new__(type(self))
+        for slot in entities.slots_of(type(self)):
+            setattr(twin, slot, getattr(self, slot))
+        twin.entity = entity
+        return twin
+
+    def state(self):
+        return (self.initiative, self.position, self.status, self.damage_dealt, self.downed, self.killed)
+
+    def restore(self, state):
+        self.initiative, self.position, self.status, self.damage_dealt, self.downed, self.killed = state
+
     def __lt__(self, other):
         if self.initiative == other.initiative:
             # break initiative ties with dexterity value
@@ -59,39 +97,42 @@ class Actor:
         return self.entity.current_hp
 
     def can_act(self):
-        if self.status != status.GOOD:
+        if self.status != GOOD:
             can_act = False
-            if self.status == status.UNCONCIOUS:
+            if self.status == UNCONCIOUS:
                 self.downed = True
-                print("%s lies unconcious..." %self)
+                events.emit(events.combat_event.UNCONCIOUS_TURN, self)
                 self.entity.death_save_roll()
             else:
-                print("%s's corpse is motionless..." %self)
+                events.emit(events.combat_event.CORPSE_TURN, self)
                 self.killed = True
         else:
             can_act = True
         return can_act
 
     def take_turn(self, scene: 'Scene'):
+        # returns the action taken: a command for the PC and monster, a fuzzy.action for the
+        # sidekick, or None if the actor couldn't act
         self.entity.turn_start()
         if self.can_act():
-            self.take_action(scene)
-            
+            return self.take_action(scene)
+        return None
+
 
     def determine_targets(self, scene: 'Scene'):
         possible_targets = []
-        if self.position == position.NEAR:
+        if self.position == NEAR:
             for actor in scene.actors:
-                if actor != self and actor.position == position.NEAR and actor.status != status.DEAD:
+                if actor != self and actor.position == NEAR and actor.status != DEAD:
                     possible_targets.append(actor)
         return possible_targets
 
     def disengage(self):
-        self.position = position.FAR
+        self.position = FAR
 
     def engage(self):
-        if self.position == position.FAR:
-            self.position = position.NEAR
+        if self.position == FAR:
+            self.position = NEAR
     
     def attack(self, target: 'Actor'):
         self.engage()
@@ -116,8 +157,12 @@ class Actor:
         return repr(self.entity)
 
 class PlayerCharacter(Actor):
-    def __init__(self, entity: entities.Player):
+    __slots__ = ("policy",)
+
+    # policy is an optional callable(player, scene) returning a command, used instead of prompting
+    def __init__(self, entity: entities.Player, policy=None):
         super().__init__(entity)
+        self.policy = policy
 
     def get_class(self):
         return self.entity.pc_class
@@ -125,7 +170,30 @@ class PlayerCharacter(Actor):
     def get_hit_die(self):
         return self.entity.hit_die
 
+    def perform(self, cmd, scene: 'Scene'):
+        if cmd == "attack":
+            self.attack(scene.enemy)
+        elif cmd == "disengage":
+            self.disengage()
+        elif cmd == "dodge":
+            self.dodge()
+        elif cmd == "harry":
+            self.harry(scene.enemy)
+        elif cmd == "hinder":
+            self.hinder(scene.enemy)
+        elif cmd == "wait":
+            events.emit(events.combat_event.WAIT, self)
+        else:
+            return False
+        return True
+
     def take_action(self, scene: 'Scene'):
+        if self.policy != None:
+            cmd = self.policy(self, scene)
+            if not self.perform(cmd, scene):
+                raise ValueError("policy chose an unrecognized command")
+            return cmd
+
         nearby_actors = self.determine_targets(scene)
         if len(nearby_actors) == 0:
             print("No one is nearby, though the sounds of battle are close...")
@@ -144,40 +212,39 @@ class PlayerCharacter(Actor):
                 prompt = True
             elif cmd == "exit":
                 sys.exit(0)
-            elif cmd == "attack":
-                self.attack(scene.enemy)
-            elif cmd == "disengage":
-                self.disengage()
-            elif cmd == "dodge":
-                self.dodge()
-            elif cmd == "harry":
-                self.harry(scene.enemy)
-            elif cmd == "hinder":
-                self.hinder(scene.enemy)
-            elif cmd == "wait":
-                print("%s patiently bides their time..." %self)
-            else:
+            elif not self.perform(cmd, scene):
                 print("Unrecognized command. Enter \"-h\" to see help.")
                 prompt = True
+        return cmd
 
 class Sidekick(Actor):
-    def __init__(self, entity: entities.Sidekick):
+    __slots__ = ("knowledge_level", "engine", "planner")
+
+    # planner is an optional object whose choose(sidekick, scene) returns (action, action scores),
+    # used instead of the fuzzy engine
+    def __init__(self, entity: entities.Sidekick, planner=None):
         super().__init__(entity)
         self.knowledge_level = None
+        # Scene.resolve_smartness replaces this with an engine for the sidekick's knowledge level
+        self.engine = fuzzy.FuzzyEngine()
+        self.planner = planner
 
     def take_action(self, scene: 'Scene'):
-        frame = {
-            "player_health": scene.player_character.get_hp(),
-            "sidekick_health": self.get_hp(),
-            "damage_dealt": self.damage_dealt + scene.player_character.damage_dealt
-        }
-        suggested_action, rule_strengths = fuzzy.suggest_action(frame)
-
-        if verbose:
-            print("%s considers their action carefully..." %self)
-            for action_type, strength in rule_strengths:
-                print("%s\t%.2f" %(action_type.name, strength))
-
+        if self.planner != None:
+            suggested_action, rule_strengths = self.planner.choose(self, scene)
+        else:
+            frame = {
+                "player_health": scene.player_character.get_hp(),
+                "sidekick_health": self.get_hp(),
+                "damage_dealt": self.damage_dealt + scene.player_character.damage_dealt
+            }
+            suggested_action, rule_strengths = self.engine.suggest_action(frame)
+
+        events.emit(events.combat_event.DECISION, self, None, (suggested_action, rule_strengths))
+        self.act(suggested_action, scene)
+        return suggested_action
+
+    def act(self, suggested_action, scene: 'Scene'):
         if suggested_action == fuzzy.action.AGGRESSIVE:
             self.attack(scene.enemy)
         elif suggested_action == fuzzy.action.SUPPORTIVE:
@@ -187,11 +254,13 @@ class Sidekick(Actor):
         elif suggested_action == fuzzy.action.SELF_PRESERVE:
             self.dodge()
         else:
-            raise("bad action")
+            raise ValueError("bad action: %r" %suggested_action)
     
 
 
 class Enemy(Actor):
+    __slots__ = ()
+
     def __init__(self, entity: entities.Monster):
         super().__init__(entity)
 
@@ -205,27 +274,87 @@ class Enemy(Actor):
             possible_targets = self.determine_targets(scene)
         damage, target = self.entity.take_action([target.entity for target in possible_targets])
         self.damage_dealt += damage
+        return "attack" if target != None else "dodge"
 
     def engage(self, scene: 'Scene'):
-        if self.position == position.FAR:
-            self.position = position.NEAR
+        if self.position == FAR:
+            self.position = NEAR
         
-        # if every actor is FAR, engaging makes every actor NEAR
-        others = [actor for actor in scene.actors if actor is not self]
-        if all(other.position == position.FAR for other in others):
+        # if every living actor is FAR, engaging makes every actor NEAR
+        others = [actor for actor in scene.actors if actor is not self and actor.status != DEAD]
+        if all(other.position == FAR for other in others):
             for other in others:
-                other.position = position.NEAR
+                other.position = NEAR
     
 class Scene:
-    def __init__(self, player: PlayerCharacter, sidekick: Sidekick, enemy: Enemy):
+    # max_rounds and max_turns, when set, end the combat as a stalemate once that many have been
+    # played. Only a PC without a policy asks for input; the front end does any other prompting.
+    def __init__(self, player: PlayerCharacter, sidekick: Sidekick, enemy: Enemy, max_rounds=None, max_turns=None):
         self.player_character = player
         self.sidekick = sidekick
         self.enemy = enemy
+        self.max_rounds = max_rounds
+        self.max_turns = max_turns
+        self.turns = 0
+        self.rounds = 0
+        self.counter = 0
 
         self.actors = [self.player_character, self.sidekick, self.enemy]
         # highest initiative gets to act first
         self.actors.sort(key=Actor.get_initiative, reverse=True)
 
+    def reset(self):
+        # Restores a finished scene in place for another combat. Actors are reset in the order a
+        # new scene would build them, so HP and initiative come from the same dice draws; the
+        # sidekick keeps its knowledge level and engine.
+        for actor in (self.player_character, self.sidekick, self.enemy):
+            actor.reset()
+        self.turns = 0
+        self.rounds = 0
+        self.counter = 0
+        self.actors[:] = (self.player_character, self.sidekick, self.enemy)
+        self.actors.sort(key=Actor.get_initiative, reverse=True)
+
+    def roles(self):
+        return (self.player_character, self.sidekick, self.enemy)
+
+    def snapshot(self, include_rng=True):
+        roles = self.roles()
+        index = {actor.entity: i for i, actor in enumerate(roles)}
+        return scene_snapshot(
+            tuple(actor.entity.state(index) for actor in roles),
+            tuple(actor.state() for actor in roles),
+            tuple(roles.index(actor) for actor in self.actors),
+            self.turns, self.rounds, self.counter,
+            random.getstate() if include_rng else None,
+            dice.generator.getstate() if include_rng else None)
+
+    def restore(self, snapshot: 'scene_snapshot', restore_rng=True):
+        # rollouts from one snapshot usually want fresh dice, so pass restore_rng=False for those
+        roles = self.roles()
+        role_entities = tuple(actor.entity for actor in roles)
+        for actor, entity_state, actor_state in zip(roles, snapshot.entities, snapshot.actors):
+            actor.entity.restore(entity_state, role_entities)
+            actor.restore(actor_state)
+        self.actors[:] = [roles[i] for i in snapshot.order]
+        self.turns, self.rounds, self.counter = snapshot.turns, snapshot.rounds, snapshot.counter
+        if restore_rng and snapshot.random_state != None:
+            random.setstate(snapshot.random_state)
+            dice.generator.setstate(snapshot.dice_state)
+
+    def fork(self):
+        # An independent copy of the scene at this point. Stats, dice, the sidekick's engine and
+        # the PC's policy are shared; everything that changes during combat is copied.
+        twin = object.__new__(Scene)
+        twin.player_character = self.player_character.clone(self.player_character.entity.clone())
+        twin.sidekick = self.sidekick.clone(self.sidekick.entity.clone())
+        twin.enemy = self.enemy.clone(self.enemy.entity.clone())
+        twin.max_rounds = self.max_rounds
+        twin.max_turns = self.max_turns
+        twin.actors = [None]*len(self.actors)
+        twin.restore(self.snapshot(include_rng=False))
+        return twin
+
     def display_initiative(self):
         print("\nThe turn order is as follows:")
         for actor in self.actors:
@@ -235,46 +364,191 @@ class Scene:
     def resolve_turn(self):
         for actor in self.actors:
             if actor.entity.unconcious:
-                actor.status = status.UNCONCIOUS
+                actor.status = UNCONCIOUS
                 actor.downed = True
             elif actor.entity.dead:
-                actor.status = status.DEAD
+                actor.status = DEAD
                 actor.killed = True
             else:
-                actor.status = status.GOOD
+                actor.status = GOOD
+
+    def display_state(self):
         print("\nCurrent state:")
         for actor in self.actors:
             print(repr(actor))
         input("\nPress enter to begin the next turn")
 
-    def resolve_smartness(self):
+    def resolve_smartness(self, t_norm=None, s_norm=None, membership_set=None):
         if self.sidekick.knowledge_level == knowledge.LOW:
-            fuzzy.player_knowledge = "unknown"
-            fuzzy.enemy_knowledge = "unknown"
+            player_knowledge = "unknown"
+            enemy_knowledge = "unknown"
         elif self.sidekick.knowledge_level == knowledge.PLAYER_ONLY:
-            fuzzy.player_knowledge = self.player_character.get_hit_die()
-            fuzzy.enemy_knowledge = "unknown"
+            player_knowledge = self.player_character.get_hit_die()
+            enemy_knowledge = "unknown"
         elif self.sidekick.knowledge_level == knowledge.ENEMY_ONLY:
-            fuzzy.player_knowledge = "unknown"
-            fuzzy.enemy_knowledge = self.enemy.get_cr()
+            player_knowledge = "unknown"
+            enemy_knowledge = self.enemy.get_cr()
         else:
-            fuzzy.player_knowledge = self.player_character.get_hit_die()
-            fuzzy.enemy_knowledge = self.enemy.get_cr()
+            player_knowledge = self.player_character.get_hit_die()
+            enemy_knowledge = self.enemy.get_cr()
+        self.sidekick.engine = fuzzy.FuzzyEngine(player_knowledge, enemy_knowledge, t_norm, s_norm, membership_set)
+
+    def is_over(self):
+        # There is no stalled state to detect short of that: a monster is never downed, and it keeps
+        # attacking downed opponents, which breaks a stable death save, so only the round and turn
+        # budgets end a fight that neither side has won.
+        if self.player_character.status == DEAD or self.enemy.status == DEAD:
+            return True
+        return self.out_of_budget()
+
+    def out_of_budget(self):
+        # the round budget is only checked between rounds, so every actor gets the same number of turns
+        if self.max_turns != None and self.turns >= self.max_turns:
+            return True
+        return self.max_rounds != None and self.counter == 0 and self.rounds >= self.max_rounds
+
+    def step(self):
+        # plays the next actor's turn and returns the action taken, as Actor.take_turn does
+        if self.counter == 0:
+            self.rounds += 1
+        action = self.actors[self.counter].take_turn(self)
+        self.end_turn()
+        return action
+
+    def end_turn(self):
+        self.resolve_turn()
+        self.turns += 1
+        self.counter = (self.counter+1)%len(self.actors)
 
     def run(self):
-
-        counter = 0
-        while not self.player_character.status == status.DEAD and not self.enemy.status == status.DEAD:
-            self.actors[counter].take_turn(self)
-            self.resolve_turn()
-            counter = (counter+1)%len(self.actors)
+        # is_over and step, unrolled: headless batches spend most of their time in this loop
+        actors = self.actors
+        player, enemy = self.player_character, self.enemy
+        while player.status != DEAD and enemy.status != DEAD and not self.out_of_budget():
+            if self.counter == 0:
+                self.rounds += 1
+            actors[self.counter].take_turn(self)
+            self.end_turn()
+
+    def stream(self, capture_events=True):
+        # Plays the combat lazily, yielding a turn_record after each actor's turn. Events are only
+        # captured while a turn is being played (and still reach the current sink), so consumers
+        # can run other scenes between turns, and stopping early just leaves this one mid-combat.
+        roles = self.roles()
+        recorder = events.tee_sink(events.sink) if capture_events else None
+        while not self.is_over():
+            turn = self.turns
+            actor = self.actors[self.counter]
+            hp_before = tuple(role.entity.current_hp for role in roles)
+            status_before = tuple(role.status for role in roles)
+            if recorder != None:
+                recorder.forward = events.sink
+                previous_sink = events.set_sink(recorder)
+                try:
+                    action = self.step()
+                finally:
+                    events.set_sink(previous_sink)
+                turn_events = tuple(recorder.events)
+                recorder.clear()
+            else:
+                action = self.step()
+                turn_events = ()
+            hp_changes = tuple((role_names[i], before, role.entity.current_hp)
+                               for i, (role, before) in enumerate(zip(roles, hp_before))
+                               if role.entity.current_hp != before)
+            status_changes = tuple((role_names[i], before, role.status)
+                                   for i, (role, before) in enumerate(zip(roles, status_before))
+                                   if role.status != before)
+            yield turn_record(turn, self.rounds, role_names[roles.index(actor)], actor, action, turn_events,
+                              hp_changes, status_changes)
+
+    def result(self):
+        if self.enemy.status == DEAD:
+            winner = outcome.PARTY_VICTORY
+        elif self.player_character.status == DEAD:
+            winner = outcome.MONSTER_VICTORY
+        else:
+            winner = outcome.STALEMATE
+        return combat_result(winner, self.rounds, self.turns, {
+            "player": self.player_character,
+            "sidekick": self.sidekick,
+            "enemy": self.enemy
+        })
 
     def display_results(self):
-        print("\nThe battle draws to a close...")
+        if self.result().winner == outcome.STALEMATE:
+            print("\nNeither side can gain the upper hand, and the battle grinds to a halt...")
+        else:
+            print("\nThe battle draws to a close...")
         print("%-20s %10s %12s %10s %10s" %("Actor", "Status", "Damage Dealt", "Downed?", "Killed?"))
         for actor in self.actors:
             print("%-20s %10s %12s %10s %10s" %(actor, actor.status.name, actor.damage_dealt, actor.downed, actor.killed))
 
+# names for the roles, in the order Scene.roles returns them
+role_names = ("player", "sidekick", "enemy")
+
+class turn_record:
+    # One actor's turn, as Scene.stream yields it. events are (kind, actor, target, value) tuples
+    # as emitted, which carry the rolls and any fuzzy decision; hp_changes and status_changes are
+    # (role, before, after) for each role that changed during the turn.
+    __slots__ = ("turn", "round", "role", "actor", "action", "events", "hp_changes", "status_changes")
+
+    def __init__(self, turn, round, role, actor: Actor, action, events, hp_changes, status_changes):
+        self.turn = turn
+        self.round = round
+        self.role = role
+        self.actor = actor
+        self.action = action
+        self.events = events
+        self.hp_changes = hp_changes
+        self.status_changes = status_changes
+
+    def rule_strengths(self):
+        # the sidekick's (action, strength) pairs for this turn, if it made a decision
+        for kind, _, _, value in self.events:
+            if kind == events.combat_event.DECISION:
+                return value[1]
+        return None
+
+    def __repr__(self):
+        return "<turn %d (round %d) %s: %s | hp %s>" %(self.turn, self.round, self.role,
+                                                      getattr(self.action, "name", self.action), self.hp_changes)
+
+class scene_snapshot:
+    # Everything about a scene that changes during combat, in flat tuples ordered player, sidekick,
+    # enemy. Links between entities are stored as those positions, so a snapshot can be restored
+    # into any scene built from the same matchup, including forks.
+    __slots__ = ("entities", "actors", "order", "turns", "rounds", "counter", "random_state", "dice_state")
+
+    def __init__(self, entities, actors, order, turns, rounds, counter, random_state=None, dice_state=None):
+        self.entities = entities
+        self.actors = actors
+        self.order = order
+        self.turns = turns
+        self.rounds = rounds
+        self.counter = counter
+        self.random_state = random_state
+        self.dice_state = dice_state
+
+class combat_result:
+    def __init__(self, winner: outcome, rounds, turns, actors):
+        self.winner = winner
+        self.rounds = rounds
+        self.turns = turns
+        # per-role summaries, keyed by "player", "sidekick" and "enemy"
+        self.status = {}
+        self.damage_dealt = {}
+        self.downed = {}
+        self.killed = {}
+        for role, actor in actors.items():
+            self.status[role] = actor.status
+            self.damage_dealt[role] = actor.damage_dealt
+            self.downed[role] = actor.downed
+            self.killed[role] = actor.killed
+
+    def __repr__(self):
+        return "<%s after %d rounds | damage: %s>" %(self.winner.name, self.rounds, self.damage_dealt)
+
 def display_help():
     print("All of the possible actions are:")
     print("%-12s - attack the enemy monster. Can only be done if the monster is NEAR." %"attack")
@@ -287,39 +561,39 @@ def display_help():
     print("%-12s - stop the simulation." %"exit")
 
 def __gen_random_player():
-    player_class= random.choice(list(entities.players.keys()))
+    player_class = entities.get_catalog().sample_player().name
     return PlayerCharacter(entities.Player(player_class))
 
 def __gen_player_by_class(player_class):
     return PlayerCharacter(entities.Player(player_class))
 
 def __gen_enemy_by_cr(cr):
-    mon_type, mon_info = random.choice(list(entities.monsters[cr].items()))
-    return Enemy(entities.Monster(mon_type, mon_info))
+    monster = entities.get_catalog().sample(cr)
+    return Enemy(entities.Monster(monster.name, monster))
 
 def __gen_random_enemy():
-    mon_type, mon_info = random.choice(list(entities.monsters[random.choice(list(entities.monsters.keys()))].items()))
-    return Enemy(entities.Monster(mon_type, mon_info))
+    monster = entities.get_catalog().sample_by_cr()
+    return Enemy(entities.Monster(monster.name, monster))
 
 def __gen_enemy_by_type(monster_type):
-    for cr in entities.monsters:
-        if monster_type in entities.monsters[cr]:
-            return Enemy(entities.Monster(monster_type,entities.monsters[cr][monster_type]))
-    return None
+    monster = entities.get_catalog().monsters.get(monster_type)
+    if monster == None:
+        return None
+    return Enemy(entities.Monster(monster_type, monster))
 
 def __gen_sidekick_by_cr(cr):
-    mon_type, mon_info = random.choice(list(entities.monsters[cr].items()))
-    return Sidekick(entities.Sidekick(mon_type, mon_info))
+    sidekick = entities.get_catalog().sample(cr)
+    return Sidekick(entities.Sidekick(sidekick.name, sidekick))
 
 def __gen_random_sidekick():
-    sk_type, sk_info = random.choice(list(entities.monsters[random.choice(list(entities.monsters.keys()))].items()))
-    return Sidekick(entities.Sidekick(sk_type, sk_info))
+    sidekick = entities.get_catalog().sample_by_cr()
+    return Sidekick(entities.Sidekick(sidekick.name, sidekick))
 
 def __gen_sidekick_by_type(monster_type):
-    for cr in entities.monsters:
-        if monster_type in entities.monsters[cr]:
-            return Sidekick(entities.Sidekick(monster_type, entities.monsters[cr][monster_type]))
-    return None
+    sidekick = entities.get_catalog().monsters.get(monster_type)
+    if sidekick == None:
+        return None
+    return Sidekick(entities.Sidekick(monster_type, sidekick))
 
 def prompt_knowledge():
     print("How knowledgeable should the sidekick be?")
@@ -332,7 +606,15 @@ def prompt_knowledge():
         knowledge = 0
     return knowledge
     
-def make_scene(player: PlayerCharacter = __gen_random_player(), sidekick = __gen_random_sidekick(), enemy = __gen_random_enemy()):
+def make_scene(player: PlayerCharacter = None, sidekick = None, enemy = None):
+    # anyone not given is generated at random for this scene
+    if player == None:
+        player = __gen_random_player()
+    if sidekick == None:
+        sidekick = __gen_random_sidekick()
+    if enemy == None:
+        enemy = __gen_random_enemy()
+
     if type(sidekick) == str:
         sidekick = __gen_sidekick_by_cr(sidekick)
 
@@ -347,7 +629,9 @@ def make_scene(player: PlayerCharacter = __gen_random_player(), sidekick = __gen
 def run_scene(scene: Scene):
     scene.resolve_smartness()
     scene.display_initiative()
-    scene.run()
+    # the interactive front end is one consumer of the turn stream; events narrate through the console sink
+    for _ in scene.stream(capture_events=False):
+        scene.display_state()
     scene.display_results()
 
 def main(cmdline_args):
@@ -358,9 +642,9 @@ def main(cmdline_args):
     monster_type = None
 
     try:
-        options, args = getopt.getopt(cmdline_args,"p:s:S:m:M:v",["help","verbose"])
+        options, args = getopt.getopt(cmdline_args,"p:s:S:m:M:vc",["help","verbose","compiled"])
     except getopt.GetoptError:
-        print('''Usage: scene.py [-p <player class>][-S <sidekick CR>][-s <sidekick type][-M <monster CR>][-m <monster type>][-v/--verbose]\n
+        print('''Usage: scene.py [-p <player class>][-S <sidekick CR>][-s <sidekick type][-M <monster CR>][-m <monster type>][-v/--verbose][-c/--compiled]\n
     By default: all actors are chosen at random. Note that actor type takes precendence over actor CR.''')
         sys.exit()
     for opt, arg in options:
@@ -381,6 +665,10 @@ def main(cmdline_args):
         elif opt in ("-v","--verbose"):
             global verbose
             verbose = True
+            events.console.verbose = True
+        elif opt in ("-c","--compiled"):
+            # answer sidekick decisions from precompiled fuzzy decision tables
+            fuzzy.compiled_tables = True
 
     if player_class != None:
         player_class = __gen_player_by_class(player_class)
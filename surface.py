@@ -0,0 +1,156 @@
+import getopt
+import json
+import os
+import sys
+import numpy as np
+import fuzzy
+import fuzzy_batch
+
+# The whole fuzzy decision surface on disk, for analysis outside the simulator. For every player
+# knowledge context and enemy knowledge context in fuzzy.membership_fxns, every norm pair and
+# every integer frame inside fuzzy.table_bounds, actions.npy holds the suggested action (values
+# of fuzzy.action) and strengths.npy the four rule strengths in fuzzy.action order. Both are plain
+# .npy files, so np.load(..., mmap_mode="r") maps them without reading them in; surface.json
+# says what each axis is indexed by. The arrays are computed with fuzzy_batch, which matches
+# fuzzy.suggest_action exactly.
+
+header_name = "surface.json"
+format_version = 1
+axes = ("player_knowledge", "enemy_knowledge", "norms", "player_health", "sidekick_health", "damage_dealt")
+arrays = {
+    "actions": np.int8,
+    "strengths": np.float64
+}
+
+def contexts(membership_set=None):
+    # (player contexts, enemy contexts); an enemy context needs both sidekick health and damage dealt
+    if membership_set == None:
+        membership_set = fuzzy.membership_fxns
+    enemy = [context for context in membership_set["sidekick_health"] if context in membership_set["damage_dealt"]]
+    return list(membership_set["player_health"]), enemy
+
+def export(directory, norm_names=None):
+    # writes the surface into directory and returns the header; the header goes last, so a
+    # directory with one always holds complete arrays
+    if norm_names == None:
+        norm_names = list(fuzzy.norm_pairs)
+    for name in norm_names:
+        if name not in fuzzy.norm_pairs:
+            raise ValueError("unknown norm pair: %s" %name)
+    player_contexts, enemy_contexts = contexts()
+    shape = (len(player_contexts), len(enemy_contexts), len(norm_names)) + fuzzy.table_bounds
+    grid = np.indices(fuzzy.table_bounds).reshape(3, -1)
+
+    os.makedirs(directory, exist_ok=True)
+    partial = {name: os.path.join(directory, "%s.npy.%d.tmp" %(name, os.getpid())) for name in arrays}
+    actions = np.lib.format.open_memmap(partial["actions"], mode="w+", dtype=arrays["actions"], shape=shape)
+    strengths = np.lib.format.open_memmap(partial["strengths"], mode="w+", dtype=arrays["strengths"],
+                                          shape=shape + (len(fuzzy.action),))
+    for p, player_knowledge in enumerate(player_contexts):
+        for e, enemy_knowledge in enumerate(enemy_contexts):
+            for n, name in enumerate(norm_names):
+                t_norm, s_norm = fuzzy.norm_pairs[name]
+                suggested, rule_strengths = fuzzy_batch.suggest_actions(grid[0], grid[1], grid[2], player_knowledge,
+                                                                        enemy_knowledge, t_norm, s_norm)
+                actions[p, e, n] = suggested.reshape(fuzzy.table_bounds)
+                strengths[p, e, n] = rule_strengths.reshape(fuzzy.table_bounds + (len(fuzzy.action),))
+    for array in (actions, strengths):
+        array.flush()
+    del actions, strengths
+    for name in arrays:
+        os.replace(partial[name], os.path.join(directory, name + ".npy"))
+
+    header = {
+        "format": format_version,
+        "membership_hash": fuzzy.membership_hash(),
+        "axes": list(axes),
+        "player_knowledge": player_contexts,
+        "enemy_knowledge": enemy_contexts,
+        "norms": list(norm_names),
+        "bounds": list(fuzzy.table_bounds),
+        "actions": [member.name for member in fuzzy.action],
+        "arrays": {name: {"file": name + ".npy", "dtype": np.dtype(dtype).str,
+                          "shape": list(shape) + ([len(fuzzy.action)] if name == "strengths" else [])}
+                   for name, dtype in arrays.items()}
+    }
+    path = os.path.join(directory, header_name)
+    partial_header = path + ".tmp"
+    with open(partial_header, "w") as file:
+        json.dump(header, file, indent=1)
+    os.replace(partial_header, path)
+    return header
+
+class decision_surface:
+    # an exported surface, mapped read-only; slicing actions and strengths reads only what it touches
+    def __init__(self, directory):
+        with open(os.path.join(directory, header_name)) as file:
+            self.header = json.load(file)
+        if self.header.get("format") != format_version:
+            raise ValueError("%s holds a surface in format %s, expected %d" %(directory, self.header.get("format"),
+                                                                             format_version))
+        for name in arrays:
+            description = self.header["arrays"][name]
+            array = np.load(os.path.join(directory, description["file"]), mmap_mode="r")
+            if list(array.shape) != description["shape"] or array.dtype.str != description["dtype"]:
+                raise ValueError("%s does not match %s" %(description["file"], header_name))
+            setattr(self, name, array)
+        self.player_contexts = self.header["player_knowledge"]
+        self.enemy_contexts = self.header["enemy_knowledge"]
+        self.norms = self.header["norms"]
+
+    def index(self, player_knowledge, enemy_knowledge, norms):
+        try:
+            return (self.player_contexts.index(player_knowledge), self.enemy_contexts.index(enemy_knowledge),
+                    self.norms.index(norms))
+        except ValueError:
+            raise KeyError("no surface for %s, %s, %s" %(player_knowledge, enemy_knowledge, norms)) from None
+
+    def view(self, player_knowledge, enemy_knowledge, norms):
+        # (actions, strengths) views over every frame of one context and norm pair
+        p, e, n = self.index(player_knowledge, enemy_knowledge, norms)
+        return self.actions[p, e, n], self.strengths[p, e, n]
+
+    def lookup(self, frame, player_knowledge, enemy_knowledge, norms):
+        # the decision for one frame, shaped like fuzzy.suggest_action's
+        actions, strengths = self.view(player_knowledge, enemy_knowledge, norms)
+        cell = (frame["player_health"], frame["sidekick_health"], frame["damage_dealt"])
+        return fuzzy.action(int(actions[cell])), tuple(zip(fuzzy.action, strengths[cell].tolist()))
+
+    def stale(self):
+        # whether membership_fxns has changed since the export
+        return self.header["membership_hash"] != fuzzy.membership_hash()
+
+def load(directory):
+    return decision_surface(directory)
+
+def main(cmdline_args):
+    usage = '''Usage: surface.py -o <surface directory> [--norms <comma separated norm pairs>]
+Writes actions.npy, strengths.npy and surface.json for every knowledge context in fuzzy.membership_fxns.'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "o:h", ["norms=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"o": None, "norms": None}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        settings[opt.lstrip("-")] = arg
+
+    if settings["o"] == None:
+        print(usage)
+        sys.exit(2)
+    norm_names = settings["norms"].split(",") if settings["norms"] != None else None
+    try:
+        header = export(settings["o"], norm_names)
+    except ValueError as error:
+        print(error)
+        sys.exit(2)
+    points = np.prod(header["arrays"]["actions"]["shape"])
+    print("%d decisions over %d contexts and %d norm pairs written to %s" %(
+        points, len(header["player_knowledge"])*len(header["enemy_knowledge"]), len(header["norms"]), settings["o"]))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,264 @@
+import getopt
+import glob
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import entities
+import fuzzy
+import montecarlo
+import scene
+
+# Exhaustive matchup sweep: every player class x sidekick type x monster type x knowledge level x
+# norm pair, with the same number of combats in each cell. A cell is seeded from (master seed, cell
+# index) as one montecarlo shard, so its totals do not depend on which run or worker produced it.
+#
+# Results go to a columnar store: a directory holding a JSON manifest, which describes the grid, and
+# numbered chunk files. Each chunk is an .npz of equal-length columns with one row per finished cell.
+# A chunk is written under a temporary name and renamed into place, so a crash loses at most the
+# cells not yet flushed. On restart, the cells already in a chunk are skipped.
+
+axes = ("player_class", "sidekick_type", "monster_type", "knowledge_level", "norms")
+manifest_name = "manifest.json"
+chunk_pattern = "chunk-%06d.npz"
+default_combats = 100
+flush_cells = 512
+flush_interval = 30
+
+class sweep_grid:
+    # every axis defaults to everything the catalog, scene.knowledge or fuzzy.norm_pairs offers
+    def __init__(self, player_classes=None, sidekick_types=None, monster_types=None, knowledge_levels=None, norms=None):
+        roster = entities.get_catalog()
+        if knowledge_levels == None:
+            knowledge_levels = list(scene.knowledge)
+        self.values = {
+            "player_class": tuple(player_classes or (block.name for block in roster.classes)),
+            "sidekick_type": tuple(sidekick_types or (block.name for block in roster.roster)),
+            "monster_type": tuple(monster_types or (block.name for block in roster.roster)),
+            # stored as plain ints so the manifest stays JSON
+            "knowledge_level": tuple(scene.knowledge(level).value for level in knowledge_levels),
+            "norms": tuple(norms or fuzzy.norm_pairs)
+        }
+        known = {
+            "player_class": roster.players,
+            "sidekick_type": roster.monsters,
+            "monster_type": roster.monsters,
+            "norms": fuzzy.norm_pairs
+        }
+        for axis, names in known.items():
+            unknown = [name for name in self.values[axis] if name not in names]
+            if unknown:
+                raise ValueError("unknown %s: %s" %(axis, ", ".join(unknown)))
+        self.shape = tuple(len(self.values[axis]) for axis in axes)
+        self.size = math.prod(self.shape)
+
+    def cell(self, index):
+        # axis values of a flat cell index, last axis fastest
+        return tuple(self.values[axis][position] for axis, position in zip(axes, np.unravel_index(index, self.shape)))
+
+    def config(self, index, policy="attack", compiled_tables=False):
+        player_class, sidekick_type, monster_type, knowledge_level, norms = self.cell(index)
+        return montecarlo.combat_config(player_class, sidekick_type, monster_type, knowledge_level, policy,
+                                        compiled_tables, norms=norms)
+
+    def to_json(self):
+        return {axis: list(self.values[axis]) for axis in axes}
+
+def grid_from_json(data):
+    return sweep_grid(*(data[axis] for axis in axes))
+
+def count_columns():
+    names = ["combats", "party_wins", "stalemates", "total_rounds"]
+    for column in ("damage", "downed", "killed"):
+        names.extend("%s_%s" %(column, role) for role in montecarlo.roles)
+    return names
+
+def to_columns(grid: sweep_grid, rows):
+    # rows are (cell index, montecarlo.combat_stats) pairs
+    cells = np.array([cell for cell, _ in rows], dtype=np.int64)
+    columns = {"cell": cells}
+    for axis, positions in zip(axes, np.unravel_index(cells, grid.shape)):
+        columns[axis] = positions.astype(np.int16)
+    counts = {name: [] for name in count_columns()}
+    for _, stats in rows:
+        counts["combats"].append(stats.combats)
+        counts["party_wins"].append(stats.party_wins)
+        counts["stalemates"].append(stats.stalemates)
+        counts["total_rounds"].append(stats.total_rounds)
+        for role in montecarlo.roles:
+            counts["damage_" + role].append(stats.total_damage[role])
+            counts["downed_" + role].append(stats.downed[role])
+            counts["killed_" + role].append(stats.killed[role])
+    for name, values in counts.items():
+        columns[name] = np.array(values, dtype=np.int64)
+    return columns
+
+class sweep_store:
+    # settings left as None are taken from an existing store, then from the defaults; settings that
+    # are given must match an existing store's, since its finished cells were run with them
+    def __init__(self, path, grid=None, combats=None, seed=None, policy=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, manifest_name)
+        requested = {
+            "grid": grid.to_json() if grid != None else None,
+            "combats": combats,
+            "seed": str(seed) if seed != None else None,
+            "policy": policy
+        }
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                self.manifest = json.load(file)
+            for key, value in requested.items():
+                if value != None and value != self.manifest[key]:
+                    raise ValueError("%s was started with a different %s; sweep into a new directory" %(path, key))
+        else:
+            self.manifest = {
+                "axes": list(axes),
+                "grid": requested["grid"] or sweep_grid().to_json(),
+                "combats": combats or default_combats,
+                "seed": requested["seed"] or str(int.from_bytes(os.urandom(8), "little")),
+                "policy": policy or "attack",
+                "columns": ["cell"] + list(axes) + count_columns()
+            }
+            self.write_atomic(manifest_path, lambda file: file.write(json.dumps(self.manifest, indent=2).encode()))
+        self.grid = grid_from_json(self.manifest["grid"])
+
+        # leftovers of a write cut short by a crash
+        for partial in glob.glob(os.path.join(path, "*.tmp")):
+            os.remove(partial)
+        self.next_chunk = len(self.chunks())
+
+    def write_atomic(self, target, write):
+        partial = target + ".tmp"
+        with open(partial, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial, target)
+
+    def chunks(self):
+        return sorted(glob.glob(os.path.join(self.path, "chunk-*.npz")))
+
+    def completed(self):
+        done = set()
+        for chunk in self.chunks():
+            with np.load(chunk) as data:
+                done.update(data["cell"].tolist())
+        return done
+
+    def append(self, rows):
+        if not rows:
+            return
+        columns = to_columns(self.grid, rows)
+        target = os.path.join(self.path, chunk_pattern %self.next_chunk)
+        self.write_atomic(target, lambda file: np.savez(file, **columns))
+        self.next_chunk += 1
+
+    def load(self, columns=None):
+        # the named columns (all by default) across every chunk, one row per cell in cell order
+        names = columns or self.manifest["columns"]
+        parts = {name: [] for name in names}
+        cells = []
+        for chunk in self.chunks():
+            with np.load(chunk) as data:
+                cells.append(data["cell"])
+                for name in names:
+                    parts[name].append(data[name])
+        if not cells:
+            return {name: np.zeros(0, dtype=np.int64) for name in names}
+        order = np.argsort(np.concatenate(cells), kind="stable")
+        return {name: np.concatenate(values)[order] for name, values in parts.items()}
+
+def run_cell(task):
+    return task[2], montecarlo.run_shard(task)
+
+def cell_tasks(store: sweep_store, compiled_tables=False):
+    done = store.completed()
+    manifest = store.manifest
+    for cell in range(store.grid.size):
+        if cell not in done:
+            yield store.grid.config(cell, manifest["policy"], compiled_tables), manifest["seed"], cell, manifest["combats"]
+
+def run(store: sweep_store, workers=None, compiled_tables=False, progress=None):
+    # runs every unfinished cell and returns how many were run; progress, if given, is called after
+    # each flush with the number of cells finished so far in this run
+    if workers == None:
+        workers = os.cpu_count()
+    tasks = cell_tasks(store, compiled_tables)
+    buffer = []
+    finished = 0
+    last_flush = time.monotonic()
+    pool = multiprocessing.Pool(workers) if workers != 1 else None
+    try:
+        results = pool.imap_unordered(run_cell, tasks, chunksize=4) if pool != None else map(run_cell, tasks)
+        for row in results:
+            buffer.append(row)
+            if len(buffer) >= flush_cells or time.monotonic() - last_flush >= flush_interval:
+                store.append(buffer)
+                finished += len(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+                if progress != None:
+                    progress(finished)
+    finally:
+        # keep whatever finished, including on an interrupt
+        store.append(buffer)
+        finished += len(buffer)
+        if pool != None:
+            pool.terminate()
+    return finished
+
+def main(cmdline_args):
+    usage = '''Usage: sweep.py -o <store directory> [-n <combats per cell>][-j <workers>][--seed <master seed>]
+    [--policy <attack|random|cautious>][--compiled][-p <classes>][-s <sidekick types>][-m <monster types>]
+    [-k <knowledge levels 0-3>][--norms <goguen|godel|lukasiewicz|drastic>]
+Lists are comma separated and default to everything. Rerunning on the same directory resumes the sweep.'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "o:n:j:p:s:m:k:h", ["seed=", "policy=", "compiled", "norms=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"o": None, "n": None, "j": None, "seed": None, "policy": None, "compiled": False}
+    lists = {}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt == "--compiled":
+            settings["compiled"] = True
+        elif opt in ("-p", "-s", "-m", "-k", "--norms"):
+            lists[opt.lstrip("-")] = arg.split(",")
+        else:
+            settings[opt.lstrip("-")] = arg
+
+    if settings["o"] == None:
+        print(usage)
+        sys.exit(2)
+
+    grid = None
+    try:
+        if lists:
+            knowledge_levels = [int(level) for level in lists["k"]] if "k" in lists else None
+            grid = sweep_grid(lists.get("p"), lists.get("s"), lists.get("m"), knowledge_levels, lists.get("norms"))
+        combats = int(settings["n"]) if settings["n"] != None else None
+        store = sweep_store(settings["o"], grid, combats, settings["seed"], settings["policy"])
+    except ValueError as error:
+        print(error)
+        sys.exit(2)
+
+    total = store.grid.size
+    remaining = total - len(store.completed())
+    print("%d cells, %d to run, %d combats each" %(total, remaining, store.manifest["combats"]))
+    workers = int(settings["j"]) if settings["j"] != None else None
+    start = time.monotonic()
+    finished = run(store, workers, settings["compiled"],
+                   lambda finished: print("%d/%d cells, %.0fs" %(finished, remaining, time.monotonic() - start)))
+    print("ran %d cells into %s" %(finished, settings["o"]))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,31 @@
+import copy
+import os
+import random
+import sys
+import pytest
+
+# the modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dice
+import fuzzy
+
+@pytest.fixture(autouse=True)
+def fuzzy_state(tmp_path, monkeypatch):
+    # every test starts from the shipped membership functions and module defaults, with decision
+    # tables written under tmp_path instead of the repository
+    membership_fxns = copy.deepcopy(fuzzy.membership_fxns)
+    for name in ("player_knowledge", "enemy_knowledge", "t_norm", "s_norm", "compiled_tables"):
+        monkeypatch.setattr(fuzzy, name, getattr(fuzzy, name))
+    monkeypatch.setattr(fuzzy, "table_dir", str(tmp_path / "fuzzy_tables"))
+    previous_cache = fuzzy.set_decision_cache(None)
+    fuzzy.clear_decision_tables()
+    yield
+    fuzzy.set_decision_cache(previous_cache)
+    fuzzy.membership_fxns = membership_fxns
+    fuzzy.current_membership_version()
+
+@pytest.fixture
+def seeded():
+    random.seed(7)
+    dice.seed(7)
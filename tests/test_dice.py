@@ -0,0 +1,85 @@
+import itertools
+import math
+import random
+import pytest
+import dice
+import markov
+
+# Rolled frequencies are checked against exact distributions worked out by enumerating every
+# face combination. The rolls are seeded, so each check is deterministic; the bound is four
+# standard errors per outcome.
+
+rolls = 100000
+
+def exact_pmf(spec: dice.roll_spec):
+    # a rerolled face is drawn again until it comes up otherwise, so each die is uniform over the rest
+    faces = [face for face in range(1, spec.sides + 1) if face != spec.reroll]
+    pmf = {}
+    for combination in itertools.product(faces, repeat=spec.number):
+        kept = sorted(combination)
+        if spec.keep_highest != None:
+            kept = kept[-spec.keep_highest:]
+        elif spec.keep_lowest != None:
+            kept = kept[:spec.keep_lowest]
+        total = sum(kept) + spec.modifier
+        pmf[total] = pmf.get(total, 0) + 1/len(faces)**spec.number
+    return pmf
+
+def assert_rolls_follow(spec, pmf, rng):
+    counts = {}
+    for _ in range(rolls):
+        value = spec.roll(rng)
+        counts[value] = counts.get(value, 0) + 1
+    assert set(counts) <= set(pmf), (spec, set(counts) - set(pmf))
+    for value, p in pmf.items():
+        bound = 4*math.sqrt(p*(1 - p)/rolls) + 1/rolls
+        assert abs(counts.get(value, 0)/rolls - p) <= bound, (spec, value, counts.get(value, 0)/rolls, p)
+
+@pytest.mark.parametrize("expression", ["1d20", "2d20h1", "2d20l1", "1d8+3", "2d6-1", "1dc8+2", "1d10R1", "3d4", "4d6h3"])
+def test_rolls_follow_exact_distribution(expression):
+    spec = dice.parse(expression)
+    assert_rolls_follow(spec, exact_pmf(spec), random.Random(expression))
+
+def test_advantage_specs():
+    assert dice.d20_advantage == dice.parse("2d20h1")
+    assert dice.d20_disadvantage == dice.parse("2d20l1")
+    advantage = exact_pmf(dice.d20_advantage)
+    assert advantage[20] == pytest.approx(39/400)
+    assert advantage[1] == pytest.approx(1/400)
+
+def test_parse():
+    assert dice.parse("1dc8+2") == dice.roll_spec(2, 8, 2)
+    assert dice.parse("d6") == dice.roll_spec(1, 6)
+    assert dice.parse("2d6", 3) == dice.parse("2d6+3")
+    assert dice.parse("1d12R1") == dice.roll_spec(1, 12, reroll=1)
+    assert repr(dice.parse("4d6h3-1")) == "4d6h3-1"
+    with pytest.raises(ValueError):
+        dice.parse("2x6")
+
+def test_critical_doubles_dice_not_modifier():
+    assert dice.parse("1d8+3").critical() == dice.parse("2d8+3")
+    assert dice.parse("2d6").critical().with_modifier(1) == dice.roll_spec(4, 6, 1)
+
+@pytest.mark.parametrize("expression", ["1d4", "1d8+3", "2d6-1", "1d4-3", "2d8+2"])
+def test_damage_pmf_is_exact(expression):
+    # markov's damage distribution clips negative totals to 0, as attacks do
+    spec = dice.parse(expression)
+    expected = {}
+    for total, p in exact_pmf(spec).items():
+        expected[max(total, 0)] = expected.get(max(total, 0), 0) + p
+    pmf = markov.damage_pmf(spec)
+    assert sorted(pmf) == sorted(expected)
+    for damage, p in expected.items():
+        assert pmf[damage] == pytest.approx(p, abs=1e-12)
+
+def test_streams_replay_rolls():
+    spec = dice.parse("2d6+1")
+    rolled = spec.roll_block(50, random.Random(3))
+    stream = dice.roll_stream(spec, block_size=7, rng=random.Random(3))
+    assert [stream.next() for _ in range(50)] == rolled
+
+def test_seed_replays_module_generator():
+    dice.seed(11)
+    first = [dice.roll("1d20") for _ in range(20)]
+    dice.seed(11)
+    assert [dice.roll("1d20") for _ in range(20)] == first
@@ -0,0 +1,155 @@
+import copy
+import pickle
+import random
+import numpy as np
+import pytest
+import fuzzy
+import fuzzy_batch
+import surface
+
+# rules_for over memberships_for is the reference every faster path has to reproduce exactly:
+# the same action, and rule strengths equal as floats, not merely close
+
+def sample_frames():
+    players, sidekicks, damages = fuzzy.table_bounds
+    frames = [{"player_health": p, "sidekick_health": s, "damage_dealt": d}
+              for p in range(-1, players + 2, 3) for s in range(-1, sidekicks + 2, 3) for d in range(-1, damages + 2, 4)]
+    rng = random.Random(1)
+    frames += [{"player_health": rng.uniform(-1, players), "sidekick_health": rng.uniform(-1, sidekicks),
+                "damage_dealt": rng.uniform(-1, damages)} for _ in range(200)]
+    return frames
+
+frames = sample_frames()
+
+def all_contexts():
+    player_contexts, enemy_contexts = surface.contexts()
+    return [(p, e) for p in player_contexts for e in enemy_contexts]
+
+def reference(frame, player_knowledge="unknown", enemy_knowledge="unknown", t_norm=None, s_norm=None):
+    t_norm = t_norm if t_norm != None else fuzzy.t_norm
+    s_norm = s_norm if s_norm != None else fuzzy.s_norm
+    suggested_action, rule_strengths = fuzzy.rules_for(fuzzy.memberships_for(frame, player_knowledge, enemy_knowledge),
+                                                       t_norm, s_norm)
+    return suggested_action, tuple(rule_strengths)
+
+def same_decision(decision, expected):
+    suggested_action, rule_strengths = decision
+    return suggested_action == expected[0] and tuple(rule_strengths) == expected[1]
+
+@pytest.mark.parametrize("norms", list(fuzzy.norm_pairs))
+@pytest.mark.parametrize("player_knowledge,enemy_knowledge", all_contexts())
+def test_compiled_inference_matches_rules(player_knowledge, enemy_knowledge, norms):
+    t_norm, s_norm = fuzzy.norm_pairs[norms]
+    engine = fuzzy.FuzzyEngine(player_knowledge, enemy_knowledge, t_norm, s_norm, compiled_tables=False)
+    for frame in frames:
+        expected = reference(frame, player_knowledge, enemy_knowledge, t_norm, s_norm)
+        assert same_decision(engine.suggest_action(frame), expected), frame
+
+@pytest.mark.parametrize("norms", list(fuzzy.norm_pairs))
+@pytest.mark.parametrize("player_knowledge,enemy_knowledge", all_contexts())
+def test_fuzzy_batch_matches_rules(player_knowledge, enemy_knowledge, norms):
+    t_norm, s_norm = fuzzy.norm_pairs[norms]
+    columns = [np.array([frame[stat] for frame in frames]) for stat in ("player_health", "sidekick_health", "damage_dealt")]
+    actions, strengths = fuzzy_batch.suggest_actions(*columns, player_knowledge, enemy_knowledge, t_norm, s_norm)
+    for i, frame in enumerate(frames):
+        suggested_action, rule_strengths = reference(frame, player_knowledge, enemy_knowledge, t_norm, s_norm)
+        assert actions[i] == suggested_action.value, frame
+        assert tuple(strengths[i].tolist()) == tuple(strength for _, strength in rule_strengths), frame
+
+def test_compiled_inference_handles_degenerate_triangles():
+    for points in [(0, 5, 5), (5, 5, 9), (3, 3, 3), (0.5, 2.25, 7.75)]:
+        triangle = fuzzy.triangle_coefficients(*points)
+        infer = fuzzy.compile_inference({"low": triangle}, {"low": triangle}, {"low": triangle, "high": triangle},
+                                        fuzzy.goguen_t, fuzzy.goguen_s)
+        for value in [x/4 for x in range(-4, 44)]:
+            strength = infer({"player_health": value, "sidekick_health": value, "damage_dealt": value})[1][3][1]
+            membership = fuzzy.triangle_membership(triangle, value)
+            assert strength == fuzzy.goguen_t(1 - membership, membership), (points, value)
+
+@pytest.mark.parametrize("player_knowledge,enemy_knowledge", [("unknown", "unknown"), (10, "1/4")])
+def test_decision_table_matches_rules(player_knowledge, enemy_knowledge):
+    engine = fuzzy.FuzzyEngine(player_knowledge, enemy_knowledge, compiled_tables=True)
+    assert engine.table != None
+    for frame in frames:
+        assert same_decision(engine.suggest_action(frame), reference(frame, player_knowledge, enemy_knowledge)), frame
+
+def test_decision_table_is_reloaded_from_disk():
+    built = fuzzy.get_decision_table("unknown", "unknown", fuzzy.t_norm, fuzzy.s_norm)
+    fuzzy.clear_decision_tables()
+    loaded = fuzzy.get_decision_table("unknown", "unknown", fuzzy.t_norm, fuzzy.s_norm)
+    assert loaded is not built
+    assert loaded.cells == built.cells
+
+def test_module_suggest_action_matches_rules():
+    # every norm pair through the compiled inferences, and one through a decision table
+    for compiled_tables, norm_names in ((False, list(fuzzy.norm_pairs)), (True, ["goguen"])):
+        fuzzy.compiled_tables = compiled_tables
+        for norms in norm_names:
+            fuzzy.t_norm, fuzzy.s_norm = fuzzy.norm_pairs[norms]
+            for frame in frames[::7]:
+                assert same_decision(fuzzy.suggest_action(frame), reference(frame)), (compiled_tables, norms, frame)
+
+edit_frame = {"player_health": 8, "sidekick_health": 20, "damage_dealt": 5}
+
+def edit_in_place():
+    fuzzy.membership_fxns["player_health"]["unknown"]["low"].d = 16
+
+def replace_function():
+    fuzzy.membership_fxns["player_health"]["unknown"]["low"] = fuzzy.trapezoid_coefficients(0, 0, 12, 16)
+
+def replace_context():
+    fuzzy.membership_fxns["player_health"]["unknown"] = {
+        "low": fuzzy.trapezoid_coefficients(0, 0, 12, 16),
+        "medium": fuzzy.triangle_coefficients(10, 16, 22),
+        "high": fuzzy.trapezoid_coefficients(18, 24, 28, 28)
+    }
+
+def assign_new_set():
+    membership_fxns = {stat: dict(contexts) for stat, contexts in fuzzy.membership_fxns.items()}
+    membership_fxns["player_health"]["unknown"] = dict(membership_fxns["player_health"]["unknown"],
+                                                       low=fuzzy.trapezoid_coefficients(0, 0, 12, 16))
+    fuzzy.membership_fxns = membership_fxns
+
+membership_edits = [edit_in_place, replace_function, replace_context, assign_new_set]
+
+@pytest.mark.parametrize("edit", membership_edits)
+def test_decision_cache_follows_membership_changes(edit):
+    cache = fuzzy.decision_cache(size=64)
+    fuzzy.set_decision_cache(cache)
+    before = fuzzy.suggest_action(edit_frame)
+    assert fuzzy.suggest_action(edit_frame) == before
+    assert cache.hits == 1
+
+    edit()
+    after = fuzzy.suggest_action(edit_frame)
+    assert same_decision(after, reference(edit_frame))
+    assert after != before
+    assert cache.invalidations == 1
+
+def test_decision_cache_matches_rules():
+    cache = fuzzy.decision_cache(size=100)
+    fuzzy.set_decision_cache(cache)
+    for norms in ("lukasiewicz", "goguen", "lukasiewicz"):
+        fuzzy.t_norm, fuzzy.s_norm = fuzzy.norm_pairs[norms]
+        # the last 50 frames come round again while they are still cached
+        for frame in frames[:300] + frames[250:300]:
+            assert same_decision(fuzzy.suggest_action(frame), reference(frame)), (norms, frame)
+    assert cache.hits > 0 and cache.evictions > 0
+
+# an edit inside membership_fxns and a new membership_fxns are the two ways tables go stale
+@pytest.mark.parametrize("edit", [edit_in_place, assign_new_set])
+def test_decision_tables_follow_membership_changes(edit):
+    fuzzy.compiled_tables = True
+    before = fuzzy.suggest_action(edit_frame)
+    edit()
+    after = fuzzy.suggest_action(edit_frame)
+    assert same_decision(after, reference(edit_frame))
+    assert after != before
+    engine = fuzzy.FuzzyEngine(compiled_tables=True)
+    assert same_decision(engine.suggest_action(edit_frame), reference(edit_frame))
+
+def test_copies_do_not_count_as_changes():
+    version = fuzzy.current_membership_version()
+    pickle.loads(pickle.dumps(fuzzy.membership_fxns))
+    copy.deepcopy(fuzzy.membership_fxns)
+    assert fuzzy.current_membership_version() == version
@@ -0,0 +1,46 @@
+import math
+import dice
+import markov
+import montecarlo
+import pytest
+import scene
+import vecsim
+
+# The chain's exact outcome probabilities have to agree with both simulators on a small matchup,
+# within five standard errors of the simulated rates. The random policy takes every command, and
+# knowing the monster's CR gives the sidekick a non-default membership context.
+
+config = montecarlo.combat_config("rogue", "kobold", "goblin", scene.knowledge.ENEMY_ONLY, "random")
+
+@pytest.fixture(scope="module")
+def exact():
+    return markov.combat_chain(config).solve()
+
+def assert_rate(simulated, combats, p, what):
+    bound = 5*math.sqrt(p*(1 - p)/combats) + 1/combats
+    assert abs(simulated - p) <= bound, (what, simulated, p)
+
+def assert_agrees(stats: montecarlo.combat_stats, exact: markov.chain_result):
+    n = stats.combats
+    assert stats.stalemate_rate() < 1e-3
+    assert_rate(stats.win_rate(), n, exact.party_victory, "party victory")
+    assert_rate(stats.kill_rate("sidekick"), n, exact.sidekick_killed, "sidekick killed")
+    assert_rate(stats.down_rate("player"), n, exact.player_downed, "player downed")
+    assert_rate(stats.down_rate("sidekick"), n, exact.sidekick_downed, "sidekick downed")
+    assert abs(stats.mean_rounds() - exact.expected_rounds) <= 5*stats.rounds.stderr(), "expected rounds"
+
+def test_chain_matches_scene_monte_carlo(exact):
+    assert_agrees(montecarlo.run(config, 20000, master_seed=1, workers=1), exact)
+
+def test_chain_matches_vecsim(exact):
+    assert_agrees(vecsim.run(config, 200000, seed=1), exact)
+
+def test_chain_does_not_draw_dice():
+    state = dice.generator.getstate()
+    markov.combat_chain(montecarlo.combat_config("fighter", "kobold", "goblin"))
+    assert dice.generator.getstate() == state
+
+def test_chain_probabilities_are_consistent(exact):
+    for p in (exact.party_victory, exact.player_killed, exact.sidekick_killed, exact.player_downed, exact.sidekick_downed):
+        assert 0 <= p <= 1
+    assert exact.expected_rounds >= 1
@@ -0,0 +1,86 @@
+import random
+import pytest
+import dice
+import events
+import scene
+import simulate
+
+# A restored snapshot, or a fork taken at it, replays the rest of the combat exactly when the
+# random state is put back too: the same events in the same order and the same result.
+
+matchups = [("fighter", "wolf", "orc", simulate.random_command), ("rogue", "kobold", "orc", simulate.cautious)]
+
+def play_out(combat: scene.Scene):
+    recorder = events.recorder_sink()
+    previous_sink = events.set_sink(recorder)
+    try:
+        combat.run()
+    finally:
+        events.set_sink(previous_sink)
+    return recorder.lines(), summary(combat)
+
+def summary(combat: scene.Scene):
+    result = combat.result()
+    return (result.winner, result.rounds, result.turns, result.status, result.damage_dealt, result.downed,
+            result.killed, tuple(actor.entity.current_hp for actor in combat.roles()))
+
+def midway(player_class, sidekick_type, monster_type, policy, seed, turns=1):
+    random.seed(seed)
+    dice.seed(seed)
+    combat = simulate.build_scene(player_class, sidekick_type, monster_type, scene.knowledge.HIGH, policy)
+    previous_sink = events.set_sink(events.null)
+    try:
+        for _ in range(turns):
+            combat.step()
+    finally:
+        events.set_sink(previous_sink)
+    # a combat already over would replay trivially
+    assert not combat.is_over()
+    return combat
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("player_class,sidekick_type,monster_type,policy", matchups)
+def test_restore_replays(player_class, sidekick_type, monster_type, policy, seed):
+    combat = midway(player_class, sidekick_type, monster_type, policy, seed)
+    snapshot = combat.snapshot()
+    first = play_out(combat)
+    combat.restore(snapshot)
+    assert play_out(combat) == first
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("player_class,sidekick_type,monster_type,policy", matchups)
+def test_fork_replays_and_is_independent(player_class, sidekick_type, monster_type, policy, seed):
+    combat = midway(player_class, sidekick_type, monster_type, policy, seed)
+    snapshot = combat.snapshot()
+    twin = combat.fork()
+    first = play_out(combat)
+
+    # the original has finished; the fork is still where it was taken
+    assert twin.snapshot(include_rng=False).entities == snapshot.entities
+    assert twin.turns == snapshot.turns and twin.rounds == snapshot.rounds
+    random.setstate(snapshot.random_state)
+    dice.generator.setstate(snapshot.dice_state)
+    assert play_out(twin) == first
+    assert summary(combat) == first[1]
+
+def test_restore_without_rng_keeps_dice_moving():
+    combat = midway("fighter", "wolf", "orc", simulate.always_attack, 3)
+    snapshot = combat.snapshot()
+    state = dice.generator.getstate()
+    combat.restore(snapshot, restore_rng=False)
+    assert dice.generator.getstate() == state
+    assert combat.snapshot(include_rng=False).entities == snapshot.entities
+
+def test_pooled_scene_matches_new_scene():
+    # a scene reset in place draws the same dice a newly built one would
+    pool = simulate.scene_pool()
+    random.seed(5)
+    dice.seed(5)
+    pooled = [summary_of(simulate.run_combat("fighter", "wolf", "orc", pool=pool)) for _ in range(20)]
+    random.seed(5)
+    dice.seed(5)
+    built = [summary_of(simulate.run_combat("fighter", "wolf", "orc")) for _ in range(20)]
+    assert pooled == built
+
+def summary_of(result: scene.combat_result):
+    return (result.winner, result.rounds, result.turns, result.status, result.damage_dealt)
@@ -0,0 +1,395 @@
+import getopt
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import entities
+import events
+import fuzzy
+import montecarlo
+import paired
+import scene
+
+# Genetic search over the coefficients of fuzzy.membership_fxns, one knowledge bucket at a time.
+# A bucket is the functions one piece of knowledge selects: "unknown" holds every stat's
+# functions for an unknown hit die and CR, a hit die holds the player_health functions for it,
+# and a CR holds the sidekick_health and damage_dealt functions for it. Each bucket is scored
+# at the knowledge level where it alone is in play (LOW, PLAYER_ONLY or ENEMY_ONLY) and only
+# on matchups that select it, with every other bucket left as it is.
+#
+# A candidate's fitness is the weighted rate of the goals fuzzy.apply_rules is written for, over
+# the same combats for every candidate: combat seeds are fixed for the whole run, and each combat
+# replays the same dice in every candidate as paired.py does. Since fitness is then a function
+# of the candidate alone, it is cached, and elites are never played twice. Combats are split into
+# shards that a process pool plays for all candidates at once.
+#
+# The search state is checkpointed after every generation, so an interrupted run resumes where
+# it stopped. The best set found is written out as Python source in fuzzy.py's layout.
+
+# weights of PC survives, PC not downed, PC lands the kill and sidekick survives, most important first
+goal_weights = (8, 4, 2, 1)
+shard_size = 250
+# genes are kept to this many decimals, so candidates that differ by less share a cache entry
+precision = 1
+
+class bucket:
+    def __init__(self, name, knowledge_level, entries, matchups):
+        self.name = name
+        self.knowledge_level = scene.knowledge(knowledge_level)
+        # the (stat, context) pairs of membership_fxns it holds
+        self.entries = entries
+        # (player class, sidekick type, monster type) triples that select it
+        self.matchups = matchups
+
+def buckets(player_classes=None, sidekick_types=None, monster_types=None):
+    # every bucket with at least one matchup among the given classes and types (all by default)
+    roster = entities.get_catalog()
+    player_classes = player_classes or [block.name for block in roster.classes]
+    sidekick_types = sidekick_types or [block.name for block in roster.roster]
+    monster_types = monster_types or [block.name for block in roster.roster]
+    hit_dice = {player_class: entities.Player(player_class).hit_die for player_class in player_classes}
+    ratings = {monster_type: roster.monster(monster_type).cr for monster_type in monster_types}
+
+    def matchups(keep_class=lambda player_class: True, keep_monster=lambda monster_type: True):
+        return [(player_class, sidekick_type, monster_type) for player_class in player_classes if keep_class(player_class)
+                for sidekick_type in sidekick_types for monster_type in monster_types if keep_monster(monster_type)]
+
+    found = [bucket("unknown", scene.knowledge.LOW,
+                    [("player_health", "unknown"), ("sidekick_health", "unknown"), ("damage_dealt", "unknown")],
+                    matchups())]
+    for hit_die in fuzzy.membership_fxns["player_health"]:
+        if hit_die != "unknown":
+            found.append(bucket("d%d" %hit_die, scene.knowledge.PLAYER_ONLY, [("player_health", hit_die)],
+                                matchups(keep_class=lambda player_class: hit_dice[player_class] == hit_die)))
+    for cr in fuzzy.membership_fxns["sidekick_health"]:
+        if cr != "unknown":
+            found.append(bucket("CR " + cr, scene.knowledge.ENEMY_ONLY, [("sidekick_health", cr), ("damage_dealt", cr)],
+                                matchups(keep_monster=lambda monster_type: ratings[monster_type] == cr)))
+    return {found_bucket.name: found_bucket for found_bucket in found if found_bucket.matchups}
+
+class genome_layout:
+    # Maps a bucket's coefficients to a flat list of genes and back. Coefficients at the edge of
+    # a function set's range (0, or the largest coefficient in it) are pinned, so the low and high
+    # shoulders keep covering the ends of the range. A candidate is repaired by clipping each
+    # gene to the range and sorting each function's coefficients back into order.
+    def __init__(self, membership_set, entries):
+        self.entries = entries
+        # per function: (stat, context, level, type, coefficient values, positions of genes)
+        self.functions = []
+        self.bounds = []
+        self.initial = []
+        for stat, context in entries:
+            levels = membership_set[stat][context]
+            upper = max(max(vars(coefficients).values()) for coefficients in levels.values())
+            for level, coefficients in levels.items():
+                values = list(vars(coefficients).values())
+                genes = []
+                for position, value in enumerate(values):
+                    if value != 0 and value != upper:
+                        genes.append(position)
+                        self.bounds.append(upper)
+                        self.initial.append(value)
+                self.functions.append((stat, context, level, type(coefficients), values, genes, upper))
+
+    def repair(self, genome):
+        repaired = []
+        start = 0
+        for _, _, _, _, values, genes, upper in self.functions:
+            values = list(values)
+            for offset, position in enumerate(genes):
+                values[position] = min(max(genome[start + offset], 0), upper)
+            values.sort()
+            repaired.extend(round(values[position], precision) for position in genes)
+            start += len(genes)
+        return repaired
+
+    def apply(self, genome, membership_set):
+        # a copy of membership_set with this bucket's functions taken from genome
+        applied = {stat: dict(contexts) for stat, contexts in membership_set.items()}
+        start = 0
+        for stat, context, level, kind, values, genes, _ in self.functions:
+            values = list(values)
+            for offset, position in enumerate(genes):
+                values[position] = genome[start + offset]
+            start += len(genes)
+            if applied[stat][context] is membership_set[stat][context]:
+                applied[stat][context] = dict(membership_set[stat][context])
+            applied[stat][context][level] = kind(*values)
+        return applied
+
+def combat_goals(combat: scene.Scene):
+    # (PC survives, PC not downed, PC lands the kill, sidekick survives) for a finished combat;
+    # the monster's last_struck_by is whoever landed the killing blow
+    result = combat.result()
+    victory = result.winner == scene.outcome.PARTY_VICTORY
+    return (victory, not result.downed["player"],
+            victory and combat.enemy.entity.last_struck_by is combat.player_character.entity,
+            not result.killed["sidekick"])
+
+# each worker keeps one scene per matchup, with its dice replayed as in paired.py
+scenes = {}
+
+def play_shard(task):
+    # goal totals for every candidate over one shard of combats
+    membership_sets, matchups, knowledge_level, master_seed, shard, n = task
+    seeds = random.Random(montecarlo.shard_seed(master_seed, shard))
+    totals = [[0]*len(goal_weights) for _ in membership_sets]
+    previous_sink = events.set_sink(events.null)
+    try:
+        for _ in range(n):
+            draws = paired.combat_draws(seeds.getrandbits(64))
+            player_class, sidekick_type, monster_type = matchups[draws.combat_seed % len(matchups)]
+            key = (player_class, sidekick_type, monster_type, knowledge_level)
+            combat = scenes.get(key)
+            if combat == None:
+                combat = scenes[key] = paired.build_variant(montecarlo.combat_config(player_class, sidekick_type,
+                                                                                     monster_type, knowledge_level))
+            for candidate, membership_set in enumerate(membership_sets):
+                combat.resolve_smartness(membership_set=membership_set)
+                paired.play(combat, draws)
+                for goal, reached in enumerate(combat_goals(combat)):
+                    totals[candidate][goal] += reached
+    finally:
+        events.set_sink(previous_sink)
+    return totals
+
+def fitness_of(totals, combats):
+    return sum(weight*total for weight, total in zip(goal_weights, totals))/(sum(goal_weights)*combats)
+
+class search_state:
+    # everything a run needs to resume, kept as JSON
+    def __init__(self, settings, data=None):
+        self.settings = settings
+        data = data or {}
+        # per bucket: {"generation", "population", "best", "fitness", "rng_state"}; each bucket has a
+        # generator of its own, so carrying a finished search further breeds what a longer run would
+        self.buckets = data.get("buckets", {})
+        # per bucket: {genome key: fitness}
+        self.cache = data.get("cache", {})
+
+    def to_json(self):
+        return {"settings": self.settings, "buckets": self.buckets, "cache": self.cache}
+
+def load_state(path, settings):
+    if path == None or not os.path.exists(path):
+        return search_state(settings)
+    with open(path) as file:
+        data = json.load(file)
+    for key, value in settings.items():
+        # generations may be raised to carry a finished search further
+        if key != "generations" and data["settings"].get(key) != value:
+            raise ValueError("%s was started with a different %s; checkpoint to a new file" %(path, key))
+    data["settings"] = settings
+    return search_state(settings, data)
+
+def save_state(path, state: search_state):
+    if path == None:
+        return
+    partial = path + ".tmp"
+    with open(partial, "w") as file:
+        json.dump(state.to_json(), file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(partial, path)
+
+class Tuner:
+    def __init__(self, combats=2000, population=16, generations=20, master_seed=None, workers=None, checkpoint=None,
+                 elite=2, tournament=3, mutation_rate=0.2, mutation_scale=0.1, player_classes=None, sidekick_types=None,
+                 monster_types=None, bucket_names=None, progress=None):
+        if master_seed == None:
+            master_seed = int.from_bytes(os.urandom(8), "little")
+        self.buckets = buckets(player_classes, sidekick_types, monster_types)
+        if bucket_names != None:
+            unknown = [name for name in bucket_names if name not in self.buckets]
+            if unknown:
+                raise ValueError("no matchups select bucket: %s" %", ".join(unknown))
+            self.buckets = {name: self.buckets[name] for name in bucket_names}
+        self.combats = combats
+        self.population = population
+        self.elite = elite
+        self.tournament = tournament
+        self.mutation_rate = mutation_rate
+        self.mutation_scale = mutation_scale
+        self.workers = workers if workers != None else os.cpu_count()
+        self.checkpoint = checkpoint
+        self.progress = progress
+        settings = {"seed": str(master_seed), "combats": combats, "population": population, "generations": generations,
+                    "weights": list(goal_weights), "buckets": list(self.buckets),
+                    "matchups": {name: len(found.matchups) for name, found in self.buckets.items()}}
+        self.state = load_state(checkpoint, settings)
+        self.rng = None
+        self.pool = None
+
+    @property
+    def master_seed(self):
+        return self.state.settings["seed"]
+
+    @property
+    def generations(self):
+        return self.state.settings["generations"]
+
+    def play(self, membership_sets, found: bucket, master_seed, combats):
+        # per candidate goal totals over the given combats
+        tasks = [(membership_sets, found.matchups, found.knowledge_level, master_seed, shard,
+                  min(shard_size, combats - start)) for shard, start in enumerate(range(0, combats, shard_size))]
+        totals = [[0]*len(goal_weights) for _ in membership_sets]
+        results = self.pool.imap(play_shard, tasks) if self.pool != None else map(play_shard, tasks)
+        for shard_totals in results:
+            for candidate, candidate_totals in enumerate(shard_totals):
+                for goal, total in enumerate(candidate_totals):
+                    totals[candidate][goal] += total
+        return totals
+
+    def score(self, genomes, found: bucket, layout: genome_layout):
+        # fitness of each genome, playing only the ones not yet cached
+        cache = self.state.cache.setdefault(found.name, {})
+        keys = [json.dumps(genome) for genome in genomes]
+        missing = sorted(set(key for key in keys if key not in cache), key=keys.index)
+        if missing:
+            membership_sets = [layout.apply(json.loads(key), fuzzy.membership_fxns) for key in missing]
+            for key, totals in zip(missing, self.play(membership_sets, found, self.master_seed, self.combats)):
+                cache[key] = fitness_of(totals, self.combats)
+        return [cache[key] for key in keys]
+
+    def pick(self, genomes, fitnesses):
+        contenders = [self.rng.randrange(len(genomes)) for _ in range(self.tournament)]
+        return genomes[max(contenders, key=lambda index: fitnesses[index])]
+
+    def breed(self, genomes, fitnesses, layout: genome_layout):
+        # elites carry over; the rest are uniform crossovers of tournament winners, with gaussian mutation
+        ranked = sorted(range(len(genomes)), key=lambda index: -fitnesses[index])
+        children = [genomes[index] for index in ranked[:self.elite]]
+        while len(children) < len(genomes):
+            mother, father = self.pick(genomes, fitnesses), self.pick(genomes, fitnesses)
+            child = [mine if self.rng.random() < 0.5 else theirs for mine, theirs in zip(mother, father)]
+            for gene, bound in enumerate(layout.bounds):
+                if self.rng.random() < self.mutation_rate:
+                    child[gene] += self.rng.gauss(0, self.mutation_scale*bound)
+            children.append(layout.repair(child))
+        return children
+
+    def mutant(self, genome, layout: genome_layout):
+        return layout.repair([gene + self.rng.gauss(0, self.mutation_scale*bound) for gene, bound in zip(genome, layout.bounds)])
+
+    def tune_bucket(self, found: bucket):
+        layout = genome_layout(fuzzy.membership_fxns, found.entries)
+        progress = self.state.buckets.get(found.name)
+        self.rng = random.Random("%s:search:%s" %(self.master_seed, found.name))
+        if progress != None:
+            version, internal, gauss_next = progress["rng_state"]
+            self.rng.setstate((version, tuple(internal), gauss_next))
+        else:
+            # the hand-tuned set and mutants of it
+            baseline = layout.repair(layout.initial)
+            population = [baseline] + [self.mutant(baseline, layout) for _ in range(self.population - 1)]
+            progress = self.state.buckets[found.name] = {"generation": 0, "population": population}
+        while progress["generation"] < self.generations:
+            start = time.monotonic()
+            fitnesses = self.score(progress["population"], found, layout)
+            best = max(range(len(fitnesses)), key=lambda index: fitnesses[index])
+            progress["best"], progress["fitness"] = progress["population"][best], fitnesses[best]
+            progress["generation"] += 1
+            # breeding even after the last generation leaves a resumed, longer search where a longer run would be
+            progress["population"] = self.breed(progress["population"], fitnesses, layout)
+            progress["rng_state"] = self.rng.getstate()
+            save_state(self.checkpoint, self.state)
+            if self.progress != None:
+                self.progress(found.name, progress["generation"], progress["fitness"], time.monotonic() - start)
+        return progress["best"]
+
+    def run(self):
+        # tunes every bucket and returns membership_fxns with each bucket's best functions
+        tuned = fuzzy.membership_fxns
+        self.pool = multiprocessing.Pool(self.workers) if self.workers != 1 else None
+        try:
+            for found in self.buckets.values():
+                layout = genome_layout(fuzzy.membership_fxns, found.entries)
+                tuned = layout.apply(self.tune_bucket(found), tuned)
+        finally:
+            if self.pool != None:
+                self.pool.terminate()
+                self.pool = None
+        return tuned
+
+    def validate(self, tuned, combats=None):
+        # {bucket: (hand-tuned fitness, tuned fitness)} on combats the search never played
+        combats = combats or self.combats
+        self.pool = multiprocessing.Pool(self.workers) if self.workers != 1 else None
+        try:
+            scores = {}
+            for found in self.buckets.values():
+                totals = self.play([fuzzy.membership_fxns, tuned], found, "%s:validate" %self.master_seed, combats)
+                scores[found.name] = tuple(fitness_of(candidate_totals, combats) for candidate_totals in totals)
+        finally:
+            if self.pool != None:
+                self.pool.terminate()
+                self.pool = None
+        return scores
+
+def membership_source(membership_set):
+    # membership_set as Python source laid out like membership_fxns in fuzzy.py
+    lines = ["from fuzzy import trapezoid_coefficients, triangle_coefficients", "", "membership_fxns = {"]
+    for stat, contexts in membership_set.items():
+        lines.append("  %s: {" %json.dumps(stat))
+        for context, levels in contexts.items():
+            lines.append("    %s: {" %json.dumps(context))
+            for level, coefficients in levels.items():
+                values = ", ".join("%g" %value for value in vars(coefficients).values())
+                lines.append("      %s: %s(%s)," %(json.dumps(level), type(coefficients).__name__, values))
+            lines.append("    },")
+        lines.append("  },")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def main(cmdline_args):
+    usage = '''Usage: tuner.py -o <output .py> [-c <checkpoint .json>][-n <combats per candidate>][-g <generations>]
+    [--population <size>][-j <workers>][--seed <master seed>][-b <buckets>][-p <classes>][-s <sidekick types>]
+    [-m <monster types>]
+Lists are comma separated and default to everything; buckets are unknown, d8, d10, d12, "CR 1/8", "CR 1/4" and
+"CR 1/2". Rerunning with the same checkpoint resumes the search. The output defines membership_fxns; assign it to
+fuzzy.membership_fxns to use it.'''
+    try:
+        options, args = getopt.getopt(cmdline_args, "o:c:n:g:j:b:p:s:m:h", ["population=", "seed=", "help"])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+
+    settings = {"o": None, "c": None, "n": 2000, "g": 20, "population": 16, "j": None, "seed": None}
+    lists = {}
+    for opt, arg in options:
+        if opt in ("-h", "--help"):
+            print(usage)
+            sys.exit()
+        elif opt in ("-b", "-p", "-s", "-m"):
+            lists[opt.lstrip("-")] = arg.split(",")
+        else:
+            settings[opt.lstrip("-")] = arg
+
+    if settings["o"] == None:
+        print(usage)
+        sys.exit(2)
+
+    def report(name, generation, fitness, elapsed):
+        print("%-8s generation %3d: best fitness %.5f (%.1fs)" %(name, generation, fitness, elapsed))
+
+    try:
+        tuner = Tuner(int(settings["n"]), int(settings["population"]), int(settings["g"]), settings["seed"],
+                      int(settings["j"]) if settings["j"] != None else None, settings["c"],
+                      player_classes=lists.get("p"), sidekick_types=lists.get("s"), monster_types=lists.get("m"),
+                      bucket_names=lists.get("b"), progress=report)
+    except ValueError as error:
+        print(error)
+        sys.exit(2)
+
+    tuned = tuner.run()
+    with open(settings["o"], "w") as file:
+        file.write(membership_source(tuned))
+    print("%-8s %12s %12s" %("Bucket", "Hand-tuned", "Tuned"))
+    for name, (before, after) in tuner.validate(tuned).items():
+        print("%-8s %12.5f %12.5f" %(name, before, after))
+    print("wrote %s" %settings["o"])
+
+if __name__ == "__main__":
+    main(sys.argv[1:])